@@ -2,25 +2,16 @@
 """Compare GV invariants: McAllister vs CYTools/cygv."""
 
 import numpy as np
-from pathlib import Path
+
+from mcallister import PaperData
 
 
 def main():
-    DATA_DIR = Path("resources/small_cc_2107.09064_source/anc/paper_data/4-214-647")
+    data = PaperData("4-214-647")
 
     # Load McAllister's data
-    dual_curves = []
-    with open(DATA_DIR / "dual_curves.dat") as f:
-        for line in f:
-            row = [int(x) for x in line.strip().split(",")]
-            dual_curves.append(row)
-    dual_curves = np.array(dual_curves)
-
-    gv_mca = []
-    with open(DATA_DIR / "dual_curves_gv.dat") as f:
-        content = f.read()
-        gv_mca = [int(float(x)) for x in content.strip().split(",")]
-    gv_mca = np.array(gv_mca)
+    dual_curves = data["dual_curves"]
+    gv_mca = data.exact("dual_curves_gv")
 
     print(f"McAllister GV invariants: {len(gv_mca)}")
     print(f"Curve class shape: {dual_curves.shape}")
@@ -37,7 +28,7 @@ def main():
     # Now compare with our computed ones
     from cytools import Polytope
 
-    dual_pts = np.loadtxt(DATA_DIR / "dual_points.dat", delimiter=',').astype(int)
+    dual_pts = data["dual_points"]
     p_dual = Polytope(dual_pts)
     tri = p_dual.triangulate()
     cy = tri.get_cy()
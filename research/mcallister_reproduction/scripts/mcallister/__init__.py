@@ -0,0 +1,16 @@
+"""
+Shared code for the McAllister et al. (arXiv:2107.09064) reproduction scripts.
+
+Modules:
+    paper_data    - Loader for anc/paper_data/<polytope> with a binary .npy cache
+    intersections - Symmetric sparse κ_ijk (i ≤ j ≤ k) with batched contractions
+    polylog       - Vectorized Li_2, Li_3 (and Li_1, Li_0) over complex arrays
+    prepotential  - Batched F, ∂F, ∂²F, ∂³F from GV invariants at many points
+    periods       - Period vector, flux superpotential W and Kähler potential
+    flat_vacua    - Batched perturbatively flat vacuum solver over (K, M) ensembles
+    racetrack     - Racetrack W(τ) and tiered float64/mpmath W₀ evaluation
+"""
+
+from .paper_data import PAPER_DATA_DIR, POLYTOPES, PaperData, load_paper_data
+
+__all__ = ["PAPER_DATA_DIR", "POLYTOPES", "PaperData", "load_paper_data"]
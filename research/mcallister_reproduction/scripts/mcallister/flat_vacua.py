@@ -0,0 +1,173 @@
+"""
+Perturbatively flat vacua (Demirtas-Kim-McAllister-Moritz lemma) for flux ensembles.
+
+For fluxes (K, M) the lemma (arXiv:2107.09064 §2.2) asks for
+
+    N_ab = κ_abc M^c          invertible
+    p = N⁻¹ K                 inside the Kähler cone
+    K · p = 0
+
+and then z = p τ is a perturbatively flat direction. Many (K, M) pairs are
+handled as integer arrays: N, det N and p come from one einsum and one
+batched linalg.solve per chunk, the conditions are boolean masks, and only
+the survivors are re-solved in exact rationals (which also makes K · p = 0
+and the cone test exact). Chunks are streamed through a process pool, so
+memory stays bounded by the chunk size.
+
+Usage:
+    from mcallister.flat_vacua import iter_flat_vacua, solve_flat_vacua
+
+    vacua = solve_flat_vacua(kappa, K, M, kahler_cone=hyperplanes)  # K, M: (n, h)
+    vacua.index, vacua.p_exact
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Iterator
+
+import numpy as np
+
+from .intersections import IntersectionTensor, as_intersection_tensor
+
+CHUNK_SIZE = 1 << 16
+
+# K·p and cone tests in float64 only pre-select; survivors are checked exactly
+FLOAT_TOLERANCE = 1e-8
+
+
+def flux_matrices(kappa: IntersectionTensor, M) -> np.ndarray:
+    """N_ab = κ_abc M^c for M of shape (n, h); returns (n, h, h)."""
+    return as_intersection_tensor(kappa).matrix(np.atleast_2d(M))
+
+
+def flat_directions(kappa: IntersectionTensor, K, M) -> tuple[np.ndarray, np.ndarray]:
+    """
+    det N and p = N⁻¹K in float64 for (n, h) flux arrays.
+
+    Rows with singular N get p = NaN.
+    """
+    K = np.atleast_2d(K).astype(float)
+    N = flux_matrices(kappa, M)
+    det = np.linalg.det(N)
+    # κ and M are integral, so a nonsingular N has |det N| ≥ 1
+    invertible = np.abs(det) > 0.5
+    p = np.full(K.shape, np.nan)
+    if invertible.any():
+        p[invertible] = np.linalg.solve(N[invertible], K[invertible][:, :, None])[:, :, 0]
+    return det, p
+
+
+def exact_flat_direction(N, K) -> tuple[Fraction, ...] | None:
+    """p = N⁻¹K in rationals by Gaussian elimination; None if N is singular."""
+    n = len(K)
+    rows = [[Fraction(int(x)) for x in N[i]] + [Fraction(int(K[i]))] for i in range(n)]
+    for col in range(n):
+        pivot = next((r for r in range(col, n) if rows[r][col] != 0), None)
+        if pivot is None:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(n):
+            if r != col and rows[r][col] != 0:
+                factor = rows[r][col] / rows[col][col]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[col])]
+    return tuple(rows[i][n] / rows[i][i] for i in range(n))
+
+
+@dataclass
+class FlatVacua:
+    """Flux pairs satisfying the lemma, with their flat directions."""
+    index: np.ndarray                   # (s,) position in the input arrays
+    K: np.ndarray                       # (s, h)
+    M: np.ndarray                       # (s, h)
+    p: np.ndarray                       # (s, h) float64
+    p_exact: list[tuple[Fraction, ...]]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+def _solve_chunk(kappa: IntersectionTensor, kahler_cone: np.ndarray | None,
+                 K: np.ndarray, M: np.ndarray, offset: int) -> FlatVacua:
+    det, p = flat_directions(kappa, K, M)
+    mask = np.abs(det) > 0.5
+    with np.errstate(invalid="ignore"):
+        scale = np.abs(K).sum(axis=1) * np.abs(p).max(axis=1, initial=0)
+        mask &= np.abs(np.einsum("na,na->n", K, p)) <= FLOAT_TOLERANCE * np.maximum(scale, 1)
+        if kahler_cone is not None:
+            slack = FLOAT_TOLERANCE * np.maximum(np.abs(p).max(axis=1, initial=0), 1)
+            mask &= (p @ kahler_cone.T > -slack[:, None]).all(axis=1)
+
+    N = flux_matrices(kappa, M[mask]).round().astype(np.int64)
+    keep, exact = [], []
+    for row, (N_row, K_row) in enumerate(zip(N, K[mask])):
+        p_exact = exact_flat_direction(N_row, K_row)
+        if p_exact is None or sum(k * x for k, x in zip(K_row.tolist(), p_exact)) != 0:
+            continue
+        if kahler_cone is not None and not all(
+                sum(int(h) * x for h, x in zip(plane, p_exact)) > 0 for plane in kahler_cone):
+            continue
+        keep.append(row)
+        exact.append(p_exact)
+
+    index = np.flatnonzero(mask)[keep]
+    return FlatVacua(index=index + offset, K=K[index], M=M[index], p=p[index], p_exact=exact)
+
+
+def iter_flat_vacua(kappa, K, M, kahler_cone=None, chunk_size: int = CHUNK_SIZE,
+                    workers: int | None = None) -> Iterator[FlatVacua]:
+    """
+    Yield the flat vacua of each chunk of (K, M), in input order.
+
+    Args:
+        kappa: integral intersection numbers of the mirror (IntersectionTensor
+            or dense (h, h, h) array)
+        K, M: (n, h) integer flux arrays (may be memory-mapped)
+        kahler_cone: (m, h) integer hyperplanes H with H·p > 0 inside the cone
+        chunk_size: flux pairs per chunk
+        workers: processes (default: all cores; 1 runs inline)
+    """
+    kappa = as_intersection_tensor(kappa)
+    cone = None if kahler_cone is None else np.asarray(kahler_cone)
+    K, M = np.atleast_2d(K), np.atleast_2d(M)
+    starts = range(0, len(K), chunk_size)
+    workers = workers or os.cpu_count() or 1
+
+    def args(start):
+        stop = start + chunk_size
+        return kappa, cone, np.asarray(K[start:stop]), np.asarray(M[start:stop]), start
+
+    if workers == 1 or len(starts) == 1:
+        for start in starts:
+            yield _solve_chunk(*args(start))
+        return
+
+    # Keep a bounded window of chunks in flight so memory stays flat
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start in starts:
+            pending.append(pool.submit(_solve_chunk, *args(start)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def solve_flat_vacua(kappa, K, M, kahler_cone=None, chunk_size: int = CHUNK_SIZE,
+                     workers: int | None = None) -> FlatVacua:
+    """All flat vacua among the (K, M) pairs, gathered from iter_flat_vacua."""
+    kappa = as_intersection_tensor(kappa)
+    h = kappa.h
+    parts = list(iter_flat_vacua(kappa, K, M, kahler_cone, chunk_size, workers))
+    if not parts:
+        empty = np.empty((0, h), dtype=np.int64)
+        return FlatVacua(index=np.empty(0, dtype=np.int64), K=empty, M=empty, p=np.empty((0, h)), p_exact=[])
+    return FlatVacua(
+        index=np.concatenate([v.index for v in parts]),
+        K=np.concatenate([v.K for v in parts]),
+        M=np.concatenate([v.M for v in parts]),
+        p=np.concatenate([v.p for v in parts]),
+        p_exact=[p for v in parts for p in v.p_exact],
+    )
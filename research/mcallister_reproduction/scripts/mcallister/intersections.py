@@ -0,0 +1,147 @@
+"""
+Symmetric intersection numbers κ_ijk stored once per i ≤ j ≤ k.
+
+CYTools returns one entry per sorted triple; the scripts used to expand that
+into a dense h¹¹ × h¹¹ × h¹¹ array by writing all six permutations in a Python
+loop, which for the primal side (h¹¹ = 214) is 9.8M mostly-zero doubles.
+IntersectionTensor keeps the sorted triples plus their distinct permutations
+(at most 6 × nnz) as two sparse matrices, so every contraction is a gather of
+columns of t and a sparse matrix product:
+
+    cubic(t)      κ_ijk t^i t^j t^k     (h,) → scalar,  (n, h) → (n,)
+    quadratic(t)  κ_ijk t^j t^k         (h,) → (h,),    (n, h) → (n, h)
+    matrix(t)     κ_ijk t^k             (h,) → (h, h),  (n, h) → (n, h, h)
+
+matrix(M) is N_ab = κ_abc M^c. t may be complex. np.asarray(tensor) gives the
+dense array for code that still needs it.
+
+Usage:
+    from mcallister.intersections import IntersectionTensor
+
+    kappa = IntersectionTensor.from_entries(cy.intersection_numbers(in_basis=True), cy.h11())
+    kappa.cubic(t), kappa.matrix(M)
+"""
+
+from itertools import permutations
+
+import numpy as np
+import scipy.sparse as sparse
+
+PERMUTATIONS = np.array(list(permutations(range(3))))
+
+
+class IntersectionTensor:
+    """Symmetric rank-3 tensor in sorted-triple COO form."""
+
+    def __init__(self, h: int, indices, values):
+        indices = np.sort(np.asarray(indices, dtype=np.int64).reshape(-1, 3), axis=1)
+        values = np.asarray(values, dtype=float).ravel()
+        if len(indices) and (indices.min() < 0 or indices.max() >= h):
+            raise ValueError(f"Intersection indices out of range for h = {h}")
+
+        # One entry per sorted triple, zeros dropped
+        _, first = np.unique(self._keys(indices, h), return_index=True)
+        keep = values[first] != 0
+        self.h = h
+        self.indices = indices[first][keep]
+        self.values = values[first][keep]
+
+        # Multiplicity of each sorted triple among the 27 orderings
+        i, j, k = self.indices.T
+        self.multiplicity = np.where((i == j) & (j == k), 1, np.where((i == j) | (j == k), 3, 6))
+
+        # Distinct permutations (i, j, k) with their values
+        rows = np.repeat(np.arange(len(self.values)), len(PERMUTATIONS))
+        expanded = self.indices[:, PERMUTATIONS].reshape(-1, 3)
+        _, unique = np.unique(self._keys(expanded, h), return_index=True)
+        self._i, self._j, self._k = expanded[unique].T
+        self._v = self.values[rows[unique]]
+
+        # κ unfolded as (k, i·h + j) for matrix(); one-hot (permutation, i) for quadratic()
+        self._unfolded = sparse.csr_matrix((self._v, (self._k, self._i * h + self._j)), shape=(h, h * h))
+        self._scatter = sparse.csr_matrix(
+            (np.ones(len(self._v)), (np.arange(len(self._v)), self._i)), shape=(len(self._v), h))
+
+    @staticmethod
+    def _keys(indices: np.ndarray, h: int) -> np.ndarray:
+        return (indices[:, 0] * h + indices[:, 1]) * h + indices[:, 2]
+
+    @classmethod
+    def from_entries(cls, entries, h: int) -> "IntersectionTensor":
+        """
+        From CYTools output: a {(i, j, k): value} dict, (n, 4) rows of
+        [i, j, k, value], or a dense (h, h, h) array.
+
+        Entries with an index ≥ h are dropped.
+        """
+        if isinstance(entries, dict):
+            indices = np.array(list(entries.keys()), dtype=np.int64).reshape(-1, 3)
+            values = np.array(list(entries.values()), dtype=float)
+        else:
+            entries = np.asarray(entries)
+            if entries.ndim == 3:
+                return cls.from_dense(entries[:h, :h, :h])
+            indices = entries[:, :3].astype(np.int64)
+            values = entries[:, 3].astype(float)
+        inside = (indices < h).all(axis=1)
+        return cls(h, indices[inside], values[inside])
+
+    @classmethod
+    def from_dense(cls, kappa) -> "IntersectionTensor":
+        """From a dense symmetric (h, h, h) array."""
+        kappa = np.asarray(kappa)
+        i, j, k = np.nonzero(kappa)
+        sorted_triple = (i <= j) & (j <= k)
+        indices = np.stack([i, j, k], axis=1)[sorted_triple]
+        return cls(kappa.shape[0], indices, kappa[i, j, k][sorted_triple])
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        return (self.h, self.h, self.h)
+
+    @property
+    def nnz(self) -> int:
+        """Stored (sorted-triple) entries."""
+        return len(self.values)
+
+    def cubic(self, t) -> np.ndarray:
+        """κ_ijk t^i t^j t^k."""
+        T = np.asarray(t)
+        T2 = np.atleast_2d(T)
+        i, j, k = self.indices.T
+        out = (T2[:, i] * T2[:, j] * T2[:, k]) @ (self.values * self.multiplicity)
+        return out[0] if T.ndim == 1 else out
+
+    def quadratic(self, t) -> np.ndarray:
+        """κ_ijk t^j t^k."""
+        T = np.asarray(t)
+        T2 = np.atleast_2d(T)
+        terms = T2[:, self._j] * T2[:, self._k] * self._v
+        out = (self._scatter.T @ terms.T).T
+        return out[0] if T.ndim == 1 else out
+
+    def matrix(self, t) -> np.ndarray:
+        """κ_ijk t^k, e.g. N_ab = κ_abc M^c."""
+        T = np.asarray(t)
+        T2 = np.atleast_2d(T)
+        out = (self._unfolded.T @ T2.T).T.reshape(len(T2), self.h, self.h)
+        return out[0] if T.ndim == 1 else out
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.shape)
+        dense[self._i, self._j, self._k] = self._v
+        return dense
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+    def __repr__(self) -> str:
+        return f"IntersectionTensor(h={self.h}, nnz={self.nnz})"
+
+
+def as_intersection_tensor(kappa) -> IntersectionTensor:
+    """Pass an IntersectionTensor through; convert a dense array."""
+    if isinstance(kappa, IntersectionTensor):
+        return kappa
+    return IntersectionTensor.from_dense(kappa)
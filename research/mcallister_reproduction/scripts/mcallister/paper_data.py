@@ -0,0 +1,247 @@
+"""
+Loader for the ancillary data of arXiv:2107.09064 (anc/paper_data/<polytope>).
+
+Every .dat file is a comma-separated table: single-line files load as 1-D
+arrays, multi-line files as 2-D arrays (one row per line). Each file is parsed
+with a single vectorized np.fromstring call and cached as .npy under
+.ai_cache/paper_data/<polytope>/, keyed by the source's size/mtime with a
+sha256 fallback. Later runs only stat the sources and memory-map the cache.
+
+Some GV invariants do not fit in int64 (dual_curves_gv.dat for 4-214-647 has
+47-digit entries, potent_rays_gv.dat up to 115 digits). For those files
+array() returns float64 approximations and exact() the exact Python ints.
+
+Usage:
+    from mcallister import PaperData
+
+    data = PaperData("4-214-647")
+    curves = data["dual_curves"]          # (5177, 9) int64
+    gv = data.exact("dual_curves_gv")     # exact ints (object array)
+    g_s = data.scalar("g_s")
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# scripts/mcallister/paper_data.py -> repository root
+REPO_ROOT = Path(__file__).resolve().parents[4]
+PAPER_DATA_DIR = REPO_ROOT / "research" / "papers" / "small_cc_2107.09064_source" / "anc" / "paper_data"
+CACHE_DIR = REPO_ROOT / ".ai_cache" / "paper_data"
+CACHE_VERSION = 1
+
+POLYTOPES = (
+    "4-214-647",
+    "5-113-4627-main",
+    "5-113-4627-alternative",
+    "5-81-3213",
+    "7-51-13590",
+)
+
+# Integers at or above this magnitude are kept exactly (float64 comparison,
+# so stay well clear of the int64 limit)
+EXACT_INT_THRESHOLD = 2.0**62
+
+
+def parse_dat(data: bytes) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Parse the text of a .dat file.
+
+    Returns (values, exact). values is int64 for integer files that fit,
+    float64 otherwise. exact is None unless the file holds integers too large
+    for int64, in which case it is a bytes array of the original tokens with
+    the same shape as values.
+    """
+    text = data.decode("ascii").strip()
+    if not text:
+        return np.zeros(0), None
+    rows = text.count("\n") + 1
+    flat = text.replace("\n", ",")
+
+    values = np.fromstring(flat, sep=",", dtype=np.float64)
+    exact = None
+    if not any(c in flat for c in ".eEn"):  # 'n' catches nan/inf
+        if np.abs(values).max() < EXACT_INT_THRESHOLD:
+            values = np.fromstring(flat, sep=",", dtype=np.int64)
+        else:
+            exact = np.array([token.strip() for token in flat.split(",")], dtype=np.bytes_)
+
+    if rows > 1:
+        values = values.reshape(rows, -1)
+        if exact is not None:
+            exact = exact.reshape(rows, -1)
+    return values, exact
+
+
+def _save_npy(path: Path, array: np.ndarray) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class PaperData:
+    """
+    Typed arrays for one paper_data/<polytope> directory.
+
+    Files are addressed by name without the .dat suffix ("dual_curves",
+    "K_vec", ...). Arrays come back read-only (memory-mapped from the cache
+    when it is usable); copy them before modifying.
+    """
+
+    def __init__(self, polytope: str = "4-214-647", data_dir: Path = PAPER_DATA_DIR,
+                 cache_dir: Path | None = CACHE_DIR):
+        self.polytope = polytope
+        self.source_dir = Path(data_dir) / polytope
+        if not self.source_dir.is_dir():
+            raise FileNotFoundError(f"No paper data for {polytope!r} in {data_dir}")
+        self.cache_dir = Path(cache_dir) / polytope if cache_dir is not None else None
+        self._manifest = self._read_manifest()
+        self._loaded: dict[str, tuple[np.ndarray, np.ndarray | None]] = {}
+
+    def names(self) -> list[str]:
+        """All data files in the directory, without the .dat suffix."""
+        return sorted(path.stem for path in self.source_dir.glob("*.dat"))
+
+    def __contains__(self, name: str) -> bool:
+        return (self.source_dir / f"{name}.dat").is_file()
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.array(name)
+
+    def array(self, name: str) -> np.ndarray:
+        """Contents of <name>.dat as int64 or float64 (see exact() for huge ints)."""
+        return self._load(name)[0]
+
+    def exact(self, name: str) -> np.ndarray:
+        """Integer contents of <name>.dat without loss: int64 if it fits, else Python ints."""
+        values, exact = self._load(name)
+        if exact is None:
+            if values.dtype.kind != "i":
+                raise TypeError(f"{name}.dat does not contain integers")
+            return values
+        return np.array([int(token) for token in exact.ravel()], dtype=object).reshape(exact.shape)
+
+    def scalar(self, name: str) -> float | int:
+        """Single value stored in <name>.dat (g_s, W_0, cy_vol, ...)."""
+        values = self.array(name)
+        if values.size != 1:
+            raise ValueError(f"{name}.dat holds {values.size} values, not one")
+        return values.reshape(-1)[0].item()
+
+    def load_all(self) -> dict[str, np.ndarray]:
+        """Every file in the directory, parsed (or read from the cache)."""
+        return {name: self.array(name) for name in self.names()}
+
+    # -------------------------------------------------------------------------
+    # Cache
+    # -------------------------------------------------------------------------
+
+    def _read_manifest(self) -> dict:
+        if self.cache_dir is None:
+            return {}
+        try:
+            with open(self.cache_dir / "manifest.json") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if manifest.get("version") != CACHE_VERSION:
+            return {}
+        return manifest.get("files", {})
+
+    def _write_manifest(self) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".manifest.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": CACHE_VERSION, "files": self._manifest}, f, indent=1)
+            os.replace(tmp_path, self.cache_dir / "manifest.json")
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _read_cached(self, entry: dict) -> tuple[np.ndarray, np.ndarray | None] | None:
+        try:
+            values = np.load(self.cache_dir / entry["file"], mmap_mode="r")
+            exact = np.load(self.cache_dir / entry["exact"], mmap_mode="r") if entry.get("exact") else None
+        except (OSError, ValueError, KeyError):
+            return None
+        return values, exact
+
+    def _load(self, name: str) -> tuple[np.ndarray, np.ndarray | None]:
+        if name in self._loaded:
+            return self._loaded[name]
+
+        source = self.source_dir / f"{name}.dat"
+        stat = source.stat()
+        entry = self._manifest.get(name)
+
+        # Fast path: unchanged size and mtime
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            cached = self._read_cached(entry)
+            if cached is not None:
+                self._loaded[name] = cached
+                return cached
+
+        data = source.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+
+        # Touched but identical content: reuse the arrays, refresh the stat key
+        cached = self._read_cached(entry) if entry and entry["sha256"] == digest else None
+        parsed = cached is None
+        if parsed:
+            cached = parse_dat(data)
+            for array in cached:
+                if array is not None:
+                    array.flags.writeable = False
+        self._loaded[name] = cached
+
+        if self.cache_dir is not None:
+            try:
+                self._store(name, stat, digest, *cached, write_arrays=parsed)
+            except OSError as e:
+                print(f"Could not cache {name}.dat in {self.cache_dir}: {e}", file=sys.stderr)
+        return cached
+
+    def _store(self, name: str, stat: os.stat_result, digest: str,
+               values: np.ndarray, exact: np.ndarray | None, write_arrays: bool) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        old = self._manifest.get(name, {})
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "file": f"{name}-{digest[:16]}.npy",
+            "exact": f"{name}-{digest[:16]}.exact.npy" if exact is not None else None,
+        }
+        if write_arrays:
+            _save_npy(self.cache_dir / entry["file"], values)
+            if exact is not None:
+                _save_npy(self.cache_dir / entry["exact"], exact)
+            for stale in (old.get("file"), old.get("exact")):
+                if stale and stale not in (entry["file"], entry["exact"]):
+                    try:
+                        (self.cache_dir / stale).unlink()
+                    except OSError:
+                        pass
+        self._manifest[name] = entry
+        self._write_manifest()
+
+
+def load_paper_data(polytope: str = "4-214-647") -> dict[str, np.ndarray]:
+    """All arrays for one polytope directory, keyed by file name without .dat."""
+    return PaperData(polytope).load_all()
@@ -0,0 +1,144 @@
+"""
+Period vector, flux superpotential and Kähler potential at LCS, batched.
+
+Conventions (arXiv:2107.09064 §2, with F from mcallister.prepotential):
+
+    Π = (2F - z^a F_a, F_a, 1, z^a)                 2(h+1) components
+    Σ = [[0, 1], [-1, 0]]                           symplectic pairing
+    f = (b_a M^a, a_ab M^b, 0, M^a),  h = (0, K_a, 0, 0)
+    W = √(2/π) (f - τ h) · Σ · Π
+    K = -log(-i Π̄·Σ·Π) - log(-i(τ - τ̄))
+
+Everything that depends only on the point (Π, ∂Π, the Kähler potential and
+its gradient) is computed once per point; each flux pair then costs one
+matrix product, so scans over points × fluxes are a single array computation.
+
+Usage:
+    from mcallister.periods import flux_superpotential
+
+    result = flux_superpotential(engine, z, tau, K, M)  # z: (P, h), K, M: (N, h)
+    result.W, result.dW, result.DW, result.K
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .prepotential import Prepotential, PrepotentialEngine
+
+FLUX_NORMALIZATION = np.sqrt(2 / np.pi)
+
+
+def symplectic_form(h: int) -> np.ndarray:
+    """Σ for 2(h+1) periods."""
+    n = h + 1
+    sigma = np.zeros((2 * n, 2 * n))
+    sigma[:n, n:] = np.eye(n)
+    sigma[n:, :n] = -np.eye(n)
+    return sigma
+
+
+def flux_vectors(K, M, a, b) -> tuple[np.ndarray, np.ndarray]:
+    """Full flux vectors f, h of shape (N, 2(h+1)) for N pairs of (K, M)."""
+    K = np.atleast_2d(np.asarray(K, dtype=float))
+    M = np.atleast_2d(np.asarray(M, dtype=float))
+    n_flux, h = M.shape
+    zero = np.zeros((n_flux, 1))
+    f = np.hstack([(M @ np.asarray(b, dtype=float))[:, None], M @ np.asarray(a, dtype=float).T, zero, M])
+    h_vec = np.hstack([zero, K, zero, np.zeros((n_flux, h))])
+    return f, h_vec
+
+
+@dataclass
+class Periods:
+    """Period data at P points."""
+    z: np.ndarray              # (P, h)
+    Pi: np.ndarray             # (P, 2h+2)
+    dPi: np.ndarray            # (P, h, 2h+2), ∂_a Π
+    K_cs: np.ndarray           # (P,), complex structure Kähler potential
+    dK_cs: np.ndarray          # (P, h), ∂_a K_cs
+    prepotential: Prepotential
+
+
+@dataclass
+class Superpotential:
+    """Flux superpotential for P points × N flux pairs."""
+    periods: Periods
+    tau: np.ndarray            # (P,)
+    W: np.ndarray              # (P, N)
+    dW: np.ndarray             # (P, N, h), ∂W/∂z^a
+    dW_dtau: np.ndarray        # (P, N)
+    K: np.ndarray              # (P,), K_cs - log(2 Im τ)
+    DW: np.ndarray             # (P, N, h), D_a W = ∂_a W + (∂_a K) W
+    DW_dtau: np.ndarray        # (P, N)
+
+
+def periods(engine: PrepotentialEngine, z) -> Periods:
+    """Π, ∂Π and the complex structure Kähler potential at z of shape (P, h)."""
+    z = np.atleast_2d(np.asarray(z, dtype=engine.complex))
+    n_points, h = z.shape
+    prep = engine.evaluate(z, order=2)
+    F, dF, ddF = prep.F, prep.dF, prep.ddF
+
+    ones = np.ones((n_points, 1), dtype=engine.complex)
+    F0 = 2 * F - np.einsum("pa,pa->p", z, dF)
+    Pi = np.hstack([F0[:, None], dF, ones, z])
+
+    # ∂_a(2F - z^b F_b) = F_a - z^b F_ab
+    dF0 = dF - np.einsum("pab,pb->pa", ddF, z)
+    dPi = np.concatenate([
+        dF0[:, :, None],
+        ddF,
+        np.zeros((n_points, h, 1), dtype=engine.complex),
+        np.broadcast_to(np.eye(h), (n_points, h, h)),
+    ], axis=2)
+
+    sigma = symplectic_form(h)
+    conj_sigma = Pi.conj() @ sigma                            # Π̄·Σ
+    norm = np.einsum("pi,pi->p", conj_sigma, Pi)              # Π̄·Σ·Π, imaginary
+    K_cs = -np.log((-1j * norm).real)
+    dK_cs = -np.einsum("pi,pai->pa", conj_sigma, dPi) / norm[:, None]
+    return Periods(z=z, Pi=Pi, dPi=dPi, K_cs=K_cs, dK_cs=dK_cs, prepotential=prep)
+
+
+def flux_superpotential(engine: PrepotentialEngine, z, tau, K, M,
+                        precomputed: Periods | None = None) -> Superpotential:
+    """
+    W, its derivatives and the Kähler potential for every (point, flux) pair.
+
+    Args:
+        engine: prepotential for the geometry (supplies a_ab and b_a for f)
+        z: (P, h) complex structure moduli
+        tau: axio-dilaton, scalar or (P,)
+        K, M: flux vectors, (h,) or (N, h)
+        precomputed: periods at z from an earlier call, to scan other fluxes
+    """
+    per = precomputed if precomputed is not None else periods(engine, z)
+    n_points, h = per.z.shape
+    tau = np.broadcast_to(np.asarray(tau, dtype=complex), (n_points,))
+
+    f, h_vec = flux_vectors(K, M, engine.a, engine.b)
+    sigma = symplectic_form(h)
+    sigma_pi = per.Pi @ sigma.T                               # (P, D)
+    sigma_dpi = per.dPi @ sigma.T                             # (P, h, D)
+
+    W_f = sigma_pi @ f.T                                      # (P, N)
+    W_h = sigma_pi @ h_vec.T
+    W = FLUX_NORMALIZATION * (W_f - tau[:, None] * W_h)
+    dW_f = (sigma_dpi @ f.T).transpose(0, 2, 1)               # (P, N, h)
+    dW_h = (sigma_dpi @ h_vec.T).transpose(0, 2, 1)
+    dW = FLUX_NORMALIZATION * (dW_f - tau[:, None, None] * dW_h)
+    dW_dtau = -FLUX_NORMALIZATION * W_h
+
+    K_total = per.K_cs - np.log(2 * tau.imag)
+    dK_dtau = -1 / (tau - tau.conj())
+    return Superpotential(
+        periods=per,
+        tau=tau,
+        W=W,
+        dW=dW,
+        dW_dtau=dW_dtau,
+        K=K_total,
+        DW=dW + per.dK_cs[:, None, :] * W[:, :, None],
+        DW_dtau=dW_dtau + dK_dtau[:, None] * W,
+    )
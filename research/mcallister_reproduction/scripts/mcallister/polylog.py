@@ -0,0 +1,340 @@
+"""
+Vectorized polylogarithms Li_2, Li_3 (and Li_1, Li_0) over complex arrays.
+
+The worldsheet-instanton sums need Li_3(q^d) and its derivatives for every
+curve d at every moduli point, so these kernels take whole arrays and never
+loop in Python over elements. Each element is routed to one of three regions:
+
+    |z| <= 1/2        power series Σ z^k / k^n, truncated per |z| band so
+                      that tiny LCS arguments (|q^d| << 1) cost a few terms
+    1/2 < |z| <= 1    expansion in μ = log z around z = 1, with
+                      coefficients ζ(n - k) from Bernoulli numbers
+                      (converges for |μ| < 2π, here |μ| <= 3.22)
+    |z| > 1           inversion z -> 1/z
+
+Derivatives follow from z d/dz Li_n(z) = Li_{n-1}(z), with Li_1(z) = -log(1 - z)
+and Li_0(z) = z / (1 - z); for q = exp(2πi t), d/dt Li_n(q) = 2πi Li_{n-1}(q).
+Li_1 and Li_0 use the same banded power series for |z| <= 1/2 (cheaper than a
+complex log, and more accurate than np.log1p for tiny complex z) and the
+closed forms elsewhere.
+
+Precision: by default everything is computed in complex128. Pass
+extended=True (or complex long double input) to work in np.clongdouble, which
+is 80-bit extended precision on x86 Linux; on platforms where long double is
+plain double (Windows, macOS on Apple silicon) the two variants coincide.
+Use mpmath.polylog when more digits are needed.
+
+polylog_tower() splits the power-series region once for all four orders, and
+below |z| = 1e-17 (in float64) returns z itself, which is where almost every
+q^d sits deep in the LCS region.
+
+Speed, measured on one core for 5177 curves x 1000 points (5.2M arguments):
+near LCS (the 4-214-647 flat direction, Im tau 50-150) li3 takes ~60 ms and
+polylog_tower ~0.15-0.25 s, mostly writing out the four result arrays. With
+arguments spread over |z| < 1.4, li3 takes ~1-2.5 s and polylog_tower ~3.5-6 s.
+So milliseconds hold per moduli point (5177 terms), not for thousands of
+points at once.
+
+On the branch cut (real z > 1) the value is continuous from above when the
+imaginary part is +0.0 and from below when it is -0.0, as with np.log.
+
+Usage:
+    from mcallister.polylog import li3, polylog_tower
+
+    li3(np.exp(2j * np.pi * z))                 # any shape
+    L3, L2, L1, L0 = polylog_tower(q)           # Li_3 .. Li_0 in one pass
+"""
+
+from decimal import Decimal, localcontext
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+SERIES_RADIUS = 0.5
+
+# Bands for the power series: each band is summed with just enough terms for
+# its largest |z|. Below the first, Li_n(z) = z in float64; deep in the LCS
+# region that covers nearly every q^d.
+SERIES_BANDS = (1e-17, 1e-6, 1e-3, 0.05, SERIES_RADIUS)
+
+# Elements per block: large arrays are processed in pieces that stay in cache
+BLOCK_SIZE = 1 << 14
+
+# Terms in the log expansion; |μ| / 2π <= 0.52 in the region it is used for
+LOG_SERIES_TERMS = {np.dtype(np.float64): 60, np.dtype(np.longdouble): 76}
+
+# Constants to more digits than long double holds
+_ZETA2 = "1.64493406684822643647241516664602519"
+_ZETA3 = "1.20205690315959428539973816151144999"
+
+
+def bernoulli_numbers(n: int) -> list[Fraction]:
+    """B_0 .. B_n (with B_1 = -1/2), exactly, via the Akiyama-Tanigawa algorithm."""
+    result = []
+    a = [Fraction(0)] * (n + 1)
+    for m in range(n + 1):
+        a[m] = Fraction(1, m + 1)
+        for j in range(m, 0, -1):
+            a[j - 1] = j * (a[j - 1] - a[j])
+        result.append(a[0])
+    if n >= 1:
+        result[1] = -result[1]  # Akiyama-Tanigawa gives B_1 = +1/2
+    return result
+
+
+def _to_real(value: Fraction, real: np.dtype) -> np.floating:
+    # Via a 40-digit decimal string: long double cannot take huge ints directly
+    with localcontext() as ctx:
+        ctx.prec = 40
+        return real.type(str(Decimal(value.numerator) / Decimal(value.denominator)))
+
+
+@lru_cache(maxsize=None)
+def _constants(real: np.dtype) -> dict:
+    """Series coefficients in the given precision (float64 or longdouble)."""
+    terms = LOG_SERIES_TERMS[real]
+    bernoulli = bernoulli_numbers(terms + 1)
+    # ζ(-m) = (-1)^m B_{m+1} / (m + 1)
+    zeta_neg = [(-1) ** m * bernoulli[m + 1] / (m + 1) for m in range(terms + 1)]
+    factorial = Fraction(1)
+    inv_factorials = []
+    for k in range(terms + 1):
+        if k:
+            factorial *= k
+        inv_factorials.append(1 / factorial)
+
+    def log_coefficients(n: int) -> np.ndarray:
+        # c_k = ζ(n - k) / k! for k >= n, i.e. ζ(-(k - n)) / k!
+        return np.array(
+            [_to_real(zeta_neg[k - n] * inv_factorials[k], real) for k in range(n, terms + 1)],
+            dtype=real,
+        )
+
+    return {
+        "zeta2": real.type(_ZETA2),
+        "zeta3": real.type(_ZETA3),
+        "log_coeffs": {2: log_coefficients(2), 3: log_coefficients(3)},
+    }
+
+
+def _as_complex(z, extended: bool) -> tuple[np.ndarray, np.dtype]:
+    z = np.asarray(z)
+    if extended or z.dtype in (np.longdouble, np.clongdouble):
+        return np.asarray(z, dtype=np.clongdouble), np.dtype(np.longdouble)
+    return np.asarray(z, dtype=np.complex128), np.dtype(np.float64)
+
+
+def _abs2(z: np.ndarray) -> np.ndarray:
+    return z.real * z.real + z.imag * z.imag
+
+
+def _piecewise(z: np.ndarray, r2: np.ndarray, mask: np.ndarray, inside, outside) -> np.ndarray:
+    """inside(z, r2) where mask, outside(z, r2) elsewhere; no copies when one region is empty."""
+    if mask.all():
+        return inside(z, r2)
+    if not mask.any():
+        return outside(z, r2)
+    out = np.empty_like(z)
+    out[mask] = inside(z[mask], r2[mask])
+    rest = ~mask
+    out[rest] = outside(z[rest], r2[rest])
+    return out
+
+
+def _horner(coeffs, x: np.ndarray) -> np.ndarray:
+    """Σ coeffs[k] x^k."""
+    result = np.full_like(x, coeffs[-1])
+    for c in coeffs[-2::-1]:
+        result *= x
+        result += c
+    return result
+
+
+@lru_cache(maxsize=None)
+def _series_coefficients(n: int, upper: float, real: np.dtype) -> np.ndarray:
+    """[0, 1, 1/2^n, ..., 1/K^n] with K such that upper^K / K^n < eps / 4."""
+    k = np.arange(1, 200)
+    terms = int(k[np.log(upper) * k - n * np.log(k) < np.log(np.finfo(real).eps / 4)][0])
+    return np.concatenate([[0], 1 / np.arange(1, terms + 1, dtype=real) ** n]).astype(real)
+
+
+def _power_series(z: np.ndarray, r2: np.ndarray, n: int, real: np.dtype) -> np.ndarray:
+    """Li_n(z) = Σ z^k / k^n for |z| <= 1/2, with terms chosen per |z| band."""
+    r2_max = r2.max(initial=0)
+    for i, upper in enumerate(SERIES_BANDS):
+        if r2_max <= upper * upper:
+            coeffs = _series_coefficients(n, upper, real)
+            if i == 0:
+                return _horner(coeffs, z)
+            # Split off the smaller arguments, which need fewer terms
+            lower = SERIES_BANDS[i - 1]
+            return _piecewise(
+                z, r2, r2 <= lower * lower,
+                lambda zs, r2s: _power_series(zs, r2s, n, real),
+                lambda zs, r2s: _horner(coeffs, zs),
+            )
+    raise ValueError("power series used outside |z| <= 1/2")
+
+
+def _tower_series(z: np.ndarray, r2: np.ndarray, real: np.dtype) -> tuple[np.ndarray, ...]:
+    """(Li_3, Li_2, Li_1, Li_0) for |z| <= 1/2, banded like _power_series with one split for all four."""
+    r2_max = r2.max(initial=0)
+    for i, upper in enumerate(SERIES_BANDS):
+        if r2_max <= upper * upper:
+            break
+    else:
+        raise ValueError("power series used outside |z| <= 1/2")
+
+    def horner(zs):
+        if len(_series_coefficients(0, upper, real)) == 2:
+            return tuple(zs.copy() for _ in range(4))   # Li_n(z) = z to working precision
+        return tuple(_horner(_series_coefficients(n, upper, real), zs) for n in (3, 2, 1, 0))
+
+    # Split off the smaller arguments, which need fewer terms
+    small = r2 <= SERIES_BANDS[i - 1] ** 2 if i else None
+    if small is None or not small.any():
+        return horner(z)
+    out = tuple(np.empty_like(z) for _ in range(4))
+    rest = ~small
+    for o, lo, hi in zip(out, _tower_series(z[small], r2[small], real), horner(z[rest])):
+        o[small] = lo
+        o[rest] = hi
+    return out
+
+
+def _log_series(z: np.ndarray, n: int, real: np.dtype) -> np.ndarray:
+    """Li_n(e^μ) about μ = 0, for 1/2 < |z| <= 1."""
+    c = _constants(real)
+    mu = np.log(z)
+    # Harmonic/log term μ^{n-1}/(n-1)! (H_{n-1} - log(-μ)); its limit at μ = 0 is 0
+    nonzero = mu != 0
+    log_neg_mu = np.log(np.where(nonzero, -mu, 1))
+    tail = mu ** n * _horner(c["log_coeffs"][n], mu)
+    if n == 2:
+        head = c["zeta2"] + np.where(nonzero, mu * (1 - log_neg_mu), 0)
+    else:
+        head = c["zeta3"] + c["zeta2"] * mu + np.where(nonzero, mu * mu / 2 * (real.type(1.5) - log_neg_mu), 0)
+    return head + tail
+
+
+def _li_unit_disk(z: np.ndarray, r2: np.ndarray, n: int, real: np.dtype) -> np.ndarray:
+    return _piecewise(
+        z, r2, r2 <= SERIES_RADIUS ** 2,
+        lambda zs, r2s: _power_series(zs, r2s, n, real),
+        lambda zs, r2s: _log_series(zs, n, real),
+    )
+
+
+def _li_inverted(z: np.ndarray, r2: np.ndarray, n: int, real: np.dtype) -> np.ndarray:
+    c = _constants(real)
+    inv = _li_unit_disk(1 / z, 1 / r2, n, real)
+    log_neg = np.log(-z)
+    if n == 2:
+        # Li_2(z) = -Li_2(1/z) - π²/6 - log²(-z)/2
+        return -inv - c["zeta2"] - log_neg * log_neg / 2
+    # Li_3(z) = Li_3(1/z) - π²/6 log(-z) - log³(-z)/6
+    return inv - c["zeta2"] * log_neg - log_neg ** 3 / 6
+
+
+def _closed_form(z: np.ndarray, n: int) -> np.ndarray:
+    """Li_1 and Li_0 in closed form."""
+    return -np.log1p(-z) if n == 1 else z / (1 - z)
+
+
+def _li_block(z: np.ndarray, n: int, real: np.dtype) -> np.ndarray:
+    r2 = _abs2(z)
+    if n <= 1:
+        # Closed forms are exact but cost a complex log/division; the short
+        # power series is cheaper for the small arguments that dominate
+        return _piecewise(
+            z, r2, r2 <= SERIES_RADIUS ** 2,
+            lambda zs, r2s: _power_series(zs, r2s, n, real),
+            lambda zs, r2s: _closed_form(zs, n),
+        )
+    return _piecewise(
+        z, r2, r2 <= 1,
+        lambda zs, r2s: _li_unit_disk(zs, r2s, n, real),
+        lambda zs, r2s: _li_inverted(zs, r2s, n, real),
+    )
+
+
+def _tower_block(z: np.ndarray, real: np.dtype) -> tuple[np.ndarray, ...]:
+    """(Li_3, Li_2, Li_1, Li_0); the power series region is shared by all four."""
+    r2 = _abs2(z)
+    series = r2 <= SERIES_RADIUS ** 2
+    if series.all():
+        return _tower_series(z, r2, real)
+    out = tuple(np.empty_like(z) for _ in range(4))
+    if series.any():
+        for o, part in zip(out, _tower_series(z[series], r2[series], real)):
+            o[series] = part
+    rest = ~series
+    for o, n in zip(out, (3, 2, 1, 0)):
+        o[rest] = _li_block(z[rest], n, real)
+    return out
+
+
+def _blockwise(func, z: np.ndarray, outputs: int) -> tuple[np.ndarray, ...]:
+    """Apply func to cache-sized blocks of z.ravel(); func returns `outputs` arrays."""
+    flat = z.reshape(-1)
+    if flat.size <= BLOCK_SIZE:
+        return tuple(out.reshape(z.shape) for out in func(flat))
+    results = tuple(np.empty_like(flat) for _ in range(outputs))
+    for start in range(0, flat.size, BLOCK_SIZE):
+        for out, block in zip(results, func(flat[start:start + BLOCK_SIZE])):
+            out[start:start + BLOCK_SIZE] = block
+    return tuple(out.reshape(z.shape) for out in results)
+
+
+def li2(z, extended: bool = False) -> np.ndarray:
+    """Dilogarithm Li_2(z) for complex arrays."""
+    z, real = _as_complex(z, extended)
+    return _blockwise(lambda block: (_li_block(block, 2, real),), z, 1)[0]
+
+
+def li3(z, extended: bool = False) -> np.ndarray:
+    """Trilogarithm Li_3(z) for complex arrays."""
+    z, real = _as_complex(z, extended)
+    return _blockwise(lambda block: (_li_block(block, 3, real),), z, 1)[0]
+
+
+def li1(z, extended: bool = False) -> np.ndarray:
+    """Li_1(z) = -log(1 - z)."""
+    z, real = _as_complex(z, extended)
+    return _blockwise(lambda block: (_li_block(block, 1, real),), z, 1)[0]
+
+
+def li0(z, extended: bool = False) -> np.ndarray:
+    """Li_0(z) = z / (1 - z)."""
+    z, real = _as_complex(z, extended)
+    return _blockwise(lambda block: (_li_block(block, 0, real),), z, 1)[0]
+
+
+def _over_z(values: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """values / z, with the z -> 0 limit 1 (Li_n(z) / z -> 1)."""
+    zero = z == 0
+    return np.where(zero, 1, values / np.where(zero, 1, z))
+
+
+def dli2(z, extended: bool = False) -> np.ndarray:
+    """d/dz Li_2(z) = Li_1(z) / z."""
+    z, _ = _as_complex(z, extended)
+    return _over_z(li1(z), z)
+
+
+def dli3(z, extended: bool = False) -> np.ndarray:
+    """d/dz Li_3(z) = Li_2(z) / z."""
+    z, _ = _as_complex(z, extended)
+    return _over_z(li2(z), z)
+
+
+def polylog_tower(z, extended: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (Li_3, Li_2, Li_1, Li_0) at z.
+
+    These are the successive derivatives z d/dz of Li_3, i.e. what the
+    prepotential and its first three derivatives need for each instanton term.
+    """
+    z, real = _as_complex(z, extended)
+    return _blockwise(lambda block: _tower_block(block, real), z, 4)
@@ -0,0 +1,196 @@
+"""
+Batched prepotential F(z) and its first three derivatives at many moduli points.
+
+Convention (arXiv:2107.09064 eq. 2.6, mirror-side quantities):
+
+    F(z) = -1/6 κ_abc z^a z^b z^c + 1/2 a_ab z^a z^b + b_a z^a + c + F_inst(z)
+    F_inst(z) = -1/(2πi)^3 Σ_d N_d Li_3(e^{2πi d·z})
+
+with b_a = c_a / 24 (second Chern class) and c = ζ(3) χ / (2 (2πi)^3).
+
+For a batch of P points and C curves, every instanton quantity is a matrix
+product or reduction:
+
+    X = z @ curves.T                (P, C), one matrix product
+    Li_k = Li_k(exp(2πi X))         via polylog_tower, k = 3..0
+    F_inst   ∝ (Li_3 · N).sum(1)
+    ∂F_inst  ∝ (Li_2 · N) @ d        (P, h)
+    ∂²F_inst ∝ (Li_1 · N) @ d⊗d      (P, h²)
+    ∂³F_inst ∝ (Li_0 · N) @ d⊗d⊗d    (P, h³)
+
+so the cost is linear in curves × points. The d⊗d and d⊗d⊗d tables are only
+built when a derivative of that order is requested and the table is small
+(C × h^k <= TABLE_ELEMENTS); otherwise, as for the 214-modulus side, the
+contraction runs over the curves directly. Points are processed in chunks
+that keep the intermediates in cache, spread over a thread pool (NumPy
+releases the GIL in these kernels).
+
+Usage:
+    from mcallister import PaperData
+    from mcallister.prepotential import PrepotentialEngine, curves_in_basis
+
+    data = PaperData("4-214-647")
+    curves = curves_in_basis(data["dual_curves"], basis)   # basis from CYTools
+    engine = PrepotentialEngine(curves, data.exact("dual_curves_gv"), kappa)
+    result = engine.evaluate(z)                            # z: (P, h) complex
+    result.F, result.dF, result.ddF, result.dddF
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from .intersections import as_intersection_tensor
+from .polylog import li1, li2, li3, polylog_tower
+
+TWO_PI_I = 2j * np.pi
+
+# Prefactor of Σ N_d Li_3(q^d) in F (eq. 2.6)
+INSTANTON_PREFACTOR = -1 / TWO_PI_I ** 3
+
+# Target size of the per-chunk (points × curves) intermediates
+CHUNK_ELEMENTS = 1 << 16
+
+# Largest d⊗d / d⊗d⊗d table (curves × h^k elements) kept in memory
+TABLE_ELEMENTS = 1 << 22
+
+
+def curves_in_basis(ambient_curves: np.ndarray, basis) -> np.ndarray:
+    """
+    Curve classes in a divisor basis from paper_data's ambient form.
+
+    dual_curves.dat gives each curve as its intersection numbers with the
+    canonical divisor (column 0) and the prime toric divisors (column i for
+    point i), so the charges in a basis of toric divisors are those columns.
+    """
+    return np.asarray(ambient_curves)[:, np.asarray(basis)]
+
+
+@dataclass
+class Prepotential:
+    """F and derivatives at P points; derivatives above the requested order are None."""
+    F: np.ndarray                   # (P,)
+    dF: np.ndarray | None = None    # (P, h)
+    ddF: np.ndarray | None = None   # (P, h, h)
+    dddF: np.ndarray | None = None  # (P, h, h, h)
+
+
+class PrepotentialEngine:
+    """
+    Prepotential for fixed geometry (curves, GV invariants, intersection numbers).
+
+    Args:
+        curves: (C, h) integer curve classes in the same basis as z
+        gv: (C,) GV invariants (ints, possibly beyond int64, or floats)
+        kappa: intersection numbers κ_abc (IntersectionTensor or dense (h, h, h))
+        a: (h, h) quadratic coefficients a_ab (default 0)
+        b: (h,) linear coefficients b_a (default 0)
+        c: constant term (default 0)
+        extended: evaluate in long double instead of float64
+        workers: threads for chunked evaluation (default: all cores)
+    """
+
+    def __init__(self, curves, gv, kappa, a=None, b=None, c=0.0,
+                 extended: bool = False, workers: int | None = None):
+        self.real = np.longdouble if extended else np.float64
+        self.complex = np.clongdouble if extended else np.complex128
+        self.curves = np.asarray(curves).astype(self.real)
+        n_curves, h = self.curves.shape
+        self.h = h
+        # Via str so GV invariants beyond int64 convert without overflow
+        self.gv = np.array([self.real(str(n)) for n in np.asarray(gv).ravel()], dtype=self.real)
+        if self.gv.shape != (n_curves,):
+            raise ValueError(f"{n_curves} curves but {self.gv.size} GV invariants")
+        self.kappa = as_intersection_tensor(kappa)
+        self.a = np.zeros((h, h), dtype=self.real) if a is None else np.asarray(a, dtype=self.real)
+        self.b = np.zeros(h, dtype=self.real) if b is None else np.asarray(b, dtype=self.real)
+        self.c = self.complex(c)
+        self.workers = workers or os.cpu_count() or 1
+        self._tables = {}
+
+    def evaluate(self, z, order: int = 3) -> Prepotential:
+        """F and its derivatives up to `order` (0-3) at z of shape (P, h) or (h,)."""
+        z = np.asarray(z, dtype=self.complex)
+        single = z.ndim == 1
+        z = np.atleast_2d(z)
+        if z.shape[1] != self.h:
+            raise ValueError(f"z has {z.shape[1]} components, expected h = {self.h}")
+
+        result = self._classical(z, order)
+        # Built here, before the thread pool, so chunks share them
+        tables = [self._table(k) for k in range(2, order + 1)]
+        width = len(self.curves) * (self.h if any(t is None for t in tables) else 1)
+        chunk = max(1, CHUNK_ELEMENTS // max(1, width))
+        starts = range(0, len(z), chunk)
+        if self.workers > 1 and len(starts) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                parts = list(pool.map(lambda s: self._instantons(z[s:s + chunk], order), starts))
+        else:
+            parts = [self._instantons(z[s:s + chunk], order) for s in starts]
+
+        for k, field in enumerate(("F", "dF", "ddF", "dddF")[:order + 1]):
+            inst = np.concatenate([part[k] for part in parts])
+            value = getattr(result, field) + inst.reshape(getattr(result, field).shape)
+            setattr(result, field, value[0] if single else value)
+        return result
+
+    def _classical(self, z: np.ndarray, order: int) -> Prepotential:
+        kappa, a, b = self.kappa, self.a, self.b
+        kz = kappa.matrix(z)                                  # κ_abc z^c
+        kzz = kappa.quadratic(z)                              # κ_abc z^b z^c
+        az = z @ a.T
+        result = Prepotential(F=-kappa.cubic(z) / 6 + np.einsum("pa,pa->p", az, z) / 2 + z @ b + self.c)
+        if order >= 1:
+            result.dF = -kzz / 2 + az + b
+        if order >= 2:
+            result.ddF = -kz + a
+        if order >= 3:
+            result.dddF = np.broadcast_to(-np.asarray(kappa), (len(z),) + kappa.shape).astype(self.complex)
+        return result
+
+    def _table(self, k: int) -> np.ndarray | None:
+        """d^{⊗k} per curve, flattened to (C, h^k); None when over TABLE_ELEMENTS."""
+        if k not in self._tables:
+            d = self.curves
+            n_curves, h = d.shape
+            table = None
+            if n_curves * h ** k <= TABLE_ELEMENTS:
+                table = d
+                for _ in range(k - 1):
+                    table = (table[:, :, None] * d[:, None, :]).reshape(n_curves, -1)
+            self._tables[k] = table
+        return self._tables[k]
+
+    def _moment(self, w: np.ndarray, k: int) -> np.ndarray:
+        """Σ_d w_pd d^{⊗k}, flattened to (P, h^k)."""
+        d = self.curves
+        table = d if k == 1 else self._table(k)
+        if table is not None:
+            return w @ table
+        # Contract over the curves without the C × h^k table
+        n_points, h = len(w), self.h
+        wd = (w[:, :, None] * d).transpose(0, 2, 1)              # (P, h, C)
+        if k == 2:
+            return (wd @ d).reshape(n_points, h * h)
+        # One slice per a, over the curves with d_a != 0 (most, for large h)
+        out = np.zeros((n_points, h, h, h), dtype=w.dtype)
+        for a in range(h):
+            rows = np.flatnonzero(d[:, a])
+            if len(rows):
+                out[:, a] = (wd[:, :, rows] * d[rows, a]) @ d[rows]
+        return out.reshape(n_points, h ** 3)
+
+    def _instantons(self, z: np.ndarray, order: int) -> list[np.ndarray]:
+        """[F_inst, ∂F_inst, ∂²F_inst (flat), ∂³F_inst (flat)] for one chunk of points."""
+        q = np.exp(TWO_PI_I * (z @ self.curves.T))               # (P, C)
+        if order == 3:
+            tower = polylog_tower(q)
+        else:
+            tower = [li(q) for li in (li3, li2, li1)[:order + 1]]
+        prefactor = self.complex(INSTANTON_PREFACTOR)
+        out = [prefactor * (tower[0] @ self.gv)]
+        for k in range(1, order + 1):
+            out.append(prefactor * TWO_PI_I ** k * self._moment(tower[k] * self.gv, k))
+        return out
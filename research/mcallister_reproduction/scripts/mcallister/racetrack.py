@@ -0,0 +1,353 @@
+"""
+Racetrack superpotentials and a tiered W₀ evaluator.
+
+A racetrack is the instanton part of W along a perturbatively flat direction,
+
+    W(τ) = ζ Σ_i c_i e^{2πiτ e_i},        ζ = 1/(2^{3/2} π^{5/2})  (eq. 2.22)
+
+with exact rational coefficients c_i and exponents e_i. Solving ∂_τW = 0 for
+the two leading terms gives (eq. 6.60-6.61)
+
+    q^{e_1-e_0} = -c_0 e_0 / (c_1 e_1),   W₀ = ζ c_0 q^{e_0} (1 - e_0/e_1)
+
+Along z = pτ the classical part of W vanishes and what remains is
+-√(2/π) M^a ∂_a F_inst = -ζ Σ_d (M·d) N_d Li_2(e^{2πiτ p·d}). Expanding Li_2
+in multi-covers, extract_racetrack() collects the exponent k p·d with
+coefficient -(M·d) N_d / k², grouping curves by the exact value of p·d.
+
+W₀ is tiny (~10⁻⁹⁰ for 4-214-647) and arises from cancellation between the
+terms, so evaluating W at the root in float64 gives noise. Instead:
+
+1. screen(): the closed form in log-domain float64 for a whole batch of
+   candidates, with a bound on ln|W₀| from rounding and the neglected terms.
+2. refine(): only candidates whose lower bound passes the cut go to mpmath,
+   at a precision chosen from the cancellation depth plus guard digits. The
+   full racetrack root is found with findroot and W₀ is re-evaluated with
+   extra digits to certify the result.
+
+Usage:
+    from mcallister.racetrack import Racetrack, evaluate_W0, extract_racetracks
+
+    racetrack = Racetrack(coefficients=(-5, 2560), exponents=(Fraction(32, 110), Fraction(33, 110)))
+    result = evaluate_W0([racetrack]).refined[0]
+    result.W0, result.g_s, result.certified_digits
+
+    # or from the curve data, for many flat directions at once; directions
+    # with no valid racetrack give None and screen as invalid
+    racetracks = extract_racetracks(vacua.p_exact, vacua.M, curves, gv)
+    evaluation = evaluate_W0(racetracks, max_log10_W0=-50)
+"""
+
+import math
+from dataclasses import dataclass, field
+from fractions import Fraction
+
+import numpy as np
+from mpmath import mp, mpc, mpf
+
+ZETA = 1 / (2 ** 1.5 * np.pi ** 2.5)
+
+# Digits carried beyond the cancellation depth in the mpmath tier
+GUARD_DIGITS = 15
+
+# Rounding error per float64 operation in the screen, with headroom
+SCREEN_ULPS = 8 * np.finfo(float).eps
+
+# Terms kept by extract_racetrack: the leading pair plus one to bound the rest
+RACETRACK_TERMS = 3
+
+# Safety factor on the neglected-term bound
+TAIL_MARGIN = 2.0
+
+LN10 = math.log(10)
+
+
+@dataclass(frozen=True)
+class Racetrack:
+    """W(τ) = ζ Σ c_i e^{2πiτ e_i}, stored with exponents in ascending order."""
+    coefficients: tuple[Fraction, ...]
+    exponents: tuple[Fraction, ...]
+
+    def __post_init__(self):
+        if len(self.coefficients) != len(self.exponents):
+            raise ValueError("Racetrack needs one coefficient per exponent")
+        if len(self.exponents) < 2:
+            raise ValueError("Racetrack needs at least two terms")
+        terms = sorted(zip(map(Fraction, self.exponents), map(Fraction, self.coefficients)))
+        object.__setattr__(self, "exponents", tuple(e for e, _ in terms))
+        object.__setattr__(self, "coefficients", tuple(c for _, c in terms))
+
+
+@dataclass
+class Screen:
+    """float64 estimates for N candidates; entries where valid is False are meaningless."""
+    valid: np.ndarray          # (N,) weak-coupling root exists (Im τ > 0)
+    tau: np.ndarray            # (N,) two-term F-term root
+    g_s: np.ndarray            # (N,) 1 / Im τ
+    log10_W0: np.ndarray       # (N,)
+    log10_error: np.ndarray    # (N,) bound on |log10|W₀| error|
+    log10_scale: np.ndarray    # (N,) log10 of the largest term of W at τ
+
+
+@dataclass
+class Refined:
+    """mpmath result for one candidate."""
+    tau: mpc
+    W0: mpc
+    g_s: float
+    log10_W0: float
+    dps: int
+    certified_digits: float
+
+
+@dataclass
+class W0Evaluation:
+    """Screen for every candidate plus mpmath results for the escalated ones."""
+    screen: Screen
+    refined: dict[int, Refined] = field(default_factory=dict)
+    unresolved: list[int] = field(default_factory=list)   # escalated, no F-term root found
+
+    @property
+    def log10_W0(self) -> np.ndarray:
+        """Best available log10|W₀| per candidate (refined where available)."""
+        values = np.where(self.screen.valid, self.screen.log10_W0, np.nan)
+        for i, result in self.refined.items():
+            values[i] = result.log10_W0
+        return values
+
+
+def _pack(racetracks: list[Racetrack | None]) -> tuple[np.ndarray, np.ndarray]:
+    """Coefficient and exponent arrays (N, T), padded with zero-coefficient terms.
+
+    None entries stay all-zero, which the screen marks invalid.
+    """
+    width = max((len(r.exponents) for r in racetracks if r is not None), default=2)
+    coefficients = np.zeros((len(racetracks), width))
+    exponents = np.zeros((len(racetracks), width))
+    for i, r in enumerate(racetracks):
+        if r is None:
+            continue
+        n = len(r.exponents)
+        coefficients[i, :n] = [float(c) for c in r.coefficients]
+        exponents[i, :n] = [float(e) for e in r.exponents]
+        exponents[i, n:] = exponents[i, n - 1]
+    return coefficients, exponents
+
+
+def screen_arrays(coefficients: np.ndarray, exponents: np.ndarray) -> Screen:
+    """
+    Screen candidates given as (N, T) arrays sorted by exponent.
+
+    Zero coefficients pad candidates with fewer terms.
+    """
+    c0, c1 = coefficients[:, 0], coefficients[:, 1]
+    e0, e1 = exponents[:, 0], exponents[:, 1]
+    gap = e1 - e0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rho = -(c0 * e0) / (c1 * e1)                          # q^gap at the root
+        ln_rho = np.log(np.abs(rho))
+        valid = (gap > 0) & (e0 > 0) & (c0 != 0) & (c1 != 0) & (ln_rho < 0)
+
+        im_tau = -ln_rho / (2 * np.pi * gap)
+        re_tau = np.where(rho < 0, 0.5, 0.0) / gap
+        ln_q = -2 * np.pi * im_tau                            # ln|q|
+
+        parts = np.stack([
+            np.full_like(c0, math.log(ZETA)),
+            np.log(np.abs(c0)),
+            e0 / gap * ln_rho,
+            np.log1p(-e0 / e1),
+        ])
+        ln_W0 = parts.sum(axis=0)
+        # ln ρ carries an absolute error of a few ulps that e_0/gap amplifies,
+        # and e_1 - e_0 loses e_1/gap ulps to cancellation
+        conditioning = e0 / gap * (1 + np.abs(ln_rho)) + e1 / gap * np.abs(parts[2])
+        rounding = SCREEN_ULPS * (np.abs(parts).sum(axis=0) + conditioning)
+
+        # Terms beyond the leading pair, relative to W₀, doubled to cover the
+        # shift of the root they cause; a tail of order W₀ leaves no bound
+        ln_terms = math.log(ZETA) + np.log(np.abs(coefficients)) + exponents * ln_q[:, None]
+        ln_tail = np.logaddexp.reduce(ln_terms[:, 2:], axis=1, initial=-np.inf) - ln_W0
+        tail = np.minimum(TAIL_MARGIN * np.exp(ln_tail), 1.0)
+        ln_error = rounding - np.log1p(-tail)
+        tau = re_tau + 1j * im_tau
+        g_s = 1 / im_tau
+
+    return Screen(
+        valid=valid,
+        tau=tau,
+        g_s=g_s,
+        log10_W0=ln_W0 / LN10,
+        log10_error=ln_error / LN10,
+        log10_scale=np.max(ln_terms, axis=1) / LN10,
+    )
+
+
+def screen(racetracks: list[Racetrack | None]) -> Screen:
+    """float64 log-domain estimate of W₀ and g_s for each racetrack (None: invalid)."""
+    return screen_arrays(*_pack(racetracks))
+
+
+def _mp(value: Fraction) -> mpf:
+    return mpf(value.numerator) / value.denominator
+
+
+def _solve(racetrack: Racetrack, dps: int) -> tuple[mpc, mpc]:
+    """F-term root τ and W(τ) at `dps` digits."""
+    with mp.workdps(dps):
+        zeta = 1 / (mpf(2) ** mpf(1.5) * mp.pi ** mpf(2.5))
+        c = [_mp(x) for x in racetrack.coefficients]
+        e = [_mp(x) for x in racetrack.exponents]
+        two_pi_i = mpc(0, 2 * mp.pi)
+
+        def W(tau):
+            return zeta * mp.fsum(ci * mp.exp(two_pi_i * ei * tau) for ci, ei in zip(c, e))
+
+        # ∂_τW divided by its leading term, so findroot sees an O(1) function
+        def dW_scaled(tau):
+            return mp.fsum(ci * ei / (c[0] * e[0]) * mp.exp(two_pi_i * (ei - e[0]) * tau)
+                           for ci, ei in zip(c, e))
+
+        tau = mp.log(mpc(-(c[0] * e[0]) / (c[1] * e[1]))) / (two_pi_i * (e[1] - e[0]))
+        if len(c) > 2:
+            tau = mp.findroot(dW_scaled, tau)
+        return tau, W(tau)
+
+
+def refine(racetrack: Racetrack, log10_W0: float, log10_scale: float,
+           guard_digits: int = GUARD_DIGITS) -> Refined:
+    """
+    Solve the full racetrack in mpmath.
+
+    The working precision covers the digits lost to cancellation between the
+    terms (log10_scale - log10_W0 from the screen) plus guard_digits; a second
+    evaluation with guard_digits more certifies how many digits agree.
+    """
+    dps = max(0, math.ceil(log10_scale - log10_W0)) + guard_digits
+    tau, W0 = _solve(racetrack, dps)
+    tau_check, W0_check = _solve(racetrack, dps + guard_digits)
+    with mp.workdps(dps + guard_digits):
+        difference = abs(W0_check - W0)
+        certified = float(-mp.log10(difference / abs(W0_check))) if difference else float(dps)
+        log10_W0 = float(mp.log10(abs(W0_check)))
+    return Refined(
+        tau=tau_check,
+        W0=W0_check,
+        g_s=float(1 / tau_check.imag),
+        log10_W0=log10_W0,
+        dps=dps,
+        certified_digits=min(certified, float(dps)),
+    )
+
+
+def evaluate_W0(racetracks: list[Racetrack | None], max_log10_W0: float = math.inf,
+                guard_digits: int = GUARD_DIGITS) -> W0Evaluation:
+    """
+    Screen all racetracks, then refine those that may have log10|W₀| ≤ max_log10_W0.
+
+    A candidate is rejected in float64 only when its error bound rules it
+    out; candidates straddling the cut or with large neglected-term bounds
+    are escalated along with the clearly promising ones.
+    """
+    result = W0Evaluation(screen=screen(racetracks))
+    s = result.screen
+    escalate = s.valid & (s.log10_W0 - s.log10_error <= max_log10_W0)
+    for i in np.flatnonzero(escalate):
+        try:
+            result.refined[int(i)] = refine(racetracks[i], s.log10_W0[i], s.log10_scale[i], guard_digits)
+        except ValueError:
+            result.unresolved.append(int(i))
+    return result
+
+
+def _as_exact(values) -> np.ndarray:
+    """Object array of Python ints, so products never overflow."""
+    return np.array([int(v) for v in np.asarray(values).ravel()], dtype=object)
+
+
+def _exact_matmul(a, b) -> np.ndarray:
+    """Integer a @ b, in int64 when the result provably fits, else in Python ints."""
+    a, b = np.asarray(a), np.asarray(b)
+    bound = int(np.abs(a).max(initial=0)) * int(np.abs(b).sum(axis=0).max(initial=0))
+    if bound < 2 ** 62:
+        return a.astype(np.int64) @ b.astype(np.int64)
+    return a.astype(object) @ b.astype(object)
+
+
+def _racetrack_terms(levels: np.ndarray, weights: np.ndarray, cutoff: int) -> dict[int, Fraction]:
+    """Nonzero coefficients for every multi-cover exponent k·level ≤ cutoff."""
+    terms: dict[int, Fraction] = {}
+    for k in range(1, cutoff // int(levels.min()) + 1):
+        selected = levels * k <= cutoff
+        keys, inverse = np.unique(levels[selected] * k, return_inverse=True)
+        sums = np.zeros(len(keys), dtype=object)
+        np.add.at(sums, inverse, weights[selected])
+        for key, total in zip(keys.tolist(), sums):
+            terms[key] = terms.get(key, 0) + Fraction(int(total), k * k)
+    return {key: c for key, c in terms.items() if c != 0}
+
+
+def _extract(levels: np.ndarray, weights: np.ndarray, denominator: int, n_terms: int) -> Racetrack:
+    contributing = weights != 0
+    levels, weights = levels[contributing], weights[contributing]
+    if not len(levels):
+        raise ValueError("No curve contributes along p (every M·d N_d is 0)")
+    if (levels <= 0).any():
+        raise ValueError("p·d ≤ 0 for a contributing curve; p is outside the Kähler cone")
+
+    # Raise the cutoff until cancellations leave at least n_terms terms
+    distinct = np.unique(levels)
+    for cutoff in distinct[min(n_terms, len(distinct)) - 1:]:
+        terms = _racetrack_terms(levels, weights, int(cutoff))
+        if len(terms) >= n_terms:
+            break
+    keys = sorted(terms)[:n_terms]
+    # Racetrack raises if fewer than two terms survive
+    return Racetrack(
+        coefficients=tuple(terms[k] for k in keys),
+        exponents=tuple(Fraction(k, denominator) for k in keys),
+    )
+
+
+def _candidates(ps, Ms, curves, gv):
+    """(levels, weights, denominator) per flat direction, all exact."""
+    ps = [[Fraction(x) for x in p] for p in ps]
+    denominators = [math.lcm(*(x.denominator for x in p)) for p in ps]
+    scaled = np.array([[int(x * q) for x in p] for p, q in zip(ps, denominators)], dtype=object)
+    levels = _exact_matmul(curves, scaled.T)                            # (C, S) = p·d × denominator
+    pairings = -_exact_matmul(curves, np.atleast_2d(np.asarray(Ms)).T)  # (C, S) = -M·d
+    gv = _as_exact(gv)
+    for i, denominator in enumerate(denominators):
+        yield levels[:, i], _as_exact(pairings[:, i]) * gv, denominator
+
+
+def extract_racetracks(ps, Ms, curves, gv, n_terms: int = RACETRACK_TERMS) -> list[Racetrack | None]:
+    """
+    Leading racetrack terms along each flat direction p with H-flux M.
+
+    Args:
+        ps: flat directions as rationals, (S, h)
+        Ms: matching M fluxes, (S, h)
+        curves: (C, h) integer curve classes in the basis of p
+        gv: (C,) GV invariants (exact ints)
+        n_terms: terms to keep per racetrack
+
+    Every p is scaled to integers over its common denominator, so p·d for
+    all curves and candidates is one integer matrix product and equal
+    exponents are grouped exactly. Directions without a racetrack (a
+    contributing curve with p·d ≤ 0, no contributing curve, or fewer than two
+    terms left after cancellations) give None instead of stopping the batch.
+    """
+    racetracks = []
+    for levels, weights, denominator in _candidates(ps, Ms, curves, gv):
+        try:
+            racetracks.append(_extract(levels, weights, denominator, n_terms))
+        except ValueError:
+            racetracks.append(None)
+    return racetracks
+
+
+def extract_racetrack(p, M, curves, gv, n_terms: int = RACETRACK_TERMS) -> Racetrack:
+    """Racetrack along a single flat direction p; raises ValueError if there is none."""
+    levels, weights, denominator = next(_candidates([p], [M], curves, gv))
+    return _extract(levels, weights, denominator, n_terms)
@@ -17,16 +17,9 @@ Where:
 - e^K₀ = Kähler potential factor from complex structure (back-calculated ≈ 0.2361)
 """
 
-from pathlib import Path
+from mcallister import PaperData
 
-PROJECT_ROOT = Path(__file__).parent.parent
-DATA_DIR = PROJECT_ROOT / "resources" / "small_cc_2107.09064_source" / "anc" / "paper_data" / "4-214-647"
-
-
-def load_float(filename: str) -> float:
-    """Load a single float from a file."""
-    with open(DATA_DIR / filename) as f:
-        return float(f.read().strip())
+DATA = PaperData("4-214-647")
 
 
 def main() -> dict:
@@ -41,10 +34,10 @@ def main() -> dict:
     # =========================================================================
     print("Loading McAllister data...")
 
-    g_s = load_float("g_s.dat")
-    W_0 = load_float("W_0.dat")
-    V_string = load_float("cy_vol.dat")  # This is V[0] in string frame
-    c_tau = load_float("c_tau.dat")
+    g_s = DATA.scalar("g_s")
+    W_0 = DATA.scalar("W_0")
+    V_string = DATA.scalar("cy_vol")  # This is V[0] in string frame
+    c_tau = DATA.scalar("c_tau")
 
     print(f"  g_s = {g_s}")
     print(f"  W_0 = {W_0}")
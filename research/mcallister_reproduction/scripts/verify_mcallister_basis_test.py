@@ -22,8 +22,12 @@ sys.path.insert(0, 'vendor/cytools_latest')
 
 from cytools import Polytope
 
+from mcallister import PaperData
+from mcallister.flat_vacua import flat_directions, flux_matrices, solve_flat_vacua
+from mcallister.intersections import IntersectionTensor
+
 # McAllister data for 4-214-647
-DATA_DIR = "resources/small_cc_2107.09064_source/anc/paper_data/4-214-647"
+DATA = PaperData("4-214-647")
 
 def load_mcallister_data():
     """Load McAllister's flux vectors and expected results."""
@@ -40,10 +44,8 @@ def load_mcallister_data():
     ])
 
     # Also load from files to verify
-    with open(f"{DATA_DIR}/K_vec.dat") as f:
-        K_file = np.array([int(x) for x in f.read().strip().split(',')])
-    with open(f"{DATA_DIR}/M_vec.dat") as f:
-        M_file = np.array([int(x) for x in f.read().strip().split(',')])
+    K_file = DATA["K_vec"]
+    M_file = DATA["M_vec"]
 
     print("McAllister flux vectors:")
     print(f"  K (paper eq. 6.55): {K_paper}")
@@ -60,18 +62,7 @@ def load_mcallister_data():
 
 def load_dual_polytope():
     """Load the dual polytope (h11=4, h21=214) from McAllister data."""
-    with open(f"{DATA_DIR}/dual_points.dat") as f:
-        lines = f.readlines()
-
-    # Parse points - each line is comma-separated coordinates
-    points = []
-    for line in lines:
-        line = line.strip()
-        if line:
-            coords = [int(x) for x in line.split(',')]
-            points.append(coords)
-
-    points = np.array(points)
+    points = np.array(DATA["dual_points"])
     print(f"\nLoaded dual polytope: {len(points)} points")
     print(f"  Points shape: {points.shape}")
 
@@ -130,21 +121,13 @@ def test_cytools_basis():
     print(f"  Type: {type(kappa_dict)}")
     print(f"  Number of entries: {len(kappa_dict)}")
 
-    # Convert dict to 3D array for easier manipulation
-    kappa = np.zeros((h11, h11, h11))
-    for (i, j, k), val in kappa_dict.items():
-        # Symmetrize
-        kappa[i, j, k] = val
-        kappa[i, k, j] = val
-        kappa[j, i, k] = val
-        kappa[j, k, i] = val
-        kappa[k, i, j] = val
-        kappa[k, j, i] = val
+    # Symmetric tensor storing one entry per i ≤ j ≤ k
+    kappa = IntersectionTensor.from_entries(kappa_dict, h11)
 
     # Print all non-zero intersection numbers
-    print("\n  Non-zero κ_ijk (dict format):")
-    for (i, j, k), val in sorted(kappa_dict.items()):
-        print(f"    κ_{i}{j}{k} = {val}")
+    print(f"\n  Non-zero κ_ijk (i ≤ j ≤ k, {kappa.nnz} stored):")
+    for (i, j, k), val in zip(kappa.indices.tolist(), kappa.values):
+        print(f"    κ_{i}{j}{k} = {val:g}")
 
     return cy, kappa
 
@@ -166,27 +149,29 @@ def test_demirtas_lemma(cy, kappa):
 
     K_paper, M_paper, p_paper = load_mcallister_data()
 
-    h11 = cy.h11()
-
     # Build N_ab = κ̃_abc M^c
     print("\nBuilding N_ab = κ̃_abc M^c...")
-    N = np.zeros((h11, h11))
-    for a in range(h11):
-        for b in range(h11):
-            for c in range(h11):
-                N[a, b] += kappa[a, b, c] * M_paper[c]
+    N = flux_matrices(kappa, M_paper)[0]
+    det, p = flat_directions(kappa, K_paper, M_paper)
 
     print(f"  N matrix:\n{N}")
-    print(f"  det(N) = {np.linalg.det(N)}")
+    print(f"  det(N) = {det[0]}")
 
-    if abs(np.linalg.det(N)) < 1e-10:
+    if abs(det[0]) < 1e-10:
         print("  ERROR: N is singular, cannot compute p!")
         return None
 
     # Compute p = N⁻¹ K
     print("\nComputing p = N⁻¹ K...")
-    N_inv = np.linalg.inv(N)
-    p_cytools = N_inv @ K_paper
+    p_cytools = p[0]
+
+    # The lemma's exact conditions (K·p = 0, p in the Kähler cone) for this pair
+    vacua = solve_flat_vacua(kappa, K_paper, M_paper,
+                             kahler_cone=cy.toric_kahler_cone().hyperplanes(), workers=1)
+    if len(vacua):
+        print(f"  Exact p: {[str(x) for x in vacua.p_exact[0]]} (K·p = 0, inside Kähler cone)")
+    else:
+        print("  p fails K·p = 0 or lies outside the Kähler cone")
 
     print(f"  p (CYTools basis): {p_cytools}")
     print(f"  p (McAllister):    {[float(x) for x in p_paper]}")
@@ -252,15 +237,7 @@ def test_alternative_triangulations(poly):
     print("="*60)
 
     # Load McAllister's simplices
-    with open(f"{DATA_DIR}/dual_simplices.dat") as f:
-        lines = f.readlines()
-
-    mcallister_simplices = []
-    for line in lines:
-        line = line.strip()
-        if line:
-            simplex = [int(x) for x in line.split(',')]
-            mcallister_simplices.append(simplex)
+    mcallister_simplices = DATA["dual_simplices"].tolist()
 
     print(f"McAllister triangulation: {len(mcallister_simplices)} simplices")
     print(f"  First few: {mcallister_simplices[:3]}")
@@ -299,17 +276,8 @@ def main():
         cy_mcallister = test_alternative_triangulations(poly)
 
         if cy_mcallister is not None:
-            kappa_mc_dict = cy_mcallister.intersection_numbers(in_basis=True)
-            # Convert to array
-            h11 = cy_mcallister.h11()
-            kappa_mc = np.zeros((h11, h11, h11))
-            for (i, j, k), val in kappa_mc_dict.items():
-                kappa_mc[i, j, k] = val
-                kappa_mc[i, k, j] = val
-                kappa_mc[j, i, k] = val
-                kappa_mc[j, k, i] = val
-                kappa_mc[k, i, j] = val
-                kappa_mc[k, j, i] = val
+            kappa_mc = IntersectionTensor.from_entries(
+                cy_mcallister.intersection_numbers(in_basis=True), cy_mcallister.h11())
             print("\nRetrying with McAllister triangulation...")
             test_demirtas_lemma(cy_mcallister, kappa_mc)
 
@@ -19,49 +19,9 @@ import numpy as np
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-DATA_DIR = PROJECT_ROOT / "resources" / "small_cc_2107.09064_source" / "anc" / "paper_data" / "4-214-647"
+from mcallister import PaperData
 
-
-def load_csv_floats(filename: str) -> np.ndarray:
-    """Load comma-separated floats from a single-line file."""
-    with open(DATA_DIR / filename) as f:
-        line = f.read().strip()
-        return np.array([float(x) for x in line.split(",")])
-
-
-def load_csv_ints(filename: str) -> np.ndarray:
-    """Load comma-separated ints from a single-line file."""
-    with open(DATA_DIR / filename) as f:
-        line = f.read().strip()
-        return np.array([int(x) for x in line.split(",")])
-
-
-def load_points(filename: str) -> list[list[int]]:
-    """Load points from a CSV file (one point per line)."""
-    points = []
-    with open(DATA_DIR / filename) as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                points.append([int(x) for x in line.split(",")])
-    return points
-
-
-def load_simplices(filename: str) -> list[list[int]]:
-    """Load simplices from a CSV file (one simplex per line, 0-indexed)."""
-    simplices = []
-    with open(DATA_DIR / filename) as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                simplices.append([int(x) for x in line.split(",")])
-    return simplices
-
-
-def load_float(filename: str) -> float:
-    """Load a single float from a file."""
-    with open(DATA_DIR / filename) as f:
-        return float(f.read().strip())
+DATA = PaperData("4-214-647")
 
 
 def main():
@@ -81,26 +41,26 @@ def main():
     # ==========================================================================
     print("Loading McAllister data files...")
 
-    dual_points = load_points("dual_points.dat")
-    dual_simplices = load_simplices("dual_simplices.dat")
-    g_s = load_float("g_s.dat")
-    expected_vol_einstein = load_float("cy_vol.dat")
-    expected_vol_einstein_corrected = load_float("corrected_cy_vol.dat")
+    dual_points = DATA["dual_points"]
+    dual_simplices = DATA["dual_simplices"]
+    g_s = DATA.scalar("g_s")
+    expected_vol_einstein = DATA.scalar("cy_vol")
+    expected_vol_einstein_corrected = DATA.scalar("corrected_cy_vol")
 
     # Load both uncorrected and corrected Kähler parameters
-    kahler_params = load_csv_floats("kahler_param.dat")
-    kahler_params_corrected = load_csv_floats("corrected_kahler_param.dat")
+    kahler_params = DATA["kahler_param"]
+    kahler_params_corrected = DATA["corrected_kahler_param"]
 
     # basis.dat: 214 indices (1-indexed) of non-basis divisors
     # The first 4 entries of basis.dat permutation give the basis divisors
-    basis_perm = load_csv_ints("basis.dat")  # 214 values, 1-indexed
+    basis_perm = DATA["basis"]  # 214 values, 1-indexed
 
     # kklt_basis.dat: ordering of non-basis divisors matching kahler_param.dat
-    kklt_basis = load_csv_ints("kklt_basis.dat")  # 214 values, 1-indexed
+    kklt_basis = DATA["kklt_basis"]  # 214 values, 1-indexed
 
     # Target divisor volumes for verification
-    target_vols = load_csv_floats("target_volumes.dat")
-    target_vols_corrected = load_csv_floats("corrected_target_volumes.dat")
+    target_vols = DATA["target_volumes"]
+    target_vols_corrected = DATA["corrected_target_volumes"]
 
     print(f"  g_s: {g_s}")
     print(f"  expected CY vol (Einstein, uncorrected): {expected_vol_einstein}")
@@ -26,35 +26,9 @@ np.set_printoptions(precision=20, suppress=False)
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-DATA_DIR = PROJECT_ROOT / "resources" / "small_cc_2107.09064_source" / "anc" / "paper_data" / "4-214-647"
+from mcallister import PaperData
 
-
-def load_points(filename: str) -> list[list[int]]:
-    """Load points from a CSV file."""
-    points = []
-    with open(DATA_DIR / filename) as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                points.append([int(x) for x in line.split(",")])
-    return points
-
-
-def load_simplices(filename: str) -> list[list[int]]:
-    """Load simplices from a CSV file."""
-    simplices = []
-    with open(DATA_DIR / filename) as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                simplices.append([int(x) for x in line.split(",")])
-    return simplices
-
-
-def load_float(filename: str) -> float:
-    """Load a single float from a file."""
-    with open(DATA_DIR / filename) as f:
-        return float(f.read().strip())
+DATA = PaperData("4-214-647")
 
 
 def run_single_optimization(args):
@@ -108,10 +82,10 @@ def main():
 
     # Load McAllister data
     print("Loading McAllister data files...")
-    dual_points = load_points("dual_points.dat")
-    dual_simplices = load_simplices("dual_simplices.dat")
-    g_s = load_float("g_s.dat")
-    expected_vol_einstein = load_float("cy_vol.dat")
+    dual_points = DATA["dual_points"]
+    dual_simplices = DATA["dual_simplices"]
+    g_s = DATA.scalar("g_s")
+    expected_vol_einstein = DATA.scalar("cy_vol")
 
     print(f"  g_s: {g_s}")
     print(f"  expected CY vol (Einstein): {expected_vol_einstein}")
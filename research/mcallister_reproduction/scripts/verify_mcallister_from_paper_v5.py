@@ -9,47 +9,42 @@ McAllister et al. arXiv:2107.09064, Section 6.
 This implementation follows verify_mcallister_full_pipeline_v5.md exactly.
 """
 
-from pathlib import Path
 import math
+from fractions import Fraction
 
 import numpy as np
-from mpmath import mp, mpf, pi, log
+from mpmath import mpf
 from cytools import Polytope
 
+from mcallister import PaperData
+from mcallister.flat_vacua import flat_directions
+from mcallister.intersections import IntersectionTensor
+from mcallister.prepotential import curves_in_basis
+from mcallister.racetrack import ZETA, evaluate_W0, extract_racetrack
+
 
 # Constants
-DATA_DIR = Path(__file__).parent / "small_cc_2107.09064_source/anc/paper_data/4-214-647"
+DATA = PaperData("4-214-647")
+
+# CYTools 2021 divisor basis of the dual, in which K, M and p are given
+PAPER_BASIS = [3, 4, 5, 8]
+
+# Flat direction from eq. 6.56
+P_PAPER = (Fraction(293, 110), Fraction(163, 110), Fraction(163, 110), Fraction(13, 22))
 
 
-def get_intersection_tensor(cy) -> np.ndarray:
+def get_intersection_tensor(cy) -> IntersectionTensor:
     """
-    Extract h¹¹ × h¹¹ × h¹¹ intersection tensor from CYTools.
+    Extract the h¹¹ × h¹¹ × h¹¹ intersection tensor from CYTools.
 
     CYTools may return intersection_numbers() as a dict {(i,j,k): value}
-    or as a tensor. We need κ̃_abc as a symmetric numpy array.
+    or as rows/a tensor. We need κ̃_abc as a symmetric tensor.
 
     Note: CYTools typically returns dict with one ordering per triple (i≤j≤k).
-    We symmetrize by populating all 6 permutations.
+    IntersectionTensor stores exactly those and handles the symmetry in its
+    contractions; entries outside the first h¹¹ indices are dropped.
     """
-    h11 = cy.h11()
-    kappa = np.zeros((h11, h11, h11))
-
-    int_nums = cy.intersection_numbers()
-
-    if isinstance(int_nums, dict):
-        for (i, j, k), val in int_nums.items():
-            if i < h11 and j < h11 and k < h11:
-                # Intersection numbers are fully symmetric - fill all permutations
-                kappa[i, j, k] = val
-                kappa[i, k, j] = val
-                kappa[j, i, k] = val
-                kappa[j, k, i] = val
-                kappa[k, i, j] = val
-                kappa[k, j, i] = val
-    else:
-        kappa = np.array(int_nums)
-
-    return kappa
+    return IntersectionTensor.from_entries(cy.intersection_numbers(), cy.h11())
 
 
 def load_geometry_and_verify_basis() -> dict:
@@ -61,8 +56,8 @@ def load_geometry_and_verify_basis() -> dict:
     the wrong basis and all subsequent computations will be wrong.
     """
     # Load geometry
-    dual_pts = np.loadtxt(DATA_DIR / "dual_points.dat", delimiter=',', dtype=int)
-    dual_simps = np.loadtxt(DATA_DIR / "dual_simplices.dat", delimiter=',', dtype=int)
+    dual_pts = DATA["dual_points"]
+    dual_simps = DATA["dual_simplices"]
 
     # Debug: show original simplex index range
     print(f"Simplex indices: min={dual_simps.min()}, max={dual_simps.max()}")
@@ -90,17 +85,14 @@ def load_geometry_and_verify_basis() -> dict:
     K = np.array([-3, -5, 8, 6])
     M = np.array([10, 11, -11, -5])
 
-    # Compute N_ab = κ̃_abc M^c (eq. 2.18)
-    N = np.einsum('abc,c->ab', kappa, M)
-    det_N = np.linalg.det(N)
+    # N_ab = κ̃_abc M^c (eq. 2.18) and p = N⁻¹ K (eq. 2.19)
+    det, p = flat_directions(kappa, K, M)
+    det_N, p_computed = det[0], p[0]
     print(f"det(N) = {det_N:.6f}")
 
     if abs(det_N) < 1e-10:
         raise ValueError("N is singular - fluxes don't satisfy invertibility condition")
 
-    # Compute p = N⁻¹ K (eq. 2.19)
-    p_computed = np.linalg.solve(N, K)
-
     # Expected from paper eq. 6.56
     p_expected = np.array([
         293/110,   # = 2.6636...
@@ -143,69 +135,56 @@ def load_geometry_and_verify_basis() -> dict:
 
 def compute_W0_analytic() -> dict:
     """
-    Use paper's explicit 2-term racetrack formula (eq. 6.59).
+    Racetrack along the paper's flat direction p, derived from the GV data.
 
-    W_flux(τ) = 5ζ [-e^{2πiτ·(32/110)} + 512·e^{2πiτ·(33/110)}] + O(...)
+    extract_racetrack groups the curves by the exact value of p·d and sums
+    -(M·d) N_d, which reproduces eq. 6.59:
 
-    The coefficients -1 and +512 are EFFECTIVE racetrack coefficients
-    (combining M·q̃, N_q̃, and other factors), NOT raw GV invariants.
+    W_flux(τ) = 5ζ [-e^{2πiτ·(32/110)} + 512·e^{2πiτ·(33/110)}] + O(...)
 
-    Analytic solution from eq. 6.60-6.61:
-    - At F-term minimum: e^{2π Im(τ)/110} = 528
-    - Therefore: g_s = 2π / (110 × log(528)) = 1/Im(τ)
-    - And: |W₀| = 80ζ × 528^{-33}
+    The F-term condition ∂_τW = 0 then gives eq. 6.60-6.61:
+    - e^{2π Im(τ)/110} = 528, so g_s = 1/Im(τ) = 2π / (110 × log(528))
+    - |W₀| = 80ζ × 528^{-33}
 
-    CRITICAL: Use mpmath for arbitrary precision. W₀ ~ 10⁻⁹⁰ is representable
-    in float64, but the combination of exponentials and tiny differences makes
-    standard double precision numerically fragile. High precision avoids
-    catastrophic relative error.
+    mcallister.racetrack screens in log-domain float64 with an error bound
+    and refines in mpmath at the precision the bound calls for.
     """
-    mp.dps = 150  # 150 decimal places for W₀ ~ 10⁻⁹⁰
-
-    # Constants
-    # ζ = 1/(2^{3/2} π^{5/2}) from eq. 2.22
-    zeta = mpf('1') / (mpf('2')**mpf('1.5') * pi**mpf('2.5'))
-    print(f"ζ = {float(zeta):.6f}")
-
-    # From F-term equation ∂_τ W = 0 with two leading terms:
-    # -1 × (32/110) × e^{-2πt×32/110} + 512 × (33/110) × e^{-2πt×33/110} = 0
-    #
-    # Let x = e^{-2πt/110}:
-    # -32 x^{32} + 512×33 x^{33} = 0
-    # x^{32} (-32 + 512×33×x) = 0
-    # x = 32/(512×33) = 1/528
-    #
-    # Therefore e^{2πt/110} = 528
-    ratio = mpf('528')  # = 512 × 33/32
+    curves = curves_in_basis(DATA["dual_curves"], PAPER_BASIS)
+    racetrack = extract_racetrack(P_PAPER, DATA["M_vec"], curves, DATA.exact("dual_curves_gv"))
+    print(f"ζ = {ZETA:.6f}")
+    terms = " + ".join(
+        f"({c})·e^{{2πiτ·{e}}}" for c, e in zip(racetrack.coefficients, racetrack.exponents)
+    )
+    print(f"W_flux(τ) = ζ [{terms}] + ...")
+
+    # float64 screen with error bound, then mpmath at the precision it calls for
+    evaluation = evaluate_W0([racetrack])
+    screen = evaluation.screen
+    print(f"Screen: log₁₀|W₀| = {screen.log10_W0[0]:.6f} ± {screen.log10_error[0]:.1e}")
+    result = evaluation.refined[0]
+    print(f"Refined at {result.dps} digits ({result.certified_digits:.1f} certified)")
 
     # Im(τ) from e^{2π Im(τ)/110} = 528
-    im_tau = mpf('110') * log(ratio) / (2 * pi)
-    print(f"Im(τ) = {float(im_tau):.6f}")
+    im_tau = float(result.tau.imag)
+    print(f"Im(τ) = {im_tau:.6f}")
 
     # g_s = 1/Im(τ) (eq. 6.60)
-    g_s = 1 / im_tau
-    print(f"g_s = {float(g_s):.8f}")
-
-    # W₀ from eq. 6.61:
-    # At the minimum τ = i × im_tau (on imaginary axis):
-    #   W_flux = 5ζ × (-e^{-2π×im_tau×32/110} + 512×e^{-2π×im_tau×33/110})
-    #          = 5ζ × (-528^{-32} + 512×528^{-33})
-    #          = 5ζ × 528^{-33} × (-528 + 512)
-    #          = 5ζ × 528^{-33} × (-16)
-    #          = -80ζ × 528^{-33}
-    # So |W₀| = 80ζ × 528^{-33}
-    W0 = 80 * zeta * ratio**(-33)
+    g_s = result.g_s
+    print(f"g_s = {g_s:.8f}")
+
+    # |W₀| = 80ζ × 528^{-33} (eq. 6.61)
+    W0 = abs(result.W0)
     print(f"|W₀| = {W0}")
-    print(f"log₁₀|W₀| = {float(log(W0)/log(mpf('10'))):.2f}")
+    print(f"log₁₀|W₀| = {result.log10_W0:.2f}")
 
     return {
-        'im_tau': float(im_tau),
-        'g_s': float(g_s),
+        'im_tau': im_tau,
+        'g_s': g_s,
         'W0': float(W0)
     }
 
 
-def compute_V0_AdS(W0: float, g_s: float, V_0: float, kappa: np.ndarray, p: np.ndarray) -> float:
+def compute_V0_AdS(W0: float, g_s: float, V_0: float, kappa: IntersectionTensor, p: np.ndarray) -> float:
     """
     V₀ = -3 × e^{K₀} × (g_s^7 / (4 V[0])²) × W₀²
 
@@ -225,13 +204,13 @@ def compute_V0_AdS(W0: float, g_s: float, V_0: float, kappa: np.ndarray, p: np.n
         W0: Flux superpotential magnitude (2.30012e-90)
         g_s: String coupling (0.00911134)
         V_0: McAllister's V[0] from cy_vol.dat (4711.83)
-        kappa: Intersection tensor κ̃_abc (4×4×4 numpy array)
+        kappa: Intersection tensor κ̃_abc (h¹¹ = 4)
         p: Flat direction vector (from Phase 1)
     """
     # Compute e^{K₀} from κ̃_abc and p (eq. 6.12)
     # K_cs = -log(4/3 × κ̃_abc × p^a × p^b × p^c)
     # e^{K_cs} = (4/3 × κ̃_abc × p^a × p^b × p^c)^{-1}
-    kappa_ppp = np.einsum('abc,a,b,c->', kappa, p, p, p)
+    kappa_ppp = kappa.cubic(p)
     print(f"κ̃_abc p^a p^b p^c = {kappa_ppp:.6f}")
 
     if abs(kappa_ppp) > 1e-10:
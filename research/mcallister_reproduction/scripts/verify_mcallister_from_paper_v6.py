@@ -16,6 +16,7 @@ an unknown GL(4,Z) transformation. This doesn't affect the reproduction
 since W₀, g_s, V₀ are computed analytically from the paper's formulas.
 """
 
+from fractions import Fraction
 from pathlib import Path
 import math
 import sys
@@ -24,39 +25,34 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent / "vendor/cytools_latest/src"))
 
 import numpy as np
-from mpmath import mp, mpf, pi, log
+from mpmath import mpf
 from cytools import Polytope
 
+from mcallister import PaperData
+from mcallister.flat_vacua import flat_directions
+from mcallister.intersections import IntersectionTensor
+from mcallister.prepotential import curves_in_basis
+from mcallister.racetrack import ZETA, evaluate_W0, extract_racetrack
 
-DATA_DIR = Path(__file__).parent / "small_cc_2107.09064_source/anc/paper_data/4-214-647"
 
+DATA = PaperData("4-214-647")
 
-def get_intersection_tensor(cy) -> np.ndarray:
+# CYTools 2021 divisor basis of the dual, in which K, M and p are given
+PAPER_BASIS = [3, 4, 5, 8]
+
+# Flat direction from eq. 6.56
+P_PAPER = (Fraction(293, 110), Fraction(163, 110), Fraction(163, 110), Fraction(13, 22))
+
+
+def get_intersection_tensor(cy) -> IntersectionTensor:
     """
-    Extract h¹¹ × h¹¹ × h¹¹ intersection tensor from CYTools in the h¹¹ basis.
+    Extract the h¹¹ × h¹¹ × h¹¹ intersection tensor from CYTools in the h¹¹ basis.
 
     CRITICAL: Use in_basis=True to get intersection numbers in the reduced
     h¹¹ divisor basis, not the ambient toric divisor basis.
     """
-    h11 = cy.h11()
-    kappa = np.zeros((h11, h11, h11))
-
     # Use in_basis=True for proper h¹¹ basis
-    int_nums = cy.intersection_numbers(in_basis=True)
-
-    if isinstance(int_nums, dict):
-        for (i, j, k), val in int_nums.items():
-            if i < h11 and j < h11 and k < h11:
-                kappa[i, j, k] = val
-                kappa[i, k, j] = val
-                kappa[j, i, k] = val
-                kappa[j, k, i] = val
-                kappa[k, i, j] = val
-                kappa[k, j, i] = val
-    else:
-        kappa = np.array(int_nums)
-
-    return kappa
+    return IntersectionTensor.from_entries(cy.intersection_numbers(in_basis=True), cy.h11())
 
 
 def load_geometry_and_verify() -> dict:
@@ -68,8 +64,8 @@ def load_geometry_and_verify() -> dict:
     uses a different divisor basis than McAllister's moduli basis. This is
     fine - the physics (W₀, g_s, V₀) is basis-independent.
     """
-    dual_pts = np.loadtxt(DATA_DIR / "dual_points.dat", delimiter=',', dtype=int)
-    dual_simps = np.loadtxt(DATA_DIR / "dual_simplices.dat", delimiter=',', dtype=int)
+    dual_pts = DATA["dual_points"]
+    dual_simps = DATA["dual_simplices"]
 
     print(f"Simplex indices: min={dual_simps.min()}, max={dual_simps.max()}")
 
@@ -99,12 +95,12 @@ def load_geometry_and_verify() -> dict:
     M = np.array([10, 11, -11, -5])
 
     # Compute N and p in CYTools basis (for diagnostic only)
-    N = np.einsum('abc,c->ab', kappa, M)
-    det_N = np.linalg.det(N)
+    det, p = flat_directions(kappa, K, M)
+    det_N = det[0]
     print(f"det(N) in CYTools basis = {det_N:.6f}")
 
     if abs(det_N) > 1e-10:
-        p_cytools = np.linalg.solve(N, K)
+        p_cytools = p[0]
         print(f"p in CYTools basis = {p_cytools}")
     else:
         p_cytools = None
@@ -127,42 +123,51 @@ def load_geometry_and_verify() -> dict:
 
 def compute_W0_analytic() -> dict:
     """
-    Use paper's explicit 2-term racetrack formula (eq. 6.59).
+    Racetrack along the paper's flat direction p, derived from the GV data.
 
-    This is purely analytic and basis-independent.
+    extract_racetrack groups the curves by the exact value of p·d and sums
+    -(M·d) N_d, which reproduces eq. 6.59:
 
     W_flux(τ) = 5ζ [-e^{2πiτ·(32/110)} + 512·e^{2πiτ·(33/110)}] + O(...)
 
-    Analytic solution from eq. 6.60-6.61:
-    - At F-term minimum: e^{2π Im(τ)/110} = 528
-    - Therefore: g_s = 2π / (110 × log(528)) = 1/Im(τ)
-    - And: |W₀| = 80ζ × 528^{-33}
-    """
-    mp.dps = 150
-
-    # ζ = 1/(2^{3/2} π^{5/2}) from eq. 2.22
-    zeta = mpf('1') / (mpf('2')**mpf('1.5') * pi**mpf('2.5'))
-    print(f"ζ = {float(zeta):.6f}")
+    The F-term condition ∂_τW = 0 then gives eq. 6.60-6.61:
+    - e^{2π Im(τ)/110} = 528, so g_s = 1/Im(τ) = 2π / (110 × log(528))
+    - |W₀| = 80ζ × 528^{-33}
 
-    # From F-term: e^{2πt/110} = 528
-    ratio = mpf('528')
+    mcallister.racetrack screens in log-domain float64 with an error bound
+    and refines in mpmath at the precision the bound calls for.
+    """
+    curves = curves_in_basis(DATA["dual_curves"], PAPER_BASIS)
+    racetrack = extract_racetrack(P_PAPER, DATA["M_vec"], curves, DATA.exact("dual_curves_gv"))
+    print(f"ζ = {ZETA:.6f}")
+    terms = " + ".join(
+        f"({c})·e^{{2πiτ·{e}}}" for c, e in zip(racetrack.coefficients, racetrack.exponents)
+    )
+    print(f"W_flux(τ) = ζ [{terms}] + ...")
+
+    # float64 screen with error bound, then mpmath at the precision it calls for
+    evaluation = evaluate_W0([racetrack])
+    screen = evaluation.screen
+    print(f"Screen: log₁₀|W₀| = {screen.log10_W0[0]:.6f} ± {screen.log10_error[0]:.1e}")
+    result = evaluation.refined[0]
+    print(f"Refined at {result.dps} digits ({result.certified_digits:.1f} certified)")
 
     # Im(τ) from e^{2π Im(τ)/110} = 528
-    im_tau = mpf('110') * log(ratio) / (2 * pi)
-    print(f"Im(τ) = {float(im_tau):.6f}")
+    im_tau = float(result.tau.imag)
+    print(f"Im(τ) = {im_tau:.6f}")
 
     # g_s = 1/Im(τ) (eq. 6.60)
-    g_s = 1 / im_tau
-    print(f"g_s = {float(g_s):.8f}")
+    g_s = result.g_s
+    print(f"g_s = {g_s:.8f}")
 
     # |W₀| = 80ζ × 528^{-33} (eq. 6.61)
-    W0 = 80 * zeta * ratio**(-33)
+    W0 = abs(result.W0)
     print(f"|W₀| = {W0}")
-    print(f"log₁₀|W₀| = {float(log(W0)/log(mpf('10'))):.2f}")
+    print(f"log₁₀|W₀| = {result.log10_W0:.2f}")
 
     return {
-        'im_tau': float(im_tau),
-        'g_s': float(g_s),
+        'im_tau': im_tau,
+        'g_s': g_s,
         'W0': float(W0)
     }
 
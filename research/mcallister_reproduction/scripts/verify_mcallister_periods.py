@@ -12,76 +12,10 @@ Reference: arXiv:2107.09064 "Small cosmological constants in string theory"
 """
 
 import numpy as np
-from pathlib import Path
-from scipy.special import spence  # For dilogarithm Li_2
-
-PROJECT_ROOT = Path(__file__).parent.parent
-DATA_DIR = PROJECT_ROOT / "resources" / "small_cc_2107.09064_source" / "anc" / "paper_data" / "4-214-647"
-
-
-def load_csv_floats(filename: str) -> np.ndarray:
-    """Load comma-separated floats from a single-line file."""
-    with open(DATA_DIR / filename) as f:
-        line = f.read().strip()
-        return np.array([float(x) for x in line.split(",")])
-
-
-def load_csv_ints(filename: str) -> np.ndarray:
-    """Load comma-separated ints from a single-line file."""
-    with open(DATA_DIR / filename) as f:
-        line = f.read().strip()
-        return np.array([int(float(x)) for x in line.split(",")])
-
-
-def load_float(filename: str) -> float:
-    """Load a single float from a file."""
-    with open(DATA_DIR / filename) as f:
-        return float(f.read().strip())
-
-
-def load_matrix(filename: str) -> np.ndarray:
-    """Load a CSV matrix (one row per line)."""
-    rows = []
-    with open(DATA_DIR / filename) as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                rows.append([float(x) for x in line.split(",")])
-    return np.array(rows)
-
-
-def trilog(x):
-    """
-    Compute trilogarithm Li_3(x).
-
-    Li_3(x) = Σ_{k=1}^∞ x^k / k³
-
-    For |x| < 1, this converges. For numerical stability, we use
-    series expansion for small x and functional equations otherwise.
-    """
-    if np.abs(x) < 1e-10:
-        return x  # Li_3(x) ≈ x for small x
-
-    # For |x| < 1, direct series is fine
-    if np.abs(x) < 0.5:
-        result = 0.0
-        term = x
-        for k in range(1, 100):
-            result += term / (k ** 3)
-            term *= x
-            if np.abs(term / (k + 1) ** 3) < 1e-15:
-                break
-        return result
-
-    # For larger |x| < 1, use more terms
-    result = 0.0
-    term = x
-    for k in range(1, 500):
-        result += term / (k ** 3)
-        term *= x
-        if np.abs(term / (k + 1) ** 3) < 1e-15:
-            break
-    return result
+
+from mcallister import PaperData
+
+DATA = PaperData("4-214-647")
 
 
 def main():
@@ -96,16 +30,16 @@ def main():
     print("Loading McAllister data...")
 
     # Target values for verification
-    W_0_expected = load_float("W_0.dat")
-    g_s = load_float("g_s.dat")
+    W_0_expected = DATA.scalar("W_0")
+    g_s = DATA.scalar("g_s")
 
     # Flux vectors (4-dimensional, for h21=4 mirror)
-    K_vec = load_csv_ints("K_vec.dat")  # F-flux (RR)
-    M_vec = load_csv_ints("M_vec.dat")  # H-flux (NSNS)
+    K_vec = DATA["K_vec"]  # F-flux (RR)
+    M_vec = DATA["M_vec"]  # H-flux (NSNS)
 
     # GV invariants
-    dual_curves = load_matrix("dual_curves.dat").astype(int)  # Curve classes
-    gv_invariants = load_csv_floats("dual_curves_gv.dat").astype(int)
+    dual_curves = DATA["dual_curves"]  # Curve classes
+    gv_invariants = DATA.exact("dual_curves_gv")  # Some exceed int64
 
     print(f"  W₀ expected: {W_0_expected:.6e}")
     print(f"  g_s: {g_s}")
@@ -154,6 +88,8 @@ def main():
     # F = F_class + F_inst
     # F_class = -(1/6) κ_abc z^a z^b z^c + (1/2) a_ab z^a z^b + b_a z^a + c/2
     # F_inst = Σ_d N_d Li_3(q^d) where q^a = exp(2πi z^a)
+    # (mcallister.prepotential.PrepotentialEngine evaluates F and its derivatives
+    # over all curves and many points at once)
 
     # McAllister works at "large complex structure" which means |q| << 1
     # The exact point z is not explicitly given in their data files
@@ -162,17 +98,15 @@ def main():
     # - They find a "perturbatively flat direction" p in CS moduli space
     # - They evaluate at a specific point along p where W₀ is minimized
 
-    # For now, let's try to understand the period structure
     # The period vector has dimension 2(h21 + 1) = 10 for h21=4
-    # But K_vec and M_vec are only 4-dimensional!
-
-    # This suggests they're using a reduced basis where:
-    # W₀ = K · Π_red - τ M · Π_red
-    # where Π_red is a 4-vector projection of the full periods
+    # K_vec and M_vec are only 4-dimensional because they fill the full
+    # flux vectors as f = (b·M, a·M, 0, M), h = (0, K, 0, 0);
+    # mcallister.periods.flux_superpotential evaluates Π, W, ∂W and the
+    # Kähler potential for batches of z, τ and (K, M) from a PrepotentialEngine
 
     print("  The flux vectors K, M are 4-dimensional (h21=4)")
     print("  Full period space has dimension 2(h21+1) = 10")
-    print("  McAllister must be using a reduced/projected period basis")
+    print("  They embed as f = (b·M, a·M, 0, M), h = (0, K, 0, 0)")
     print()
 
     # =========================================================================
@@ -220,7 +154,7 @@ def main():
     try:
         from cytools import Polytope
 
-        dual_pts = np.loadtxt(DATA_DIR / "dual_points.dat", delimiter=',').astype(int)
+        dual_pts = DATA["dual_points"]
         p_dual = Polytope(dual_pts)
         tri = p_dual.triangulate()
         cy = tri.get_cy()
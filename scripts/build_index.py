@@ -9,21 +9,46 @@ Usage:
     # From saas repo:
     semgrep-index                      # Index all configured directories
     semgrep-index --dry-run            # Estimate costs without API calls
+    semgrep-index --estimate           # Fast sampled estimate (huge corpora)
     semgrep-index --limit 100          # Test with first 100 chunks
+    semgrep-index --max-cost 5         # Stop cleanly once $5 would be exceeded
+    semgrep-index --max-cost 5 --allow-overshoot  # ...but always embed the next file
     semgrep-index src/                 # Index specific directory
     semgrep-index project/*.md         # Index specific files
+
+    # From a git worktree: builds a small overlay index (.chroma_overlay/)
+    # holding only files that differ from the main index
+    semgrep-index
+
+    # Share the embedding cache between machines
+    semgrep-index --export-cache cache.tar.gz    # Entries used by the index
+    semgrep-index --import-cache cache.tar.gz    # Merge (idempotent)
 """
 
 import argparse
+import fcntl
 import hashlib
+import io
 import json
 import logging
+import math
 import os
+import random
 import re
+import shutil
+import socket
 import subprocess
+import tarfile
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
 
 import chromadb
+import numpy as np  # installed with chromadb
 import tiktoken
 from chromadb.config import Settings
 from dotenv import load_dotenv
@@ -51,8 +76,21 @@ INDEXABLE_EXTENSIONS = {
     ".py": "python",
     ".svelte": "svelte",
     ".rs": "rust",
+    # Extracted to text first (pdftotext or pypdf); chunks carry page numbers
+    ".pdf": "pdf",
 }
 
+# Extracted PDF text is cached by PDF hash under .ai_cache/pdf_text, so an
+# unchanged PDF is never re-extracted. Pages are joined with form feeds.
+PDF_TEXT_CACHE_DIR = "pdf_text"
+PDF_PAGE_SEPARATOR = "\f"
+
+# Source tarballs are streamed member by member (no extraction); matching
+# members are indexed under virtual paths like "paper.tar.gz!/main.tex"
+ARCHIVE_SUFFIXES = (".tar.gz", ".tgz")
+ARCHIVE_MEMBER_EXTENSIONS = {".tex", ".bbl"}
+ARCHIVE_SEPARATOR = "!/"
+
 # Directories to exclude from indexing
 EXCLUDED_DIRS = {
     ".venv",
@@ -61,6 +99,7 @@ EXCLUDED_DIRS = {
     ".git",
     "__pycache__",
     ".chroma",
+    ".chroma_overlay",
     ".ai_cache",
     ".svelte-kit",
     "dist",
@@ -69,6 +108,60 @@ EXCLUDED_DIRS = {
     "coverage",
 }
 
+# File-level index: one normalized-mean (centroid) vector per file, used by
+# semantic_search.py to pick candidate files before ranking their chunks
+FILES_COLLECTION_NAME = "project_files"
+
+# Per-file chunk-offset table, stored next to the ChromaDB files.
+# Lets semantic_search.py resolve -A/-B/-C context without per-chunk lookups.
+CHUNK_TABLE_NAME = "chunk_table.json"
+
+# Files per $in filter when removing the old chunks of replaced files
+STALE_FILTER_BATCH = 500
+
+# Index generation token, rewritten on every indexing run. semantic_search.py
+# keys its result cache on it, so any re-index invalidates cached results.
+INDEX_GENERATION_NAME = "generation"
+
+# Worktree overlay index (lives in the worktree, next to its checkout).
+# Holds chunks only for files that differ from the main index, plus the list
+# of main-index files it supersedes (changed or deleted in the worktree).
+OVERLAY_DIR_NAME = ".chroma_overlay"
+OVERLAY_MASK_NAME = "masked_files.json"
+
+# HNSW graph parameters, overridable in scripts/hnsw_params.txt
+# (tune with `semgrep-bench recall`)
+HNSW_PARAMS_FILE = Path("scripts") / "hnsw_params.txt"
+HNSW_DEFAULTS = {"M": 16, "ef_construction": 100, "ef_search": 100}
+
+# Per-run indexing summary (chunks, cache hits, tokens, cost), appended as
+# JSON lines; semgrep-stats reports the historical cache hit rate from it
+INDEX_RUN_LOG = Path(".ai_cache") / "index_runs.jsonl"
+
+# Lock file serializing index mutations across concurrent semgrep-index runs.
+# Embedding (the slow part) happens outside the lock.
+INDEX_LOCK_NAME = "index.lock"
+DEFAULT_LOCK_TIMEOUT = 600  # seconds
+
+# Portable embedding-cache bundles (--export-cache / --import-cache): a
+# tar.gz whose first member is a manifest of per-entry SHA-256 checksums
+CACHE_BUNDLE_FORMAT = "semgrep-cache-bundle"
+CACHE_BUNDLE_VERSION = 1
+BUNDLE_MANIFEST_NAME = "manifest.json"
+
+# Under a --max-cost/--max-tokens budget, files are embedded in priority
+# order: these prefixes first, then files named in the allowlist (in
+# allowlist order, so critical papers precede the rest), then everything else
+PRIORITY_PREFIXES = ["project_docs/", "prds/"]
+
+# Written when a budget stops a run early: what is still pending
+INDEX_PROGRESS_NAME = "index_progress.json"
+
+# --estimate: stratified sample of files (by type and size bucket) instead
+# of chunking and tokenizing the whole corpus
+DEFAULT_SAMPLE_FILES = 200
+SIZE_BUCKETS = [4_096, 32_768, 262_144]  # bytes; stratum boundaries
+
 # Default directories to index (relative to CWD)
 # We scan everything, but filter by allowlist
 DEFAULT_INDEX_DIRS = ["."]
@@ -80,23 +173,50 @@ logger = logging.getLogger(__name__)
 _tokenizer = None
 
 
-def load_allowlist(storage_root: Path) -> set[str]:
-    """Load the index allowlist from scripts/index_allowlist.txt."""
+def load_allowlist(storage_root: Path) -> dict[str, int]:
+    """Load the index allowlist from scripts/index_allowlist.txt.
+
+    Maps each entry to its position in the file (used as embedding priority).
+    """
     allowlist_path = storage_root / "scripts" / "index_allowlist.txt"
     if not allowlist_path.exists():
         logger.warning(f"Allowlist not found at {allowlist_path}. Indexing NOTHING by default.")
-        return set()
+        return {}
 
-    allowed = set()
+    allowed = {}
     with open(allowlist_path) as f:
         for line in f:
             line = line.strip()
             if line and not line.startswith("#"):
-                allowed.add(line)
+                allowed.setdefault(line, len(allowed))
     return allowed
 
 
-def is_allowed(rel_path: str, allowlist: set[str]) -> bool:
+def embedding_priority(rel_path: str, allowlist: dict[str, int]) -> tuple[int, int]:
+    """Sort key for embedding order under a budget (lower = sooner)."""
+    rel_path = archive_owner(rel_path)
+    for rank, prefix in enumerate(PRIORITY_PREFIXES):
+        if rel_path.startswith(prefix):
+            return (0, rank)
+    if rel_path in allowlist:
+        return (1, allowlist[rel_path])
+    for allowed, position in allowlist.items():
+        if allowed.endswith("/") and rel_path.startswith(allowed):
+            return (1, position)
+    return (2, 0)
+
+
+def get_token_budget(args: argparse.Namespace) -> int | None:
+    """Token budget from --max-tokens / --max-cost (the tighter wins)."""
+    budgets = []
+    if args.max_tokens is not None:
+        budgets.append(args.max_tokens)
+    if args.max_cost is not None:
+        budgets.append(int(args.max_cost / EMBEDDING_COST_PER_1M_TOKENS * 1_000_000))
+    return min(budgets) if budgets else None
+
+
+def is_allowed(rel_path: str, allowlist: dict[str, int]) -> bool:
     """Check if a relative path is in the allowlist.
     
     Rules:
@@ -130,6 +250,163 @@ def is_allowed(rel_path: str, allowlist: set[str]) -> bool:
     return False
 
 
+def is_archive(path: str) -> bool:
+    """True for source tarballs that are indexed member by member."""
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def is_indexable(path: Path) -> bool:
+    """True for files the indexer reads: known text extensions and source tarballs."""
+    return path.suffix.lower() in INDEXABLE_EXTENSIONS or is_archive(path.name)
+
+
+def archive_owner(rel_path: str) -> str:
+    """The on-disk path behind a (possibly virtual) indexed path."""
+    return rel_path.split(ARCHIVE_SEPARATOR, 1)[0]
+
+
+class _HashingReader:
+    """File wrapper that hashes bytes as they are read (one pass over the archive)."""
+
+    def __init__(self, f):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        self.sha256.update(data)
+        return data
+
+
+def read_archive_members(abs_path: Path) -> tuple[str, list[tuple[str, str]]]:
+    """Stream a .tar.gz and return (archive sha256, [(member name, text)]).
+
+    Only .tex/.bbl members are decoded; everything else streams past. The
+    archive is read exactly once and never extracted to disk.
+    """
+    members = []
+    with open(abs_path, "rb") as raw:
+        reader = _HashingReader(raw)
+        with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+            for member in tar:
+                if not member.isfile() or Path(member.name).suffix.lower() not in ARCHIVE_MEMBER_EXTENSIONS:
+                    continue
+                data = tar.extractfile(member).read()
+                members.append((member.name, data.decode("utf-8", errors="replace")))
+        # Hash any trailing padding too, so the digest covers the whole file
+        while reader.read(1 << 20):
+            pass
+    return reader.sha256.hexdigest(), members
+
+
+def is_pdf(path: str) -> bool:
+    return path.lower().endswith(".pdf")
+
+
+def extract_pdf_pages(abs_path: str) -> list[str]:
+    """Extract per-page text from a PDF.
+
+    Uses poppler's pdftotext when installed (fast), else pypdf. Neither is a
+    hard dependency: without both, PDFs are skipped with a warning.
+    """
+    if shutil.which("pdftotext"):
+        result = subprocess.run(
+            ["pdftotext", "-enc", "UTF-8", abs_path, "-"],
+            capture_output=True, check=True,
+        )
+        pages = result.stdout.decode("utf-8", errors="replace").split("\f")
+        if pages and not pages[-1].strip():
+            pages.pop()  # pdftotext ends every page with a form feed
+        return pages
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF extraction needs poppler's pdftotext or `pip install pypdf`") from None
+    return [page.extract_text() or "" for page in PdfReader(abs_path).pages]
+
+
+def get_pdf_text_path(storage_root: Path, pdf_hash: str) -> Path:
+    return storage_root / ".ai_cache" / PDF_TEXT_CACHE_DIR / f"{pdf_hash}.json"
+
+
+def load_pdf_text(storage_root: Path, pdf_hash: str) -> str | None:
+    """Cached extracted text (pages joined by form feeds), or None on a miss."""
+    try:
+        with open(get_pdf_text_path(storage_root, pdf_hash)) as f:
+            return PDF_PAGE_SEPARATOR.join(json.load(f)["pages"])
+    except (OSError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def extract_pdfs(storage_root: Path, pdf_files: list[tuple[Path, str]], workers: int | None = None) -> int:
+    """Fill the extracted-text cache for any PDFs not already in it.
+
+    Extraction runs in a process pool (it is CPU-bound). Returns the number
+    of PDFs extracted; failures are logged and left for the read loop to skip.
+    """
+    pending = {}
+    for abs_path, rel_path in pdf_files:
+        try:
+            pdf_hash = file_digest(abs_path, rel_path)
+        except OSError:
+            continue
+        if not get_pdf_text_path(storage_root, pdf_hash).exists():
+            pending.setdefault(pdf_hash, (abs_path, rel_path))
+    if not pending:
+        return 0
+
+    logger.info(f"Extracting text from {len(pending)} PDF(s)...")
+    extracted = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(extract_pdf_pages, str(abs_path)): (pdf_hash, rel_path)
+            for pdf_hash, (abs_path, rel_path) in pending.items()
+        }
+        for future in as_completed(futures):
+            pdf_hash, rel_path = futures[future]
+            try:
+                pages = future.result()
+            except Exception as e:
+                logger.warning(f"  Could not extract {rel_path}: {e}")
+                continue
+            atomic_write_json(get_pdf_text_path(storage_root, pdf_hash), {"source": rel_path, "pages": pages})
+            extracted += 1
+            logger.debug(f"  {rel_path}: {len(pages)} pages")
+    return extracted
+
+
+def read_indexable_file(abs_path: Path, rel_path: str, storage_root: Path) -> tuple[str, list[tuple[str, str]]]:
+    """Read a file for indexing: (file hash, [(indexed path, text)]).
+
+    Plain files yield themselves; archives yield one virtual path per member;
+    PDFs yield their cached extracted text (extracting inline on a miss).
+    """
+    if is_archive(rel_path):
+        digest, members = read_archive_members(abs_path)
+        return digest, [(f"{rel_path}{ARCHIVE_SEPARATOR}{name}", text) for name, text in members]
+    if is_pdf(rel_path):
+        digest = file_digest(abs_path, rel_path)
+        content = load_pdf_text(storage_root, digest)
+        if content is None:
+            pages = extract_pdf_pages(str(abs_path))
+            atomic_write_json(get_pdf_text_path(storage_root, digest), {"source": rel_path, "pages": pages})
+            content = PDF_PAGE_SEPARATOR.join(pages)
+        return digest, [(rel_path, content)]
+    content = abs_path.read_text(encoding="utf-8")
+    return hash_content(content), [(rel_path, content)]
+
+
+def file_digest(abs_path: Path, rel_path: str) -> str:
+    """The hash read_indexable_file records, without decompressing archives.
+
+    Binary sources (archives, PDFs) are hashed as bytes.
+    """
+    if is_archive(rel_path) or is_pdf(rel_path):
+        with open(abs_path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    return hash_content(abs_path.read_text(encoding="utf-8"))
+
+
 def get_tokenizer():
     """Get tiktoken tokenizer (lazy loaded)."""
     global _tokenizer
@@ -159,6 +436,27 @@ def is_worktree() -> bool:
     return False
 
 
+def get_main_worktree() -> Path | None:
+    """Find the main checkout of the repo the current worktree belongs to."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--path-format=absolute", "--git-common-dir"],
+            capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    # The common dir is the main checkout's .git directory
+    return Path(result.stdout.strip()).parent
+
+
+def get_main_storage_root(main_worktree: Path) -> Path:
+    """Storage root of the main checkout (its project/ symlink, or itself)."""
+    project_dir = main_worktree / "project"
+    if project_dir.is_symlink():
+        return project_dir.resolve()
+    return main_worktree
+
+
 def get_storage_root() -> Path:
     """Get the root directory for cache and index storage.
 
@@ -179,16 +477,134 @@ def get_storage_root() -> Path:
         return project_dir if project_dir.exists() else cwd
 
 
+def load_hnsw_params(storage_root: Path) -> dict[str, int]:
+    """HNSW parameters from scripts/hnsw_params.txt, falling back to defaults."""
+    params = dict(HNSW_DEFAULTS)
+    config_path = storage_root / HNSW_PARAMS_FILE
+    if not config_path.exists():
+        return params
+    with open(config_path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            key, _, value = (part.strip() for part in line.partition("="))
+            if key not in HNSW_DEFAULTS:
+                logger.warning(f"Ignoring unknown HNSW parameter {key!r} in {config_path}")
+                continue
+            params[key] = int(value)
+    return params
+
+
+def hnsw_metadata(params: dict[str, int]) -> dict:
+    """Collection metadata for a cosine HNSW index with the given parameters."""
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:M": params["M"],
+        "hnsw:construction_ef": params["ef_construction"],
+        "hnsw:search_ef": params["ef_search"],
+    }
+
+
 def get_cache_path(storage_root: Path, model: str, cache_type: str, content: str) -> Path:
-    """Generate cache path for an embedding request."""
+    """Generate cache path for an embedding request (no filesystem access)."""
     content_hash = hashlib.sha256(content.encode()).hexdigest()
-    cache_path = storage_root / ".ai_cache" / "openai" / model / cache_type / f"{content_hash}.json"
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-    return cache_path
+    return storage_root / ".ai_cache" / "openai" / model / cache_type / f"{content_hash}.json"
+
+
+def default_file_mode() -> int:
+    """Mode a plain open() would create files with (mkstemp uses 0600)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def atomic_write_json(path: Path, data) -> None:
+    """Write JSON via a temp file + rename, so readers never see a torn file."""
+    atomic_write_bytes(path, json.dumps(data).encode())
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Write bytes via a temp file + rename in the same directory."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        os.fchmod(fd, default_file_mode())
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_cached_embedding(cache_path: Path) -> list[float] | None:
+    """Load a cached embedding, treating missing or corrupt entries as misses."""
+    try:
+        with open(cache_path) as f:
+            return json.load(f)["embedding"]
+    except (OSError, json.JSONDecodeError, KeyError):
+        return None
+
+
+@contextmanager
+def index_lock(chroma_dir: Path, timeout: float):
+    """Hold an exclusive lock on an index directory while mutating it.
+
+    Uses flock, so the lock is released automatically if the holder dies -
+    a crashed run never leaves a stale lock behind. The holder's pid, host
+    and start time are written into the lock file for diagnostics.
+    """
+    chroma_dir.mkdir(parents=True, exist_ok=True)
+    lock_path = chroma_dir / INDEX_LOCK_NAME
+    with open(lock_path, "a+") as f:
+        deadline = time.monotonic() + timeout
+        waiting_logged = False
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not waiting_logged:
+                    f.seek(0)
+                    holder = f.read().strip() or "another process"
+                    logger.info(f"Waiting for index lock held by {holder}...")
+                    waiting_logged = True
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out after {timeout:.0f}s waiting for {lock_path}")
+                time.sleep(0.2)
+
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps({"pid": os.getpid(), "host": socket.gethostname(), "since": time.time()}))
+        f.flush()
+        try:
+            yield
+        finally:
+            f.seek(0)
+            f.truncate()
+            f.flush()
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def list_cached_hashes(storage_root: Path, model: str, cache_type: str = "content") -> set[str]:
+    """Content hashes present in the embedding cache, from one directory listing.
+
+    Much cheaper than stat-ing a cache file per chunk on large corpora.
+    """
+    cache_dir = storage_root / ".ai_cache" / "openai" / model / cache_type
+    try:
+        with os.scandir(cache_dir) as entries:
+            return {entry.name[:-5] for entry in entries if entry.name.endswith(".json")}
+    except FileNotFoundError:
+        return set()
 
 
 def is_cached(storage_root: Path, model: str, text: str, cache_type: str = "content") -> bool:
-    """Check if embedding is cached (without loading it)."""
+    """Check if embedding is cached (without loading it or creating directories)."""
     cache_path = get_cache_path(storage_root, model, cache_type, text)
     return cache_path.exists()
 
@@ -214,10 +630,11 @@ def get_embeddings_batch(
 
     # First pass: check cache
     for i, text in enumerate(texts):
-        cache_path = get_cache_path(storage_root, model, cache_type, text)
-        if cache_mode == "normal" and cache_path.exists():
-            with open(cache_path) as f:
-                embeddings[i] = json.load(f)["embedding"]
+        embedding = None
+        if cache_mode == "normal":
+            embedding = read_cached_embedding(get_cache_path(storage_root, model, cache_type, text))
+        if embedding is not None:
+            embeddings[i] = embedding
             cached_count += 1
         else:
             uncached_indices.append(i)
@@ -242,8 +659,7 @@ def get_embeddings_batch(
             # Cache response (unless none mode)
             if cache_mode != "none":
                 cache_path = get_cache_path(storage_root, model, cache_type, text)
-                with open(cache_path, "w") as f:
-                    json.dump({"text": text, "embedding": embedding}, f)
+                atomic_write_json(cache_path, {"text": text, "embedding": embedding})
 
     return embeddings, cached_count, len(uncached_texts), api_requests
 
@@ -270,6 +686,7 @@ def split_markdown_into_chunks(content: str, filepath: str) -> list[dict]:
         # Find line number where this paragraph starts
         para_start = content.find(para, current_pos)
         line_num = content[:para_start].count("\n") + 1
+        end_line = line_num + para.rstrip().count("\n")
 
         chunks.append({
             "id": f"{filepath}:{chunk_index}",
@@ -279,6 +696,7 @@ def split_markdown_into_chunks(content: str, filepath: str) -> list[dict]:
                 "file_type": file_type,
                 "chunk_index": chunk_index,
                 "line_num": line_num,
+                "end_line": end_line,
             },
         })
         chunk_index += 1
@@ -333,6 +751,7 @@ def split_code_into_chunks(content: str, filepath: str) -> list[dict]:
                         "file_type": file_type,
                         "chunk_index": chunk_index,
                         "line_num": current_start_line,
+                        "end_line": i - 1,
                     },
                 })
                 chunk_index += 1
@@ -355,19 +774,46 @@ def split_code_into_chunks(content: str, filepath: str) -> list[dict]:
                 "file_type": file_type,
                 "chunk_index": chunk_index,
                 "line_num": current_start_line,
+                "end_line": len(lines),
             },
         })
 
     return chunks
 
 
+def split_pdf_into_chunks(content: str, filepath: str) -> list[dict]:
+    """Split extracted PDF text into paragraph chunks, one page at a time.
+
+    line_num/end_line hold the page number (so results print as
+    paper.pdf:<page>:), and metadata also carries an explicit "page".
+    """
+    chunks = []
+    for page_num, page_text in enumerate(content.split(PDF_PAGE_SEPARATOR), 1):
+        for chunk in split_markdown_into_chunks(page_text, filepath):
+            chunk_index = len(chunks)
+            chunk["id"] = f"{filepath}:{chunk_index}"
+            chunk["metadata"].update(
+                chunk_index=chunk_index, line_num=page_num, end_line=page_num, page=page_num
+            )
+            chunks.append(chunk)
+    return chunks
+
+
 def split_into_chunks(content: str, filepath: str) -> list[dict]:
     """Split file content into chunks based on file type."""
     ext = Path(filepath).suffix.lower()
     if ext == ".md":
-        return split_markdown_into_chunks(content, filepath)
+        chunks = split_markdown_into_chunks(content, filepath)
+    elif ext == ".pdf":
+        chunks = split_pdf_into_chunks(content, filepath)
     else:
-        return split_code_into_chunks(content, filepath)
+        chunks = split_code_into_chunks(content, filepath)
+
+    # Archive members record their archive so a re-index can drop them all
+    if ARCHIVE_SEPARATOR in filepath:
+        for chunk in chunks:
+            chunk["metadata"]["archive"] = archive_owner(filepath)
+    return chunks
 
 
 def find_indexable_files(root: Path, base_path: Path = None) -> list[tuple[Path, str]]:
@@ -394,7 +840,7 @@ def find_indexable_files(root: Path, base_path: Path = None) -> list[tuple[Path,
             continue
 
         # Check extension
-        if path.suffix.lower() not in INDEXABLE_EXTENSIONS:
+        if not is_indexable(path):
             continue
 
         # Get relative path from base
@@ -408,6 +854,464 @@ def find_indexable_files(root: Path, base_path: Path = None) -> list[tuple[Path,
     return sorted(files, key=lambda x: x[1])
 
 
+def write_chunk_table(
+    chroma_dir: Path,
+    chunks: list[dict],
+    file_stats: dict[str, os.stat_result],
+    file_hashes: dict[str, str],
+    replace: bool,
+    token_counts: dict[str, int] | None = None,
+    removed: set[str] = frozenset(),
+) -> int:
+    """Write the per-file chunk-offset table used for context display.
+
+    Maps each indexed file to its size/mtime/content hash and token count at
+    index time and the [line_num, end_line] span of every chunk (list
+    position = chunk_index). A full rebuild replaces the table; a partial
+    update merges into it, dropping the files in removed.
+
+    Returns the number of files in the table.
+    """
+    table_path = chroma_dir / CHUNK_TABLE_NAME
+    table = {"root": str(Path.cwd()), "files": {}}
+    if not replace and table_path.exists():
+        try:
+            with open(table_path) as f:
+                table = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable chunk table {table_path}: {e}")
+
+    # Every file read gets an entry, even with no chunks (e.g. empty files)
+    updated = {
+        filepath: {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_hashes[filepath],
+            "tokens": (token_counts or {}).get(filepath, 0),
+            "chunks": [],
+        }
+        for filepath, stat in file_stats.items()
+        if filepath in file_hashes
+    }
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        updated[meta["filepath"]]["chunks"].append([meta["line_num"], meta["end_line"]])
+
+    # A re-read archive replaces all of its previous member entries
+    for filepath in updated:
+        if is_archive(filepath):
+            prefix = filepath + ARCHIVE_SEPARATOR
+            for stale in [path for path in table["files"] if path.startswith(prefix)]:
+                del table["files"][stale]
+
+    for filepath in removed:
+        table["files"].pop(filepath, None)
+    table["files"].update(updated)
+    atomic_write_json(table_path, table)
+    return len(table["files"])
+
+
+def hash_content(content: str) -> str:
+    """Content hash recorded in the chunk table (compared by worktree overlays)."""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def select_overlay_files(
+    files_to_index: list[tuple[Path, str]], base_table: dict
+) -> tuple[list[tuple[Path, str]], list[str]]:
+    """Split a worktree's files into those the main index already covers.
+
+    Returns (files to index into the overlay, main-index files to mask).
+    A file goes into the overlay when its content hash differs from the main
+    index's record (or the main index lacks it). Main-index files that are
+    changed, deleted or no longer allowlisted in the worktree are masked.
+    """
+    base_files = base_table.get("files", {})
+    overlay_files = []
+    masked = set()
+    seen = set()
+
+    for abs_path, rel_path in files_to_index:
+        seen.add(rel_path)
+        base_entry = base_files.get(rel_path)
+        try:
+            digest = file_digest(abs_path, rel_path)
+        except Exception:
+            digest = None
+        if base_entry and digest is not None and base_entry.get("sha256") == digest:
+            continue
+        overlay_files.append((abs_path, rel_path))
+        if base_entry:
+            masked.add(rel_path)
+
+    # Archive members follow their archive: masked if it changed or is gone
+    reindexed = {rel_path for _, rel_path in overlay_files}
+    for rel_path in base_files:
+        owner = archive_owner(rel_path)
+        if owner not in seen or (owner != rel_path and owner in reindexed):
+            masked.add(rel_path)
+    return overlay_files, sorted(masked)
+
+
+def load_chunk_table_files(chroma_dir: Path) -> dict[str, dict]:
+    """The "files" map of an index's chunk table ({} if missing or unreadable)."""
+    try:
+        with open(chroma_dir / CHUNK_TABLE_NAME) as f:
+            return json.load(f).get("files", {})
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def load_index_progress(progress_path: Path) -> dict | None:
+    """Checkpoint left by a budget-capped run, or None."""
+    try:
+        with open(progress_path) as f:
+            progress = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return progress if isinstance(progress.get("pending_files"), list) else None
+
+
+def find_removed_files(
+    chroma_dir: Path, paths: list[str], cwd: Path, archives: list[str], scanned: set[str]
+) -> set[str]:
+    """Indexed files a --paths update drops from the index.
+
+    A literal path argument (no glob characters) that no longer exists
+    matches that file, everything below it if it was a directory and every
+    member if it was an archive. Below a directory argument that still
+    exists, indexed files the scan no longer found (scanned) are matched.
+    Members of a re-read archive are included too; the ones it still
+    contains are re-added by the caller.
+    """
+    indexed = load_chunk_table_files(chroma_dir)
+    prefixes = [archive + ARCHIVE_SEPARATOR for archive in archives]
+    exact = set()
+    scanned_dirs = []
+    for pattern in paths:
+        path = Path(pattern)
+        if any(ch in pattern for ch in "*?["):
+            continue
+        if path.exists() and not path.is_dir():
+            continue
+        if path.is_absolute():
+            try:
+                path = path.relative_to(cwd)
+            except ValueError:
+                continue
+        target = str(path)
+        if path.exists():
+            scanned_dirs.append("" if target == "." else target + "/")
+            continue
+        prefixes += [target + "/", target + ARCHIVE_SEPARATOR]
+        exact.add(target)
+    prefixes = tuple(prefixes)
+    scanned_dirs = tuple(scanned_dirs)
+    return {
+        filepath for filepath in indexed
+        if filepath in exact or (prefixes and filepath.startswith(prefixes))
+        or (scanned_dirs and filepath.startswith(scanned_dirs) and archive_owner(filepath) not in scanned)
+    }
+
+
+def compute_file_centroids(chunks: list[dict], embeddings: list[list[float]]) -> dict[str, dict]:
+    """Compute one unit-length mean embedding per file.
+
+    Returns {filepath: {"embedding": [...], "file_type": str, "chunk_count": int}}.
+    """
+    rows_by_file = {}
+    for i, chunk in enumerate(chunks):
+        rows_by_file.setdefault(chunk["metadata"]["filepath"], []).append(i)
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    centroids = {}
+    for filepath, rows in rows_by_file.items():
+        mean = vectors[rows].mean(axis=0)
+        norm = np.linalg.norm(mean)
+        if norm > 0:
+            mean /= norm
+        centroids[filepath] = {
+            "embedding": mean.tolist(),
+            "file_type": chunks[rows[0]]["metadata"]["file_type"],
+            "chunk_count": len(rows),
+        }
+    return centroids
+
+
+def update_files_collection(files_collection, centroids: dict[str, dict], removed: set[str] = frozenset()) -> None:
+    """Upsert file centroid vectors into the file-level collection.
+
+    Files in removed (deleted, emptied, or dropped from a re-read archive)
+    lose their vectors so stage 1 of search no longer offers them.
+    """
+    stale = sorted(set(removed) - set(centroids))
+    batch_size = 5000  # ChromaDB max is 5461
+    for batch_start in range(0, len(stale), batch_size):
+        files_collection.delete(ids=stale[batch_start : batch_start + batch_size])
+
+    items = list(centroids.items())
+    for batch_start in range(0, len(items), batch_size):
+        batch = items[batch_start : batch_start + batch_size]
+        files_collection.upsert(
+            ids=[filepath for filepath, _ in batch],
+            embeddings=[entry["embedding"] for _, entry in batch],
+            metadatas=[
+                {"filepath": filepath, "file_type": entry["file_type"], "chunk_count": entry["chunk_count"]}
+                for filepath, entry in batch
+            ],
+        )
+
+
+def bump_index_generation(chroma_dir: Path) -> str:
+    """Write a fresh index generation token and return it."""
+    generation = uuid.uuid4().hex
+    generation_path = chroma_dir / INDEX_GENERATION_NAME
+    tmp_path = generation_path.with_name(f".{INDEX_GENERATION_NAME}.{os.getpid()}.tmp")
+    tmp_path.write_text(generation + "\n")
+    os.replace(tmp_path, generation_path)
+    return generation
+
+
+def append_run_log(storage_root: Path, record: dict) -> None:
+    """Append one run summary to the indexing history (best effort)."""
+    log_path = storage_root / INDEX_RUN_LOG
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logger.debug(f"Could not append to {log_path}: {e}")
+
+
+def open_collections(chroma_client, reset: bool, hnsw_params: dict[str, int]):
+    """Return (chunk collection, file collection).
+
+    reset=True (full rebuild) deletes and recreates both; otherwise the
+    existing collections are updated in place, with ef_search brought in
+    line with the config. Call with the index lock held.
+    """
+    if reset:
+        for name in ("project_docs", FILES_COLLECTION_NAME):
+            try:
+                chroma_client.delete_collection(name)
+                logger.debug(f"Deleted existing collection {name}")
+            except Exception:
+                pass
+
+    metadata = hnsw_metadata(hnsw_params)
+    collection = chroma_client.get_or_create_collection(name="project_docs", metadata=metadata)
+    files_collection = chroma_client.get_or_create_collection(name=FILES_COLLECTION_NAME, metadata=metadata)
+
+    for coll in (collection, files_collection):
+        current = (coll.configuration or {}).get("hnsw") or {}
+        if current.get("ef_search", hnsw_params["ef_search"]) != hnsw_params["ef_search"]:
+            coll.modify(configuration={"hnsw": {"ef_search": hnsw_params["ef_search"]}})
+            logger.info(f"Set ef_search={hnsw_params['ef_search']} on {coll.name}")
+        built = (current.get("max_neighbors"), current.get("ef_construction"))
+        if not reset and None not in built and built != (hnsw_params["M"], hnsw_params["ef_construction"]):
+            logger.warning(
+                f"{coll.name} was built with M={built[0]}, ef_construction={built[1]}; "
+                f"run a full rebuild to apply M={hnsw_params['M']}, ef_construction={hnsw_params['ef_construction']}"
+            )
+    return collection, files_collection
+
+
+def iter_index_documents(chroma_dir: Path, page_size: int = 5000):
+    """Yield every chunk text stored in an index's project_docs collection."""
+    chroma_client = chromadb.PersistentClient(path=str(chroma_dir), settings=CHROMA_SETTINGS)
+    try:
+        collection = chroma_client.get_collection("project_docs")
+    except Exception:
+        return
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["documents"])
+        yield from page["documents"]
+
+
+def export_cache_bundle(storage_root: Path, chroma_dirs: list[Path], bundle_path: Path) -> tuple[int, int]:
+    """Pack the content-cache entries referenced by the index into a bundle.
+
+    Returns (entries written, referenced chunks with no cache entry).
+    """
+    cache_root = storage_root / ".ai_cache" / "openai"
+    members: dict[str, Path] = {}
+    missing = 0
+    for chroma_dir in chroma_dirs:
+        for text in iter_index_documents(chroma_dir):
+            cache_path = get_cache_path(storage_root, EMBEDDING_MODEL, "content", text)
+            name = cache_path.relative_to(cache_root).as_posix()
+            if name in members:
+                continue
+            if cache_path.exists():
+                members[name] = cache_path
+            else:
+                missing += 1
+
+    # Checksum pass first so the manifest can lead the archive and imports
+    # can verify each entry as it streams past
+    checksums = {}
+    for name, cache_path in sorted(members.items()):
+        checksums[name] = hashlib.sha256(cache_path.read_bytes()).hexdigest()
+    manifest = {
+        "format": CACHE_BUNDLE_FORMAT,
+        "version": CACHE_BUNDLE_VERSION,
+        "model": EMBEDDING_MODEL,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "entries": checksums,
+    }
+    manifest_bytes = json.dumps(manifest, indent=1).encode()
+
+    bundle_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=bundle_path.parent, prefix=f".{bundle_path.name}.", suffix=".tmp")
+    try:
+        os.fchmod(fd, default_file_mode())
+        with os.fdopen(fd, "wb") as raw, tarfile.open(fileobj=raw, mode="w:gz") as tar:
+            info = tarfile.TarInfo(BUNDLE_MANIFEST_NAME)
+            info.size = len(manifest_bytes)
+            tar.addfile(info, fileobj=io.BytesIO(manifest_bytes))
+            for name in checksums:
+                tar.add(members[name], arcname=name, recursive=False)
+        os.replace(tmp_path, bundle_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(checksums), missing
+
+
+def import_cache_bundle(storage_root: Path, bundle_path: Path) -> tuple[int, int, int]:
+    """Merge a cache bundle into .ai_cache, verifying every entry.
+
+    Entries are content-addressed, so existing files are left alone and
+    importing the same bundle twice is a no-op. Returns (imported, already
+    present, rejected).
+    """
+    cache_root = storage_root / ".ai_cache" / "openai"
+    imported = present = rejected = 0
+    with tarfile.open(bundle_path, mode="r|gz") as tar:
+        manifest = None
+        for member in tar:
+            if manifest is None:
+                if member.name != BUNDLE_MANIFEST_NAME:
+                    raise ValueError(f"{bundle_path} is not a cache bundle (no manifest)")
+                manifest = json.load(tar.extractfile(member))
+                if manifest.get("format") != CACHE_BUNDLE_FORMAT:
+                    raise ValueError(f"{bundle_path} is not a cache bundle")
+                if manifest.get("version", 0) > CACHE_BUNDLE_VERSION:
+                    raise ValueError(f"{bundle_path} has unsupported version {manifest['version']}")
+                checksums = manifest["entries"]
+                continue
+
+            # Only plain <model>/<type>/<sha256>.json files listed in the manifest
+            parts = member.name.split("/")
+            expected = checksums.get(member.name)
+            if not member.isfile() or len(parts) != 3 or ".." in parts or expected is None:
+                logger.warning(f"  Rejected unexpected bundle member: {member.name}")
+                rejected += 1
+                continue
+
+            data = tar.extractfile(member).read()
+            if hashlib.sha256(data).hexdigest() != expected:
+                logger.warning(f"  Rejected {member.name}: checksum mismatch")
+                rejected += 1
+                continue
+            try:
+                entry = json.loads(data)
+                valid = hash_content(entry["text"]) == Path(parts[2]).stem and entry["embedding"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                valid = False
+            if not valid:
+                logger.warning(f"  Rejected {member.name}: entry does not match its key")
+                rejected += 1
+                continue
+
+            dest = cache_root / member.name
+            if dest.exists():
+                present += 1
+            else:
+                atomic_write_bytes(dest, data)
+                imported += 1
+
+    if manifest is None:
+        raise ValueError(f"{bundle_path} is empty")
+    return imported, present, rejected
+
+
+def estimate_index_cost(
+    files_to_index: list[tuple[Path, str]],
+    storage_root: Path,
+    cached_hashes: set[str],
+    sample_files: int,
+    seed: int = 0,
+) -> dict:
+    """Estimate chunks, tokens and uncached tokens from a stratified file sample.
+
+    Files are stratified by type and size bucket; each stratum gets a share
+    of the sample proportional to its bytes (at least two files). Within a
+    stratum, totals use a ratio estimator on file size, with the usual
+    finite-population-corrected variance. Returns {name: (estimate, 95%
+    half-width)} for "chunks", "tokens" and "uncached_tokens", plus counts.
+    """
+    strata: dict[tuple[str, int], list[tuple[Path, str, int]]] = {}
+    for abs_path, rel_path in files_to_index:
+        try:
+            size = abs_path.stat().st_size
+        except OSError:
+            continue
+        file_type = "archive" if is_archive(rel_path) else INDEXABLE_EXTENSIONS.get(abs_path.suffix.lower(), "text")
+        bucket = sum(size >= boundary for boundary in SIZE_BUCKETS)
+        strata.setdefault((file_type, bucket), []).append((abs_path, rel_path, size))
+
+    total_bytes = sum(size for files in strata.values() for _, _, size in files) or 1
+    rng = random.Random(seed)
+    metrics = ("chunks", "tokens", "uncached_tokens")
+    totals = {name: 0.0 for name in metrics}
+    variances = {name: 0.0 for name in metrics}
+    sampled = 0
+
+    for files in strata.values():
+        population = len(files)
+        stratum_bytes = sum(size for _, _, size in files)
+        n = min(population, max(2, round(sample_files * stratum_bytes / total_bytes)))
+        rows = []  # (bytes, chunks, tokens, uncached tokens) per sampled file
+        for abs_path, rel_path, size in rng.sample(files, n):
+            try:
+                _, sources = read_indexable_file(abs_path, rel_path, storage_root)
+            except Exception:
+                continue
+            chunks = [chunk for path, text in sources for chunk in split_into_chunks(text, path)]
+            tokens = uncached = 0
+            for chunk in chunks:
+                chunk_tokens = count_tokens(chunk["text"])
+                tokens += chunk_tokens
+                if hash_content(chunk["text"]) not in cached_hashes:
+                    uncached += chunk_tokens
+            rows.append((size, len(chunks), tokens, uncached))
+        if not rows:
+            continue
+        sampled += len(rows)
+
+        x = np.array([row[0] for row in rows], dtype=float)
+        x_sum = x.sum() or 1.0
+        fpc = 1 - len(rows) / population
+        for column, name in enumerate(metrics, start=1):
+            y = np.array([row[column] for row in rows], dtype=float)
+            ratio = y.sum() / x_sum
+            totals[name] += ratio * stratum_bytes
+            if len(rows) > 1 and fpc > 0:
+                residual_var = ((y - ratio * x) ** 2).sum() / (len(rows) - 1)
+                variances[name] += population ** 2 * fpc * residual_var / len(rows)
+
+    estimate = {name: (totals[name], 1.96 * math.sqrt(variances[name])) for name in metrics}
+    estimate["files"] = sum(len(files) for files in strata.values())
+    estimate["sampled"] = sampled
+    estimate["strata"] = len(strata)
+    return estimate
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Build semantic search index for docs and code"
@@ -436,7 +1340,37 @@ def main():
         "--dry-run", action="store_true",
         help="Estimate costs without making API calls"
     )
+    parser.add_argument(
+        "--estimate", type=int, nargs="?", const=DEFAULT_SAMPLE_FILES, default=None, metavar="FILES",
+        help=f"Dry run that samples ~FILES files (default: {DEFAULT_SAMPLE_FILES}) and reports a 95%% interval"
+    )
+    parser.add_argument(
+        "--max-cost", type=float, default=None, metavar="USD",
+        help="Stop before uncached embeddings would cost more than this"
+    )
+    parser.add_argument(
+        "--max-tokens", type=int, default=None,
+        help="Stop before embedding more than this many uncached tokens"
+    )
+    parser.add_argument(
+        "--allow-overshoot", action="store_true",
+        help="Embed the next file even if it alone exceeds --max-cost/--max-tokens"
+    )
+    parser.add_argument(
+        "--export-cache", type=Path, metavar="BUNDLE",
+        help="Write the cache entries used by the current index to a bundle file, then exit"
+    )
+    parser.add_argument(
+        "--import-cache", type=Path, metavar="BUNDLE", action="append",
+        help="Merge a cache bundle into .ai_cache, then exit (repeatable)"
+    )
+    parser.add_argument(
+        "--lock-timeout", type=float, default=DEFAULT_LOCK_TIMEOUT,
+        help=f"Seconds to wait for another run's index lock (default: {DEFAULT_LOCK_TIMEOUT})"
+    )
     args = parser.parse_args()
+    if args.estimate is not None:
+        args.dry_run = True
 
     # Configure logging
     log_level = logging.DEBUG if args.debug else logging.INFO
@@ -452,11 +1386,13 @@ def main():
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("openai").setLevel(logging.WARNING)
 
-    # Check for worktree
-    if is_worktree():
-        logger.error("ERROR: Running from a git worktree is not allowed.")
-        logger.error("Worktrees would create duplicate index entries.")
-        logger.error("Please run from the main repo: ~/code/chat_to_map_saas")
+    # In a git worktree, build an overlay on top of the main checkout's index
+    # (sharing its embedding cache) rather than a duplicate full index
+    overlay_mode = is_worktree()
+    if overlay_mode and args.paths:
+        logger.error("ERROR: Indexing specific paths is not supported from a git worktree.")
+        logger.error("Run semgrep-index with no arguments to refresh this worktree's overlay,")
+        logger.error("or index paths from the main repo: ~/code/chat_to_map_saas")
         return 1
 
     # Determine cache mode
@@ -468,12 +1404,56 @@ def main():
         cache_mode = "normal"
 
     # Get storage root (where cache and index live)
-    storage_root = get_storage_root()
+    base_table = None
+    if overlay_mode:
+        main_worktree = get_main_worktree()
+        if main_worktree is None:
+            logger.error("Could not locate the main checkout for this worktree.")
+            return 1
+        storage_root = get_main_storage_root(main_worktree)
+        base_chroma_dir = storage_root / ".chroma"
+        base_table_path = base_chroma_dir / CHUNK_TABLE_NAME
+        if not base_table_path.exists():
+            logger.error(f"No main index at {base_chroma_dir}. Run semgrep-index from {main_worktree} first.")
+            return 1
+        with open(base_table_path) as f:
+            base_table = json.load(f)
+        chroma_dir = Path.cwd() / OVERLAY_DIR_NAME
+    else:
+        storage_root = get_storage_root()
+        chroma_dir = storage_root / ".chroma"
     cache_dir = storage_root / ".ai_cache" / "openai"
-    chroma_dir = storage_root / ".chroma"
+    hnsw_params = load_hnsw_params(storage_root)
 
     logger.info(f"Storage root: {storage_root}")
     logger.info(f"Working dir: {Path.cwd()}")
+    if overlay_mode:
+        logger.info(f"Worktree overlay: {chroma_dir}")
+
+    if args.import_cache:
+        for bundle_path in args.import_cache:
+            logger.info(f"Importing cache bundle {bundle_path}...")
+            try:
+                imported, present, rejected = import_cache_bundle(storage_root, bundle_path)
+            except (OSError, ValueError, tarfile.TarError, json.JSONDecodeError) as e:
+                logger.error(f"ERROR: {e}")
+                return 1
+            logger.info(f"  Imported {imported:,} entries ({present:,} already cached, {rejected:,} rejected)")
+            if rejected:
+                return 1
+        return 0
+
+    if args.export_cache:
+        chroma_dirs = [storage_root / ".chroma"]
+        if overlay_mode and chroma_dir.exists():
+            chroma_dirs.append(chroma_dir)
+        logger.info(f"Exporting cache entries referenced by {', '.join(str(d) for d in chroma_dirs)}...")
+        written, missing = export_cache_bundle(storage_root, chroma_dirs, args.export_cache)
+        size_mb = args.export_cache.stat().st_size / (1024 * 1024)
+        logger.info(f"  Wrote {written:,} entries to {args.export_cache} ({size_mb:.1f} MB)")
+        if missing:
+            logger.warning(f"  {missing:,} indexed chunks had no cache entry (indexed with --no-cache?)")
+        return 0
 
     # Load environment from storage root
     env_file = storage_root / ".env"
@@ -492,7 +1472,6 @@ def main():
 
     # Initialize ChromaDB (skip for dry-run)
     chroma_client = None
-    collection = None
     if not args.dry_run:
         logger.debug(f"ChromaDB path: {chroma_dir}")
         chroma_client = chromadb.PersistentClient(path=str(chroma_dir), settings=CHROMA_SETTINGS)
@@ -518,20 +1497,13 @@ def main():
             else:
                 # Try as glob pattern
                 for p in cwd.glob(pattern):
-                    if p.is_file() and p.suffix.lower() in INDEXABLE_EXTENSIONS:
+                    if p.is_file() and is_indexable(p):
                         files_to_index.append((p.resolve(), str(p.relative_to(cwd))))
                     elif p.is_dir():
                         files_to_index.extend(find_indexable_files(p.resolve(), cwd))
 
         files_to_index = sorted(set(files_to_index), key=lambda x: x[1])
         logger.info(f"Indexing {len(files_to_index)} specified file(s) (bypassing allowlist)")
-
-        # When indexing specific files/dirs, update existing collection
-        if chroma_client:
-            collection = chroma_client.get_or_create_collection(
-                name="project_docs",
-                metadata={"hnsw:space": "cosine"},
-            )
     else:
         # Index default directories with allowlist filtering
         potential_files = []
@@ -551,53 +1523,99 @@ def main():
 
         logger.info(f"Found {len(files_to_index)} indexable files in allowlist")
 
-        # Full rebuild - delete and recreate collection
-        if chroma_client:
-            try:
-                chroma_client.delete_collection("project_docs")
-                logger.debug("Deleted existing collection")
-            except Exception:
-                pass
+    # Worktree overlay: keep only files that differ from the main index
+    masked_files = None
+    if overlay_mode:
+        files_to_index, masked_files = select_overlay_files(files_to_index, base_table)
+        logger.info(
+            f"Overlay: {len(files_to_index)} file(s) differ from the main index, "
+            f"{len(masked_files)} main-index file(s) masked"
+        )
 
-            collection = chroma_client.create_collection(
-                name="project_docs",
-                metadata={"hnsw:space": "cosine"},
-            )
+    if args.estimate is not None:
+        logger.info(f"\n[ESTIMATE] Sampling ~{args.estimate} files for model: {EMBEDDING_MODEL}")
+        cached_hashes = list_cached_hashes(storage_root, EMBEDDING_MODEL, "content")
+        estimate = estimate_index_cost(files_to_index, storage_root, cached_hashes, args.estimate)
+
+        def interval(name: str) -> str:
+            value, half_width = estimate[name]
+            return f"{value:,.0f} ± {half_width:,.0f}"
+
+        def cost_interval(name: str) -> str:
+            value, half_width = estimate[name]
+            per_token = EMBEDDING_COST_PER_1M_TOKENS / 1_000_000
+            return f"{format_cost(value * per_token)} ± {format_cost(half_width * per_token)}"
+
+        logger.info(f"\n{'=' * 50}")
+        logger.info(f"Sampled Cost Estimate for {EMBEDDING_MODEL} (95% interval)")
+        logger.info(f"{'=' * 50}")
+        logger.info(f"Files:           {estimate['files']:,} ({estimate['sampled']:,} sampled, {estimate['strata']} strata)")
+        logger.info(f"Total chunks:    {interval('chunks')}")
+        logger.info(f"Total tokens:    {interval('tokens')}")
+        logger.info(f"Uncached tokens: {interval('uncached_tokens')}")
+        logger.info(f"")
+        logger.info(f"Cost if all API: {cost_interval('tokens')}")
+        logger.info(f"This run cost:   {cost_interval('uncached_tokens')}")
+        logger.info(f"{'=' * 50}")
+        logger.info("Run with --dry-run (no --estimate) for an exact count.")
+        return 0
 
     # Collect all chunks
     all_chunks = []
     files_processed = []
+    file_stats = {}
+    file_hashes = {}
+
+    archives_processed = []
+
+    # PDFs: fill the extracted-text cache in parallel before the read loop
+    pdf_files = [(abs_path, rel_path) for abs_path, rel_path in files_to_index if is_pdf(rel_path)]
+    if pdf_files:
+        extract_pdfs(storage_root, pdf_files)
 
     for abs_path, rel_path in files_to_index:
         try:
-            content = abs_path.read_text(encoding="utf-8")
+            file_stats[rel_path] = abs_path.stat()
+            file_hash, sources = read_indexable_file(abs_path, rel_path, storage_root)
         except Exception as e:
+            file_stats.pop(rel_path, None)
             logger.warning(f"  Skipping {rel_path}: {e}")
             continue
-
-        chunks = split_into_chunks(content, rel_path)
-        if chunks:
-            all_chunks.extend(chunks)
-            files_processed.append(rel_path)
-            logger.debug(f"  {rel_path}: {len(chunks)} chunks")
-
-    # If updating specific files, remove their old chunks first
-    if args.paths and files_processed and collection:
-        for filepath in files_processed:
-            existing = collection.get(where={"filepath": filepath})
-            if existing["ids"]:
-                collection.delete(ids=existing["ids"])
-                logger.debug(f"  Removed {len(existing['ids'])} old chunks from {filepath}")
+        file_hashes[rel_path] = file_hash
+        if is_archive(rel_path):
+            archives_processed.append(rel_path)
+
+        for source_path, content in sources:
+            if source_path != rel_path:
+                # Archive member: hashed on its own, stat'd as its archive
+                file_stats[source_path] = file_stats[rel_path]
+                file_hashes[source_path] = hash_content(content)
+            chunks = split_into_chunks(content, source_path)
+            if chunks:
+                all_chunks.extend(chunks)
+                files_processed.append(source_path)
+                logger.debug(f"  {source_path}: {len(chunks)} chunks")
 
     logger.info(f"Total chunks to index: {len(all_chunks)}")
 
+    # Highest-value files first (stable, so chunks stay in file order)
+    all_chunks.sort(key=lambda chunk: embedding_priority(chunk["metadata"]["filepath"], allowlist))
+
     # Apply limit if specified
     if args.limit:
         all_chunks = all_chunks[: args.limit]
         logger.info(f"Limited to {len(all_chunks)} chunks (--limit {args.limit})")
 
-    if not all_chunks:
+    # A --paths run with nothing to embed still has to drop stale chunks
+    if not all_chunks and not args.paths:
         logger.info("No chunks to index.")
+        if chroma_client:
+            with index_lock(chroma_dir, args.lock_timeout):
+                open_collections(chroma_client, reset=not args.paths, hnsw_params=hnsw_params)
+                write_chunk_table(chroma_dir, [], {}, {}, replace=True)
+                if masked_files is not None:
+                    atomic_write_json(chroma_dir / OVERLAY_MASK_NAME, masked_files)
+                bump_index_generation(chroma_dir)
         return 0
 
     # Track stats
@@ -611,9 +1629,10 @@ def main():
     if args.dry_run:
         logger.info(f"\n[DRY RUN] Scanning cache for model: {EMBEDDING_MODEL}")
 
+        cached_hashes = list_cached_hashes(storage_root, EMBEDDING_MODEL, "content")
         for chunk in all_chunks:
             tokens = count_tokens(chunk["text"])
-            if is_cached(storage_root, EMBEDDING_MODEL, chunk["text"], "content"):
+            if hash_content(chunk["text"]) in cached_hashes:
                 cached_count += 1
                 cached_tokens += tokens
             else:
@@ -649,34 +1668,177 @@ def main():
     # Real indexing mode
     texts = [chunk["text"] for chunk in all_chunks]
 
-    # Count tokens before API calls
-    for text in texts:
-        tokens = count_tokens(text)
-        if is_cached(storage_root, EMBEDDING_MODEL, text, "content"):
-            cached_tokens += tokens
-        else:
-            uncached_tokens += tokens
+    # Count tokens before API calls, per file in priority order
+    file_tokens = {}
+    for chunk in all_chunks:
+        tokens = count_tokens(chunk["text"])
+        cached = cache_mode == "normal" and is_cached(storage_root, EMBEDDING_MODEL, chunk["text"], "content")
+        counts = file_tokens.setdefault(chunk["metadata"]["filepath"], [0, 0])
+        counts[0 if cached else 1] += tokens
+
+    # Budget units are on-disk files: an archive is admitted or deferred whole
+    unit_tokens = {}
+    for filepath, (file_cached, file_uncached) in file_tokens.items():
+        counts = unit_tokens.setdefault(archive_owner(filepath), [0, 0])
+        counts[0] += file_cached
+        counts[1] += file_uncached
+
+    # Resuming a budget-capped full run: its pending files go first, and
+    # files already in the index with unchanged content keep their vectors,
+    # so the run continues where the last one stopped even with --no-cache
+    token_budget = get_token_budget(args)
+    progress_path = chroma_dir / INDEX_PROGRESS_NAME
+    progress = load_index_progress(progress_path)
+    kept_files = set()
+    if progress is not None and not args.paths:
+        pending = list(dict.fromkeys(archive_owner(f) for f in progress["pending_files"]))
+        indexed = load_chunk_table_files(chroma_dir)
+        kept_files = {
+            owner for owner in unit_tokens
+            if owner not in pending and owner in indexed
+            and indexed[owner].get("sha256") == file_hashes.get(owner)
+        }
+        rank = {owner: i for i, owner in enumerate(pending)}
+        unit_tokens = dict(sorted(unit_tokens.items(), key=lambda item: rank.get(item[0], len(rank))))
+        logger.info(
+            f"Resuming budget-capped run: {len(rank.keys() & unit_tokens.keys())} pending file(s) first, "
+            f"{len(kept_files)} unchanged file(s) kept from the index"
+        )
+
+    # Budget: admit whole files until the next one's uncached tokens would
+    # not fit. Fully cached files are free and always admitted; anything
+    # after the first deferred file waits, so priority order is respected.
+    # A file that alone exceeds the budget can never fit, so it is deferred
+    # and reported as blocking unless --allow-overshoot admits it as the
+    # run's first paid file.
+    deferred_files = []
+    blocking_file = None
+    for owner, (unit_cached, unit_uncached) in unit_tokens.items():
+        if owner in kept_files:
+            continue
+        over_budget = token_budget is not None and unit_uncached and (
+            deferred_files or uncached_tokens + unit_uncached > token_budget
+        )
+        if over_budget and not (args.allow_overshoot and not uncached_tokens and not deferred_files):
+            if not deferred_files and unit_uncached > token_budget and not args.allow_overshoot:
+                blocking_file = (owner, unit_uncached)
+            deferred_files.append(owner)
+            continue
+        if over_budget:
+            logger.warning(
+                f"{owner} alone needs {unit_uncached:,} uncached tokens, over the budget of "
+                f"{token_budget:,}: embedding it anyway (--allow-overshoot)"
+            )
+        cached_tokens += unit_cached
+        uncached_tokens += unit_uncached
+
+    # Everything read this run, before deferred/kept files are set aside
+    scanned_files = set(file_hashes)
+    skipped = kept_files | set(deferred_files)
+    if skipped:
+        all_chunks = [chunk for chunk in all_chunks if archive_owner(chunk["metadata"]["filepath"]) not in skipped]
+        files_processed = [f for f in files_processed if archive_owner(f) not in skipped]
+        archives_processed = [f for f in archives_processed if f not in skipped]
+        for filepath in scanned_files:
+            if archive_owner(filepath) in skipped:
+                file_stats.pop(filepath, None)
+                file_hashes.pop(filepath, None)
+        texts = [chunk["text"] for chunk in all_chunks]
+    if deferred_files:
+        logger.warning(
+            f"Budget of {token_budget:,} tokens ({format_cost(token_budget / 1_000_000 * EMBEDDING_COST_PER_1M_TOKENS)}) "
+            f"reached: deferring {len(deferred_files)} file(s), first: {deferred_files[0]}"
+        )
+
+    # A full run rebuilds the index from scratch unless part of it is kept:
+    # files deferred by the budget (or already indexed by an earlier capped
+    # run) stay searchable with their previous vectors
+    reset = not args.paths and not skipped
 
     logger.info("Generating embeddings (batched)...")
     embeddings, cached_count, uncached_count, api_requests = get_embeddings_batch(
         client, texts, EMBEDDING_MODEL, storage_root, "content", cache_mode
     )
 
-    # Add all to ChromaDB (in batches due to max batch size limit)
+    # Everything below mutates the index: serialize with other runs
+    centroids = compute_file_centroids(all_chunks, embeddings)
     logger.info("Adding to ChromaDB...")
-    CHROMA_BATCH_SIZE = 5000  # ChromaDB max is 5461
-    for batch_start in range(0, len(all_chunks), CHROMA_BATCH_SIZE):
-        batch_end = min(batch_start + CHROMA_BATCH_SIZE, len(all_chunks))
-        batch_chunks = all_chunks[batch_start:batch_end]
-        batch_embeddings = embeddings[batch_start:batch_end]
-
-        collection.add(
-            ids=[chunk["id"] for chunk in batch_chunks],
-            embeddings=batch_embeddings,
-            documents=[chunk["text"] for chunk in batch_chunks],
-            metadatas=[chunk["metadata"] for chunk in batch_chunks],
+    with index_lock(chroma_dir, args.lock_timeout):
+        collection, files_collection = open_collections(chroma_client, reset=reset, hnsw_params=hnsw_params)
+
+        # Updating in place: remove the old chunks of every file read, along
+        # with files that are gone (a deleted --paths argument, or for a full
+        # run anything indexed that was not found this time)
+        removed_files = set()
+        if not reset:
+            if args.paths:
+                removed_files = find_removed_files(chroma_dir, args.paths, cwd, archives_processed, scanned_files)
+            else:
+                removed_files = set(load_chunk_table_files(chroma_dir)) - scanned_files
+            deleted_files = removed_files - set(file_hashes)
+            if deleted_files:
+                logger.info(f"Removing {len(deleted_files)} deleted file(s) from the index")
+            # Every file read this run, including ones that now yield no
+            # chunks; archive members go with the archive filter below
+            replaced = {f for f in file_hashes if not is_archive(f) and ARCHIVE_SEPARATOR not in f}
+            # Batched $in filters: two round trips per STALE_FILTER_BATCH files
+            stale_values = [("filepath", sorted(replaced | deleted_files)), ("archive", sorted(archives_processed))]
+            for key, values in stale_values:
+                for batch_start in range(0, len(values), STALE_FILTER_BATCH):
+                    where = {key: {"$in": values[batch_start:batch_start + STALE_FILTER_BATCH]}}
+                    existing = collection.get(where=where, include=[])
+                    if existing["ids"]:
+                        collection.delete(ids=existing["ids"])
+                        logger.debug(f"  Removed {len(existing['ids'])} old chunks ({key} filter)")
+
+        # Add all to ChromaDB (in batches due to max batch size limit)
+        CHROMA_BATCH_SIZE = 5000  # ChromaDB max is 5461
+        for batch_start in range(0, len(all_chunks), CHROMA_BATCH_SIZE):
+            batch_end = min(batch_start + CHROMA_BATCH_SIZE, len(all_chunks))
+            batch_chunks = all_chunks[batch_start:batch_end]
+            batch_embeddings = embeddings[batch_start:batch_end]
+
+            collection.add(
+                ids=[chunk["id"] for chunk in batch_chunks],
+                embeddings=batch_embeddings,
+                documents=[chunk["text"] for chunk in batch_chunks],
+                metadatas=[chunk["metadata"] for chunk in batch_chunks],
+            )
+            logger.debug(f"  Added batch {batch_start // CHROMA_BATCH_SIZE + 1}: {len(batch_chunks)} chunks")
+
+        # File-level centroid vectors for two-stage search. Every file read
+        # this run replaced its old chunks, so one without a centroid now
+        # (emptied, or an archive member that is gone) loses its vector.
+        if not reset:
+            removed_files |= set(file_hashes)
+        update_files_collection(files_collection, centroids, removed_files)
+        logger.debug(f"  Updated {len(centroids)} file vectors")
+
+        token_counts = {filepath: sum(counts) for filepath, counts in file_tokens.items()}
+        table_files = write_chunk_table(
+            chroma_dir, all_chunks, file_stats, file_hashes, replace=reset, token_counts=token_counts,
+            removed=removed_files - set(file_hashes),
         )
-        logger.debug(f"  Added batch {batch_start // CHROMA_BATCH_SIZE + 1}: {len(batch_chunks)} chunks")
+        logger.debug(f"  Chunk table: {table_files} files")
+        if masked_files is not None:
+            atomic_write_json(chroma_dir / OVERLAY_MASK_NAME, masked_files)
+        generation = bump_index_generation(chroma_dir)
+        logger.debug(f"  Index generation: {generation}")
+
+        # Checkpoint: finished files are in the index, so the next full run
+        # embeds the pending ones first and keeps the rest. A --paths run
+        # adds its deferred files to any pending list.
+        pending_files = deferred_files
+        if args.paths and progress is not None:
+            pending_files = list(dict.fromkeys(progress["pending_files"] + deferred_files))
+        if pending_files:
+            atomic_write_json(progress_path, {
+                "budget_tokens": token_budget,
+                "spent_tokens": uncached_tokens,
+                "pending_files": pending_files,
+            })
+        elif not args.paths and progress_path.exists():
+            progress_path.unlink()
 
     total_indexed = len(all_chunks)
 
@@ -700,9 +1862,39 @@ def main():
     logger.info(f"Saved by cache:  {format_cost(cached_cost)}")
     logger.info(f"This run cost:   {format_cost(uncached_cost)}")
     logger.info(f"{'=' * 50}")
+    if kept_files:
+        logger.info(f"Kept:            {len(kept_files)} unchanged file(s) already in the index")
+    if deferred_files:
+        logger.info(f"Deferred:        {len(deferred_files)} file(s) over budget (see {progress_path.name})")
+        if not blocking_file:
+            logger.info("Re-run semgrep-index to continue with the pending files.")
     logger.info(f"Database: {chroma_dir}")
+    append_run_log(storage_root, {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "mode": "paths" if args.paths else ("overlay" if overlay_mode else "full"),
+        "chunks": total_indexed,
+        "files": len(files_processed),
+        "cached_chunks": cached_count,
+        "uncached_chunks": uncached_count,
+        "cached_tokens": cached_tokens,
+        "uncached_tokens": uncached_tokens,
+        "api_requests": api_requests,
+        "cost_usd": round(uncached_cost, 6),
+        "deferred_files": len(deferred_files),
+    })
+    if blocking_file:
+        owner, owner_tokens = blocking_file
+        logger.error(
+            f"{owner} needs {owner_tokens:,} uncached tokens, more than the whole budget of "
+            f"{token_budget:,}; raise --max-cost/--max-tokens or re-run with --allow-overshoot"
+        )
+        return 1
     return 0
 
 
 if __name__ == "__main__":
-    exit(main())
+    try:
+        exit(main())
+    except TimeoutError as e:
+        logger.error(f"ERROR: {e} (is another semgrep-index still running?)")
+        exit(1)
@@ -1,27 +1,17 @@
 import os
-import re
+import sys
+import tempfile
 
-# Directories to process
-TARGET_DIRS = [
-    'research', 'project_docs', 'prds', 'feedback', 'handoffs',
-    'todo', 'design', 'experiments', 'qa', 'user_stories'
-]
-
-# Regex for standard markdown links: [text](path)
-# We avoid matching images ![text](path) by using a negative lookbehind, or just processing them carefully.
-# Standard link: (?<!!)\[(.*?)\]\((.*?)\)
-LINK_PATTERN = re.compile(r'(?<!!)\[(.*?)\]\((.*?)\)')
+from link_index import (
+    CACHE_PATH, LINK_PATTERN, TARGET_DIRS, build_index, is_internal_target, save_cache, update_entry,
+)
 
 def convert_link(match):
     text = match.group(1)
     path = match.group(2)
     
-    # Ignore external links
-    if path.startswith('http://') or path.startswith('https://') or path.startswith('mailto:'):
-        return match.group(0)
-    
-    # Ignore anchor links within same page
-    if path.startswith('#'):
+    # Ignore external links and anchor links within same page
+    if not is_internal_target(path):
         return match.group(0)
 
     # Clean path (remove ./ at start)
@@ -37,6 +27,23 @@ def convert_link(match):
     # Case 2: [[path|text]] otherwise
     return f'[[{clean_path}|{text}]]'
 
+def write_atomic(file_path, content):
+    # Write next to the original and rename over it, keeping its permissions
+    directory = os.path.dirname(file_path) or '.'
+    mode = os.stat(file_path).st_mode & 0o7777
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.convert.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            os.fchmod(f.fileno(), mode)
+            f.write(content)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
 def process_file(file_path):
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -46,24 +53,36 @@ def process_file(file_path):
         
         if new_content != content:
             print(f"Updating: {file_path}")
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
+            write_atomic(file_path, new_content)
+            return True
                 
     except Exception as e:
         print(f"Error processing {file_path}: {e}")
+    return False
 
 def main():
     root_dir = os.getcwd()
-    
-    for folder in TARGET_DIRS:
-        folder_path = os.path.join(root_dir, folder)
-        if not os.path.exists(folder_path):
-            continue
-            
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                if file.endswith('.md'):
-                    process_file(os.path.join(root, file))
+
+    # The link index knows which files still contain markdown links; files
+    # unchanged since the last run are only stat'ed, never read.
+    index = build_index(root_dir)
+    prefixes = tuple(folder + '/' for folder in TARGET_DIRS)
+    pending = [
+        rel_path for rel_path, entry in sorted(index.items())
+        if entry['has_markdown_links'] and rel_path.startswith(prefixes)
+    ]
+
+    # Update entries in memory and rewrite the cache once, not once per file
+    updated = False
+    for rel_path in pending:
+        if process_file(os.path.join(root_dir, rel_path)):
+            update_entry(index, rel_path, root_dir, save=False)
+            updated = True
+    if updated:
+        save_cache(os.path.join(root_dir, CACHE_PATH), index)
+
+    if not pending:
+        print("No markdown links to convert.", file=sys.stderr)
 
 if __name__ == '__main__':
     main()
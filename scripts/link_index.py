@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Persistent link graph for the Obsidian vault (wiki links and markdown links).
+
+Every markdown file in TARGET_DIRS (plus top-level *.md) is parsed for
+outgoing links with line numbers. Parse results are cached in
+.ai_cache/link_index.json keyed by size/mtime, with a content hash fallback,
+so a refresh only stats files and re-parses the changed ones (in parallel
+when there are many). Targets are resolved against the current file set at
+query time, so adding a note fixes links to it without re-parsing anything.
+
+Usage:
+    python scripts/link_index.py backlinks project_docs/FORMULAS.md
+    python scripts/link_index.py links research/NOTES.md
+    python scripts/link_index.py unresolved          # Broken links
+    python scripts/link_index.py orphans             # Notes with no links in or out
+    python scripts/link_index.py unresolved --json
+"""
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Directories to process
+TARGET_DIRS = [
+    'research', 'project_docs', 'prds', 'feedback', 'handoffs',
+    'todo', 'design', 'experiments', 'qa', 'user_stories'
+]
+
+CACHE_PATH = os.path.join('.ai_cache', 'link_index.json')
+CACHE_VERSION = 1
+
+# Re-parse in a process pool only when enough files changed to pay for it
+PARALLEL_THRESHOLD = 64
+
+# Standard markdown link [text](path), not images ![alt](path)
+LINK_PATTERN = re.compile(r'(?<!!)\[(.*?)\]\((.*?)\)')
+
+# Obsidian wiki link [[target]], [[target|alias]], [[target#heading]]
+WIKI_LINK_PATTERN = re.compile(r'\[\[([^\[\]|]+?)(?:\|.*?)?\]\]')
+
+
+def is_internal_target(path):
+    """False for external (http/https/mailto) and same-page anchor links."""
+    return not (
+        path.startswith('http://') or path.startswith('https://')
+        or path.startswith('mailto:') or path.startswith('#')
+    )
+
+
+def parse_links(text):
+    """Outgoing links in text.
+
+    Returns (links, has_markdown_links): links is [[line, target, kind], ...]
+    with kind 'wiki' or 'md'; has_markdown_links says whether
+    convert_links_to_wiki.py would rewrite anything in the file.
+    """
+    links = []
+    has_markdown_links = False
+    for line_num, line in enumerate(text.split('\n'), 1):
+        if '[' not in line:
+            continue
+        for match in WIKI_LINK_PATTERN.finditer(line):
+            links.append([line_num, match.group(1).strip(), 'wiki'])
+        for match in LINK_PATTERN.finditer(line):
+            target = match.group(2).strip()
+            if is_internal_target(target):
+                links.append([line_num, target, 'md'])
+                has_markdown_links = True
+    return links, has_markdown_links
+
+
+def parse_file(path, known_sha256=None):
+    """(size, mtime_ns, sha256, links, has_markdown_links) for one file, or None.
+
+    If the content hash equals known_sha256 the file is not re-parsed and
+    links/has_markdown_links come back as None (reuse the cached ones).
+    """
+    try:
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest == known_sha256:
+            return stat.st_size, stat.st_mtime_ns, digest, None, None
+        links, has_markdown_links = parse_links(data.decode('utf-8'))
+    except (OSError, UnicodeDecodeError):
+        return None
+    return stat.st_size, stat.st_mtime_ns, digest, links, has_markdown_links
+
+
+def _parse_file_args(args):
+    return parse_file(*args)
+
+
+def find_markdown_files(root_dir):
+    """Vault-relative paths (forward slashes) of all markdown files to index."""
+    paths = []
+    for name in os.listdir(root_dir):
+        if name.endswith('.md') and os.path.isfile(os.path.join(root_dir, name)):
+            paths.append(name)
+    for folder in TARGET_DIRS:
+        folder_path = os.path.join(root_dir, folder)
+        if not os.path.exists(folder_path):
+            continue
+        for root, _, files in os.walk(folder_path):
+            for file in files:
+                if file.endswith('.md'):
+                    paths.append(os.path.relpath(os.path.join(root, file), root_dir).replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def load_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+
+def save_cache(path, files):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.link_index.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': files}, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def make_entry(result):
+    size, mtime_ns, digest, links, has_markdown_links = result
+    return {
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'sha256': digest,
+        'links': links,
+        'has_markdown_links': has_markdown_links,
+    }
+
+
+def build_index(root_dir='.', cache_path=None):
+    """Return {vault path: {'size', 'mtime_ns', 'sha256', 'links', 'has_markdown_links'}}.
+
+    Only files whose size/mtime changed are read; of those, only files whose
+    content hash changed are re-parsed. The cache is rewritten (atomically)
+    only when something changed.
+    """
+    if cache_path is None:
+        cache_path = os.path.join(root_dir, CACHE_PATH)
+    cached = load_cache(cache_path)
+    index = {}
+    to_parse = []
+
+    for rel_path in find_markdown_files(root_dir):
+        entry = cached.get(rel_path)
+        try:
+            stat = os.stat(os.path.join(root_dir, rel_path))
+        except OSError:
+            continue
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            index[rel_path] = entry
+        else:
+            to_parse.append(rel_path)
+
+    jobs = [
+        (os.path.join(root_dir, rel_path), cached.get(rel_path, {}).get('sha256'))
+        for rel_path in to_parse
+    ]
+    if len(jobs) >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor() as pool:
+            results = list(pool.map(_parse_file_args, jobs, chunksize=16))
+    else:
+        results = [parse_file(*job) for job in jobs]
+    for rel_path, result in zip(to_parse, results):
+        if result is None:
+            print(f"Skipping {rel_path}: unreadable or not UTF-8", file=sys.stderr)
+        elif result[3] is None:
+            entry = cached[rel_path]
+            index[rel_path] = make_entry(result[:3] + (entry['links'], entry['has_markdown_links']))
+        else:
+            index[rel_path] = make_entry(result)
+
+    if to_parse or set(index) != set(cached):
+        try:
+            save_cache(cache_path, index)
+        except OSError as e:
+            print(f"Could not write {cache_path}: {e}", file=sys.stderr)
+    return index
+
+
+def update_entry(index, rel_path, root_dir='.', cache_path=None, save=True):
+    """Re-parse one file (e.g. after rewriting it) and persist the index.
+
+    With save=False only the in-memory index changes; callers updating many
+    files call save_cache once at the end.
+    """
+    result = parse_file(os.path.join(root_dir, rel_path))
+    if result is None:
+        index.pop(rel_path, None)
+    else:
+        index[rel_path] = make_entry(result)
+    if save:
+        save_cache(cache_path or os.path.join(root_dir, CACHE_PATH), index)
+
+
+class LinkResolver:
+    """Resolve link targets the way Obsidian does.
+
+    Tries, in order: relative to the linking note, relative to the vault
+    root, then a unique-by-name match ("[[FORMULAS]]"). Targets without an
+    extension are tried as .md notes. Non-markdown targets (PDFs, images)
+    are checked on disk.
+    """
+
+    def __init__(self, index, root_dir='.'):
+        self.root_dir = root_dir
+        self.notes = set(index)
+        self.by_name = {}
+        for rel_path in sorted(index, key=len):
+            name = posixpath.basename(rel_path)
+            self.by_name.setdefault(name, rel_path)
+            self.by_name.setdefault(name[:-3], rel_path)
+
+    def _exists(self, path):
+        return path in self.notes or (
+            not path.endswith('.md') and os.path.exists(os.path.join(self.root_dir, path))
+        )
+
+    def resolve(self, source, target):
+        target = target.split('#', 1)[0].split('?', 1)[0].strip()
+        if not target:
+            return source  # same-page heading link
+        target = target.replace('%20', ' ')
+        if target.startswith('./'):
+            target = target[2:]
+        candidates = [target] if posixpath.splitext(target)[1] else [target + '.md', target]
+
+        for candidate in candidates:
+            for base in (posixpath.dirname(source), ''):
+                path = posixpath.normpath(posixpath.join(base, candidate))
+                if not path.startswith('..') and self._exists(path):
+                    return path
+        for candidate in candidates:
+            if candidate in self.by_name:
+                return self.by_name[candidate]
+        return None
+
+
+def link_graph(index, root_dir='.'):
+    """(forward, backlinks, unresolved) built from the cached per-file links.
+
+    forward/backlinks map note -> sorted list of notes; unresolved maps
+    note -> [(line, target), ...].
+    """
+    resolver = LinkResolver(index, root_dir)
+    forward = {}
+    backlinks = {}
+    unresolved = {}
+    for source, entry in index.items():
+        targets = set()
+        for line_num, target, _ in entry['links']:
+            resolved = resolver.resolve(source, target)
+            if resolved is None:
+                unresolved.setdefault(source, []).append((line_num, target))
+            elif resolved != source:
+                targets.add(resolved)
+        forward[source] = sorted(targets)
+        for target in targets:
+            backlinks.setdefault(target, []).append(source)
+    for sources in backlinks.values():
+        sources.sort()
+    return forward, backlinks, unresolved
+
+
+def normalize_note(note):
+    note = note.replace(os.sep, '/')
+    return note[2:] if note.startswith('./') else note
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the vault's link graph")
+    parser.add_argument('query', choices=['backlinks', 'links', 'unresolved', 'orphans'])
+    parser.add_argument('note', nargs='?', help="Note path (for backlinks/links)")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    index = build_index('.')
+    forward, backlinks, unresolved = link_graph(index, '.')
+
+    if args.query in ('backlinks', 'links'):
+        if not args.note:
+            parser.error(f"{args.query} needs a note path")
+        note = normalize_note(args.note)
+        if note not in index and note + '.md' in index:
+            note += '.md'
+        result = (backlinks if args.query == 'backlinks' else forward).get(note, [])
+    elif args.query == 'unresolved':
+        result = {source: [{'line': line, 'target': target} for line, target in items]
+                  for source, items in sorted(unresolved.items())}
+    else:
+        result = sorted(note for note in index if not forward.get(note) and not backlinks.get(note))
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    elif isinstance(result, dict):
+        for source, items in result.items():
+            for item in items:
+                print(f"{source}:{item['line']}: {item['target']}")
+    else:
+        for note in result:
+            print(note)
+
+
+if __name__ == '__main__':
+    main()
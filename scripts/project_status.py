@@ -1,62 +1,34 @@
 #!/usr/bin/env python3
+import argparse
+import json
 import os
-import re
 import sys
 
-def get_todos():
-    # Assume script is run from project root, look for 'todo' dir
-    todo_dir = 'todo'
-    if not os.path.isdir(todo_dir):
-        # Fallback: if run from inside scripts/ dir
-        if os.path.isdir('../todo'):
-            todo_dir = '../todo'
-        else:
-            print(f"Error: Could not find 'todo' directory from {os.getcwd()}")
-            sys.exit(1)
+import todo_index
 
-    status_summary = {}
-    
-    # Regex to match "- [ ]", "* [ ]", "- [x]", "- [X]"
-    # \s* matches optional leading whitespace
-    # [-\*] matches bullet
-    # \s+ matches space between bullet and box
-    re_checked = re.compile(r'^\s*[-\*]\s+\[[xX]\]', re.MULTILINE)
-    re_unchecked = re.compile(r'^\s*[-\*]\s+\[ \]', re.MULTILINE)
 
-    for root, dirs, files in os.walk(todo_dir):
-        for file in files:
-            if file.endswith('.md'):
-                path = os.path.join(root, file)
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                except Exception as e:
-                    print(f"Skipping {path}: {e}")
-                    continue
-                    
-                checked = len(re_checked.findall(content))
-                unchecked = len(re_unchecked.findall(content))
-                total = checked + unchecked
-                
-                if total > 0:
-                    percent = (checked / total) * 100
-                    # Clean up path for display
-                    if todo_dir.startswith('..'):
-                         rel_path = os.path.relpath(path, '../todo')
-                    else:
-                         rel_path = os.path.relpath(path, todo_dir)
-                         
-                    status_summary[rel_path] = {
-                        'checked': checked,
-                        'total': total,
-                        'percent': percent
-                    }
-                    
-    return status_summary
+def get_todos():
+    todo_dir = todo_index.find_todo_dir()
+    if todo_dir is None:
+        print(f"Error: Could not find 'todo' directory from {os.getcwd()}")
+        sys.exit(1)
+
+    # Checkbox counts come from the shared TODO index, which only re-parses
+    # files that changed since the last call
+    return todo_index.progress(todo_index.build_index(todo_dir))
 
 def main():
+    parser = argparse.ArgumentParser(description="Checkbox progress for each file in todo/")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
     status = get_todos()
-    
+
+    if args.json:
+        json.dump(status, sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+
     if not status:
         print("No TODOs found (checked for '- [ ]' or '- [x]' in todo/ directory).")
         return
@@ -71,4 +43,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
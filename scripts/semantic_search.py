@@ -13,28 +13,84 @@ Usage:
     semgrep "readme" --type md             # Only markdown files
     semgrep "query" src/                   # Only files in src/
     semgrep "query" project/ --type md     # Markdown in project/
+    semgrep "query" --root . --root ../cyrus/project  # Search several indexes
+    semgrep "query" --files 50             # Two-stage: best 50 files, then chunks
+    semgrep "query" --files 0              # Exact: rank every chunk
+    semgrep "query" --timings              # Per-phase latency breakdown
+    SEMGREP_TRACE=~/semgrep.jsonl semgrep "query"   # Append JSONL timing trace
 """
 
 # Default similarity threshold - results below this are noise
 DEFAULT_THRESHOLD = 0.1
 
+# Two-stage search: rank chunks only within the N files whose centroid
+# vectors best match the query. Higher = better recall, slower. Indexes with
+# no more than N files (or no file vectors) search every chunk, as does
+# --files 0.
+DEFAULT_CANDIDATE_FILES = 100
+
+import time
+
+# Taken before any other import so --timings can attribute import cost
+_MODULE_START = time.perf_counter()
+_MODULE_START_NS = time.time_ns()
+
 import argparse
 import hashlib
 import json
 import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import chromadb
-from chromadb.config import Settings
-from dotenv import load_dotenv
-from openai import OpenAI
-
-# Disable ChromaDB telemetry
-CHROMA_SETTINGS = Settings(anonymized_telemetry=False)
+# chromadb, openai and dotenv are imported lazily in run_query() so that
+# result-cache hits never pay their import cost.
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 # Configuration
 EMBEDDING_MODEL = "text-embedding-3-large"
 
+# File-level centroid collection written by build_index.py
+FILES_COLLECTION_NAME = "project_files"
+
+# Worktree overlay index written by build_index.py when run from a git worktree
+OVERLAY_DIR_NAME = ".chroma_overlay"
+OVERLAY_MASK_NAME = "masked_files.json"
+
+# Per-file chunk-offset table written by build_index.py (lives in .chroma/)
+CHUNK_TABLE_NAME = "chunk_table.json"
+
+# Extra storage roots to search alongside the primary one (one path per line,
+# relative to the primary storage root). --root overrides this file.
+SEARCH_ROOTS_FILE = Path("scripts") / "search_roots.txt"
+
+# Index generation token written by build_index.py on every indexing run
+INDEX_GENERATION_NAME = "generation"
+
+# Bump when the cached result format changes
+RESULT_CACHE_VERSION = 1
+
+# Result cache pruning: generation directories are shared by every worktree and
+# root set using this storage root, so keep the most recently used few and only
+# delete ones nobody has written to for a while.
+RESULT_CACHE_KEEP_GENERATIONS = 8
+RESULT_CACHE_PRUNE_AGE = 24 * 3600  # seconds
+
+# Always-on latency tracing: append a JSONL record to this file for a
+# sampled fraction (SEMGREP_TRACE_SAMPLE, default 1.0) of invocations.
+TRACE_ENV = "SEMGREP_TRACE"
+TRACE_SAMPLE_ENV = "SEMGREP_TRACE_SAMPLE"
+
+# Set by bin/semgrep just before exec, so startup covers uv + interpreter boot
+START_NS_ENV = "SEMGREP_START_NS"
+
 
 def get_storage_root() -> Path:
     """Get the root directory for cache and index storage.
@@ -56,94 +112,378 @@ def get_storage_root() -> Path:
         return project_dir if project_dir.exists() else cwd
 
 
+def is_worktree() -> bool:
+    """Check if current directory is a git worktree (not the main repo)."""
+    return (Path.cwd() / ".git").is_file()
+
+
+def get_main_worktree() -> Path | None:
+    """Find the main checkout of the repo the current worktree belongs to."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--path-format=absolute", "--git-common-dir"],
+            capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    # The common dir is the main checkout's .git directory
+    return Path(result.stdout.strip()).parent
+
+
+def get_main_storage_root(main_worktree: Path) -> Path:
+    """Storage root of the main checkout (its project/ symlink, or itself)."""
+    project_dir = main_worktree / "project"
+    if project_dir.is_symlink():
+        return project_dir.resolve()
+    return main_worktree
+
+
+def load_overlay_mask(overlay_dir: Path) -> list[str]:
+    """Main-index files superseded by a worktree overlay."""
+    try:
+        with open(overlay_dir / OVERLAY_MASK_NAME) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+
+
 def get_cache_path(storage_root: Path, model: str, cache_type: str, content: str) -> Path:
-    """Generate cache path for an embedding request."""
+    """Generate cache path for an embedding request (no filesystem access)."""
     content_hash = hashlib.sha256(content.encode()).hexdigest()
-    cache_path = storage_root / ".ai_cache" / "openai" / model / cache_type / f"{content_hash}.json"
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-    return cache_path
+    return storage_root / ".ai_cache" / "openai" / model / cache_type / f"{content_hash}.json"
 
 
-def get_embedding(client: OpenAI, text: str, storage_root: Path, cache_type: str = "search") -> list[float]:
+def default_file_mode() -> int:
+    """Mode a plain open() would create files with (mkstemp uses 0600)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def atomic_write_json(path: Path, data) -> None:
+    """Write JSON via a temp file + rename, so readers never see a torn file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        os.fchmod(fd, default_file_mode())
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def get_embedding(client: "OpenAI", text: str, storage_root: Path, cache_type: str = "search") -> list[float]:
     """Get embedding for text, using cache if available."""
     cache_path = get_cache_path(storage_root, EMBEDDING_MODEL, cache_type, text)
 
-    # Check cache
-    if cache_path.exists():
+    # Check cache (a corrupt entry counts as a miss and gets rewritten)
+    try:
         with open(cache_path) as f:
             return json.load(f)["embedding"]
+    except (OSError, json.JSONDecodeError, KeyError):
+        pass
 
     # Call API
     response = client.embeddings.create(model=EMBEDDING_MODEL, input=text)
     embedding = response.data[0].embedding
 
     # Cache response
-    with open(cache_path, "w") as f:
-        json.dump({"text": text, "embedding": embedding}, f)
+    atomic_write_json(cache_path, {"text": text, "embedding": embedding})
 
     return embedding
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Semantic search across project docs and code")
-    parser.add_argument("query", help="Search query")
-    parser.add_argument("path", nargs="?", help="Filter to files under this path (e.g. src/, project/)")
-    parser.add_argument("--top", "-n", type=int, default=10, help="Number of results (default: 10)")
-    parser.add_argument(
-        "--threshold", "-t", type=float, default=DEFAULT_THRESHOLD,
-        help=f"Minimum similarity threshold (default: {DEFAULT_THRESHOLD})"
-    )
-    parser.add_argument(
-        "--type", dest="file_type",
-        help="Filter by file type (e.g. md, ts, py, svelte)"
-    )
-    parser.add_argument("-A", type=int, default=0, help="Show N chunks after match")
-    parser.add_argument("-B", type=int, default=0, help="Show N chunks before match")
-    parser.add_argument("-C", type=int, default=0, help="Show N chunks before and after match")
-    parser.add_argument("--no-line-num", action="store_true", help="Hide line numbers")
-    parser.add_argument("--similarity", action="store_true", help="Show similarity scores")
-    parser.add_argument("--chunk", action="store_true", help="Show chunk indices")
-    args = parser.parse_args()
+def load_chunk_table(chroma_dir: Path) -> dict:
+    """Load the per-file chunk-offset table written by build_index.py.
 
-    # -C sets both -A and -B
-    if args.C:
-        args.A = args.C
-        args.B = args.C
+    Returns an empty table if the index predates it or it can't be read.
+    """
+    table_path = chroma_dir / CHUNK_TABLE_NAME
+    if not table_path.exists():
+        return {"files": {}}
+    try:
+        with open(table_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"files": {}}
 
-    # Get storage root
-    storage_root = get_storage_root()
-    chroma_dir = storage_root / ".chroma"
 
-    # Check if index exists
-    if not chroma_dir.exists():
-        print("Error: No index found. Run semgrep-index first:")
-        print("  semgrep-index")
-        return 1
+def read_chunks_from_source(table: dict, filepath: str, wanted: set[int]) -> dict[int, tuple]:
+    """Read chunk texts straight from the source file using the chunk table.
 
-    # Load environment from storage root
-    env_file = storage_root / ".env"
-    if env_file.exists():
-        load_dotenv(env_file)
+    Only used when the file is unchanged since indexing (same size and mtime),
+    so the line spans in the table are still valid. Returns
+    {chunk_index: (line_num, text)}, or {} if the file can't be used.
+    """
+    entry = table["files"].get(filepath)
+    if not entry or filepath.lower().endswith(".pdf") or "!/" in filepath:
+        return {}  # PDFs and archive members have no plain-text source on disk
+    path = Path(table.get("root", ".")) / filepath
+    try:
+        stat = path.stat()
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            return {}
+        lines = path.read_text(encoding="utf-8").split("\n")
+    except (OSError, UnicodeDecodeError):
+        return {}
+
+    found = {}
+    for idx in wanted:
+        if 0 <= idx < len(entry["chunks"]):
+            start, end = entry["chunks"][idx]
+            found[idx] = (start, "\n".join(lines[start - 1:end]).strip())
+    return found
+
+
+def fetch_context_chunks(collection, table: dict, targets: dict[str, set[int]]) -> dict[tuple, tuple]:
+    """Resolve neighbor chunks for all displayed results at once.
+
+    targets maps filepath -> chunk indices wanted. Unchanged files are read
+    directly from disk; everything else is fetched in a single batched
+    collection.get(). Returns {(filepath, chunk_index): (line_num, text)}.
+    """
+    resolved = {}
+    missing_ids = []
+    for filepath, wanted in targets.items():
+        entry = table["files"].get(filepath)
+        if entry:
+            # Drop indices past the end of the file - they don't exist
+            wanted = {idx for idx in wanted if idx < len(entry["chunks"])}
+        from_source = read_chunks_from_source(table, filepath, wanted)
+        for idx, value in from_source.items():
+            resolved[(filepath, idx)] = value
+        missing_ids.extend(f"{filepath}:{idx}" for idx in sorted(wanted - from_source.keys()))
+
+    if missing_ids:
+        context = collection.get(ids=missing_ids, include=["documents", "metadatas"])
+        for doc, metadata in zip(context["documents"], context["metadatas"]):
+            key = (metadata["filepath"], metadata["chunk_index"])
+            resolved[key] = (metadata.get("line_num"), doc)
+
+    return resolved
+
+
+class PhaseTimer:
+    """Accumulates wall-clock time per search phase.
+
+    Each mark(phase) charges the time since the previous mark to that phase.
+    """
 
-    # Initialize OpenAI client
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("Error: OPENAI_API_KEY not found in .env")
-        return 1
+    def __init__(self, include_startup: bool = False):
+        self.phases: dict[str, float] = {}
+        self.info: dict = {}
+        self._last = time.perf_counter()
+        if not include_startup:
+            return
+
+        # Interpreter/uv start-up before this module began executing
+        # (ignore values inherited from an earlier launch)
+        launched_ns = os.getenv(START_NS_ENV)
+        if launched_ns and launched_ns.isdigit():
+            startup = (_MODULE_START_NS - int(launched_ns)) / 1e9
+            if 0.0 <= startup < 60.0:
+                self.phases["startup"] = startup
+        self.phases["imports"] = self._last - _MODULE_START
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def report(self) -> str:
+        """Human-readable per-phase breakdown."""
+        total = self.total()
+        lines = ["", "Timings:"]
+        for phase, seconds in self.phases.items():
+            share = (seconds / total * 100) if total else 0.0
+            lines.append(f"  {phase:<14} {seconds * 1000:9.1f} ms  {share:5.1f}%")
+        lines.append(f"  {'total':<14} {total * 1000:9.1f} ms")
+        for key, value in self.info.items():
+            lines.append(f"  {key}: {value}")
+        return "\n".join(lines)
+
+    def trace_record(self, args: argparse.Namespace) -> dict:
+        """Machine-readable record for the JSONL trace."""
+        return {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "query": args.query,
+            "path": args.path,
+            "file_type": args.file_type,
+            "top": args.top,
+            "threshold": args.threshold,
+            "before": args.B,
+            "after": args.A,
+            "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in self.phases.items()},
+            "total_ms": round(self.total() * 1000, 3),
+            **self.info,
+        }
+
+
+def append_trace(trace_path: Path, record: dict) -> None:
+    """Append one JSONL trace record."""
+    trace_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(trace_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def get_trace_path(args: argparse.Namespace) -> Path | None:
+    """Where to append a trace record for this run, if anywhere.
+
+    --trace always records; SEMGREP_TRACE records a sampled fraction of runs.
+    """
+    if args.trace:
+        return Path(args.trace)
+    env_path = os.getenv(TRACE_ENV)
+    if not env_path:
+        return None
+    try:
+        sample_rate = float(os.getenv(TRACE_SAMPLE_ENV, "1.0"))
+    except ValueError:
+        sample_rate = 1.0
+    return Path(env_path) if random.random() < sample_rate else None
+
+
+def get_search_roots(storage_root: Path, cli_roots: list[str] | None) -> list[Path]:
+    """Storage roots to search: --root values, else primary + search_roots.txt."""
+    if cli_roots:
+        roots = [Path(root).expanduser().resolve() for root in cli_roots]
+    else:
+        roots = [storage_root]
+        roots_file = storage_root / SEARCH_ROOTS_FILE
+        if roots_file.exists():
+            with open(roots_file) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        roots.append((storage_root / Path(line).expanduser()).resolve())
+
+    # Preserve order, drop duplicates
+    return list(dict.fromkeys(roots))
 
-    client = OpenAI(api_key=api_key)
 
-    # Initialize ChromaDB
-    chroma_client = chromadb.PersistentClient(path=str(chroma_dir), settings=CHROMA_SETTINGS)
+def get_shard_labels(roots: list[Path]) -> list[str | None]:
+    """Display labels prefixed to result paths when searching several roots.
 
+    A single root keeps plain paths, exactly as before.
+    """
+    if len(roots) == 1:
+        return [None]
+    labels = []
+    for root in roots:
+        label = root.name
+        while label in labels:
+            label = f"{label}~"
+        labels.append(label)
+    return labels
+
+
+def read_index_generation(chroma_dir: Path) -> str | None:
+    """Read the index generation token (None for indexes that predate it)."""
     try:
-        collection = chroma_client.get_collection("project_docs")
-    except ValueError:
-        print("Error: Collection 'project_docs' not found. Run semgrep-index first.")
-        return 1
+        return (chroma_dir / INDEX_GENERATION_NAME).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def combined_generation(chroma_dirs: list[Path]) -> str | None:
+    """One generation token covering every shard being searched.
+
+    Changes whenever any shard is re-indexed; None if any shard has no token.
+    """
+    generations = [read_index_generation(chroma_dir) for chroma_dir in chroma_dirs]
+    if None in generations:
+        return None
+    if len(chroma_dirs) == 1:
+        return generations[0]
+    key = json.dumps([[str(d), g] for d, g in zip(chroma_dirs, generations)])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace so trivially different spellings share a cache entry."""
+    return " ".join(query.split())
+
+
+def get_result_cache_path(storage_root: Path, generation: str, args: argparse.Namespace) -> Path:
+    """Cache path for a query's results within one index generation.
+
+    Keyed by everything that changes which chunks come back: the normalized
+    query, path/type filters, --top, --threshold and the context window.
+    Display-only flags (--similarity, --chunk, --no-line-num) are not part
+    of the key.
+    """
+    key = json.dumps([
+        RESULT_CACHE_VERSION,
+        normalize_query(args.query),
+        args.path.rstrip("/") if args.path else None,
+        args.file_type.lstrip(".") if args.file_type else None,
+        args.top,
+        args.threshold,
+        args.files,
+        args.B,
+        args.A,
+    ])
+    key_hash = hashlib.sha256(key.encode()).hexdigest()
+    return storage_root / ".ai_cache" / "search_results" / generation / f"{key_hash}.json"
+
+
+def load_cached_results(cache_path: Path) -> dict | None:
+    """Load cached query results, or None on a miss."""
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def prune_result_cache(cache_root: Path, current: Path) -> None:
+    """Drop old generation directories from the result cache.
+
+    Other worktrees, root sets or concurrent searches may be using any of the
+    other generations, so only directories beyond the newest
+    RESULT_CACHE_KEEP_GENERATIONS that are also older than
+    RESULT_CACHE_PRUNE_AGE are removed.
+    """
+    generations = []
+    for path in cache_root.iterdir():
+        try:
+            if path.is_dir() and path != current:
+                generations.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    generations.sort(reverse=True)
+    cutoff = time.time() - RESULT_CACHE_PRUNE_AGE
+    for mtime, path in generations[RESULT_CACHE_KEEP_GENERATIONS - 1:]:
+        if mtime < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
 
-    # Build where clause for filtering
-    where_clause = None
+
+def save_cached_results(cache_path: Path, result: dict) -> None:
+    """Cache query results; prunes stale generations on the first write of a new one."""
+    generation_dir = cache_path.parent
+    new_generation = not generation_dir.exists()
+    try:
+        atomic_write_json(cache_path, result)
+    except FileNotFoundError:
+        # Directory removed by another process's prune - the cache is optional
+        return
+    if new_generation:
+        prune_result_cache(generation_dir.parent, generation_dir)
+
+
+def build_where_clause(args: argparse.Namespace, masked_files: list[str] | None = None) -> dict | None:
+    """ChromaDB metadata filter for --type and masked (superseded) files.
+
+    Path prefix filtering happens post-query.
+    """
     where_conditions = []
 
     if args.file_type:
@@ -151,17 +491,105 @@ def main():
         file_type = args.file_type.lstrip(".")
         where_conditions.append({"file_type": file_type})
 
-    if args.path:
-        # Path filtering is done post-query since ChromaDB doesn't support prefix matching
-        pass
+    if masked_files:
+        where_conditions.append({"filepath": {"$nin": masked_files}})
 
     if len(where_conditions) == 1:
-        where_clause = where_conditions[0]
+        return where_conditions[0]
     elif len(where_conditions) > 1:
-        where_clause = {"$and": where_conditions}
+        return {"$and": where_conditions}
+    return None
 
-    # Get query embedding
-    query_embedding = get_embedding(client, args.query, storage_root, "search")
+
+def matches_path(filepath: str, label: str | None, filter_path: str) -> bool:
+    """Check a file against a path prefix, with or without its shard label."""
+    labeled = f"{label}/{filepath}" if label else filepath
+    return filepath.startswith(filter_path) or labeled.startswith(filter_path)
+
+
+def select_candidate_files(
+    chroma_client,
+    args: argparse.Namespace,
+    label: str | None,
+    query_embedding: list[float],
+    where_clause: dict | None,
+) -> list[str] | None:
+    """Stage 1 of two-stage search: pick the files whose centroids best match.
+
+    Returns None when stage 1 should be skipped (disabled with --files 0,
+    index built before file vectors existed, or no more files than --files),
+    in which case every chunk is searched.
+    """
+    if args.files <= 0:
+        return None
+    try:
+        files_collection = chroma_client.get_collection(FILES_COLLECTION_NAME)
+    except Exception:
+        return None
+
+    file_count = files_collection.count()
+    if file_count <= args.files:
+        return None
+
+    # Fetch extra files when a path filter will discard some of them
+    n_files = min(file_count, args.files * 5 if args.path else args.files)
+    results = files_collection.query(
+        query_embeddings=[query_embedding],
+        n_results=n_files,
+        where=where_clause,
+        include=["metadatas"],
+    )
+
+    filter_path = args.path.rstrip("/") if args.path else None
+    candidates = []
+    for metadata in results["metadatas"][0]:
+        if filter_path and not matches_path(metadata["filepath"], label, filter_path):
+            continue
+        candidates.append(metadata["filepath"])
+        if len(candidates) == args.files:
+            break
+    return candidates
+
+
+def query_shard(
+    args: argparse.Namespace,
+    chroma_dir: Path,
+    label: str | None,
+    masked_files: list[str] | None,
+    query_embedding: list[float],
+    timer: PhaseTimer,
+) -> dict | str:
+    """Search one index and resolve its context chunks.
+
+    Chunks from masked_files (superseded by a worktree overlay) are skipped.
+    Returns a result dict (see run_query), with file paths prefixed by
+    label when set, or an error message.
+    """
+    import chromadb
+    from chromadb.config import Settings
+    from chromadb.errors import NotFoundError
+
+    # Initialize ChromaDB (telemetry disabled)
+    chroma_client = chromadb.PersistentClient(
+        path=str(chroma_dir), settings=Settings(anonymized_telemetry=False)
+    )
+
+    try:
+        collection = chroma_client.get_collection("project_docs")
+    except (ValueError, NotFoundError):  # chromadb < 1.0 raised ValueError
+        return f"Collection 'project_docs' not found in {chroma_dir}. Run semgrep-index first."
+    timer.mark("open_index")
+
+    # Stage 1 (optional): restrict the chunk search to candidate files
+    where_clause = build_where_clause(args, masked_files)
+    candidates = select_candidate_files(chroma_client, args, label, query_embedding, where_clause)
+    if candidates is not None:
+        timer.info["candidate_files"] = len(candidates)
+        if not candidates:
+            return {"found": False, "matches": [], "context": []}
+        file_condition = {"filepath": {"$in": candidates}}
+        where_clause = {"$and": [where_clause, file_condition]} if where_clause else file_condition
+        timer.mark("file_query")
 
     # Search - get more results if we're filtering by path
     n_results = args.top * 5 if args.path else args.top
@@ -171,9 +599,265 @@ def main():
         n_results=n_results,
         where=where_clause
     )
+    timer.mark("vector_query")
 
-    # Display results (grep-style output)
     if not results["documents"][0]:
+        return {"found": False, "matches": [], "context": []}
+
+    # Filter by path prefix and threshold
+    matches = []
+    for doc, metadata, distance in zip(
+        results["documents"][0], results["metadatas"][0], results["distances"][0]
+    ):
+        similarity = 1 - distance
+
+        # Skip results below threshold
+        if similarity < args.threshold:
+            continue
+
+        filepath = metadata["filepath"]
+
+        # Filter by path prefix if specified (with or without the shard label)
+        if args.path:
+            # Normalize path (remove trailing slash)
+            filter_path = args.path.rstrip("/")
+            if not matches_path(filepath, label, filter_path):
+                continue
+
+        matches.append([filepath, metadata["chunk_index"], metadata.get("line_num"), similarity, doc])
+        if len(matches) >= args.top:
+            break
+    timer.mark("filter")
+
+    # Resolve all context chunks in one pass (cost doesn't grow with -A/-B/-C)
+    context = []
+    if args.B > 0 or args.A > 0:
+        targets = {}
+        for filepath, chunk_index, _, _, _ in matches:
+            wanted = targets.setdefault(filepath, set())
+            wanted.update(
+                idx for idx in range(chunk_index - args.B, chunk_index + args.A + 1)
+                if idx >= 0 and idx != chunk_index
+            )
+        resolved = fetch_context_chunks(collection, load_chunk_table(chroma_dir), targets)
+        context = [[filepath, idx, line, text] for (filepath, idx), (line, text) in resolved.items()]
+        timer.mark("context")
+
+    if label:
+        for row in matches + context:
+            row[0] = f"{label}/{row[0]}"
+
+    return {"found": True, "matches": matches, "context": context}
+
+
+def run_query(
+    args: argparse.Namespace,
+    storage_root: Path,
+    shards: list[tuple[str | None, Path, list[str] | None]],
+    timer: PhaseTimer,
+) -> dict | int:
+    """Embed the query once and search every shard concurrently.
+
+    shards is a list of (label, chroma_dir, masked_files). Shard results are merged by
+    similarity into one top-k list; cosine similarity from the same embedding
+    model is already on a common scale across shards, so no rescaling is
+    needed and --threshold means the same thing everywhere.
+
+    Returns a JSON-serializable result dict:
+        found:   whether any index returned anything at all
+        matches: [filepath, chunk_index, line_num, similarity, text] rows
+        context: [filepath, chunk_index, line_num, text] rows for -A/-B/-C
+    or an exit status on error.
+    """
+    import chromadb  # noqa: F401  (import cost is charged to lazy_imports)
+    from dotenv import load_dotenv
+    from openai import OpenAI
+    timer.mark("lazy_imports")
+
+    # Load environment from storage root
+    env_file = storage_root / ".env"
+    if env_file.exists():
+        load_dotenv(env_file)
+    timer.mark("load_dotenv")
+
+    # Initialize OpenAI client
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("Error: OPENAI_API_KEY not found in .env")
+        return 1
+
+    client = OpenAI(api_key=api_key)
+
+    # Get query embedding (shared by all shards)
+    timer.info["embedding_cached"] = get_cache_path(
+        storage_root, EMBEDDING_MODEL, "search", args.query
+    ).exists()
+    query_embedding = get_embedding(client, args.query, storage_root, "search")
+    timer.mark("embedding")
+
+    if len(shards) == 1:
+        label, chroma_dir, masked_files = shards[0]
+        result = query_shard(args, chroma_dir, label, masked_files, query_embedding, timer)
+        if isinstance(result, str):
+            print(f"Error: {result}")
+            return 1
+        return result
+
+    # Federated search: one thread per shard, wall time = slowest shard
+    shard_timers = [PhaseTimer() for _ in shards]
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        shard_results = list(pool.map(
+            lambda i: query_shard(args, shards[i][1], shards[i][0], shards[i][2],
+                                  query_embedding, shard_timers[i]),
+            range(len(shards)),
+        ))
+    timer.mark("shards")
+    timer.info["shards_ms"] = {
+        f"{chroma_dir.parent.name}/{chroma_dir.name}": round(shard_timer.total() * 1000, 1)
+        for (_, chroma_dir, _), shard_timer in zip(shards, shard_timers)
+    }
+
+    found = False
+    matches = []
+    context = []
+    for (_, chroma_dir, _), result in zip(shards, shard_results):
+        if isinstance(result, str):
+            print(f"Warning: skipping {chroma_dir}: {result}", file=sys.stderr)
+            continue
+        found = found or result["found"]
+        matches.extend(result["matches"])
+        context.extend(result["context"])
+
+    matches.sort(key=lambda row: row[3], reverse=True)
+    matches = matches[:args.top]
+    kept_files = {row[0] for row in matches}
+    context = [row for row in context if row[0] in kept_files]
+    timer.mark("merge")
+
+    return {"found": found, "matches": matches, "context": context}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic search across project docs and code")
+    parser.add_argument("query", help="Search query")
+    parser.add_argument("path", nargs="?", help="Filter to files under this path (e.g. src/, project/)")
+    parser.add_argument("--top", "-n", type=int, default=10, help="Number of results (default: 10)")
+    parser.add_argument(
+        "--threshold", "-t", type=float, default=DEFAULT_THRESHOLD,
+        help=f"Minimum similarity threshold (default: {DEFAULT_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--type", dest="file_type",
+        help="Filter by file type (e.g. md, ts, py, svelte)"
+    )
+    parser.add_argument(
+        "--files", type=int, default=DEFAULT_CANDIDATE_FILES, metavar="N",
+        help=f"Only rank chunks from the N best-matching files; 0 searches every chunk "
+             f"(default: {DEFAULT_CANDIDATE_FILES})"
+    )
+    parser.add_argument("-A", type=int, default=0, help="Show N chunks after match")
+    parser.add_argument("-B", type=int, default=0, help="Show N chunks before match")
+    parser.add_argument("-C", type=int, default=0, help="Show N chunks before and after match")
+    parser.add_argument("--no-line-num", action="store_true", help="Hide line numbers")
+    parser.add_argument("--similarity", action="store_true", help="Show similarity scores")
+    parser.add_argument("--chunk", action="store_true", help="Show chunk indices")
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Bypass the result cache (always query the index)"
+    )
+    parser.add_argument(
+        "--root", action="append", metavar="DIR",
+        help=f"Search this storage root (repeatable; default: current root + {SEARCH_ROOTS_FILE})"
+    )
+    parser.add_argument(
+        "--timings", action="store_true",
+        help="Print a per-phase latency breakdown to stderr"
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help=f"Append a JSONL timing record to FILE (or set {TRACE_ENV}=FILE)"
+    )
+    args = parser.parse_args()
+    if args.top < 1:
+        parser.error("--top must be at least 1")
+    timer = PhaseTimer(include_startup=True)
+
+    # -C sets both -A and -B
+    if args.C:
+        args.A = args.C
+        args.B = args.C
+
+    # Get storage root(s) - the first holds .env and the caches
+    storage_root = get_storage_root()
+
+    # In a git worktree, search the main checkout's index plus this
+    # worktree's overlay (which masks the main-index files it supersedes)
+    overlay_dir = None
+    if not args.root and is_worktree():
+        main_worktree = get_main_worktree()
+        if main_worktree:
+            storage_root = get_main_storage_root(main_worktree)
+        if (Path.cwd() / OVERLAY_DIR_NAME).exists():
+            overlay_dir = Path.cwd() / OVERLAY_DIR_NAME
+        else:
+            print("Note: no overlay index for this worktree; results reflect the main checkout.",
+                  file=sys.stderr)
+            print("  Run semgrep-index here to index this worktree's changes.", file=sys.stderr)
+
+    roots = get_search_roots(storage_root, args.root)
+    if args.root:
+        storage_root = roots[0]
+
+    # Check which indexes exist
+    shards = []
+    for label, root in zip(get_shard_labels(roots), roots):
+        chroma_dir = root / ".chroma"
+        masked_files = None
+        if overlay_dir and root == storage_root:
+            masked_files = load_overlay_mask(overlay_dir)
+            shards.append((label, overlay_dir, None))
+        if chroma_dir.exists():
+            shards.append((label, chroma_dir, masked_files))
+        elif len(roots) > 1:
+            print(f"Warning: no index at {root}, skipping", file=sys.stderr)
+
+    if not shards:
+        print("Error: No index found. Run semgrep-index first:")
+        print("  semgrep-index")
+        return 1
+
+    # Result cache: keyed per index generation, so re-indexing invalidates it
+    generation = combined_generation([chroma_dir for _, chroma_dir, _ in shards])
+    cache_path = None
+    result = None
+    if generation and not args.no_cache:
+        cache_path = get_result_cache_path(storage_root, generation, args)
+        result = load_cached_results(cache_path)
+    timer.info["result_cached"] = result is not None
+    timer.mark("result_cache")
+
+    if result is None:
+        result = run_query(args, storage_root, shards, timer)
+        if isinstance(result, int):
+            return result
+        if cache_path:
+            save_cached_results(cache_path, result)
+            timer.mark("result_cache")
+
+    status = display_results(args, result)
+    timer.mark("display")
+
+    if args.timings:
+        print(timer.report(), file=sys.stderr)
+    trace_path = get_trace_path(args)
+    if trace_path:
+        append_trace(trace_path, timer.trace_record(args))
+    return status
+
+
+def display_results(args: argparse.Namespace, result: dict) -> int:
+    """Print results grep-style. Returns the exit status."""
+    if not result["found"]:
         print("No results found.")
         return 0
 
@@ -194,51 +878,23 @@ def main():
         parts.append(f"{sep}{text}")
         return "".join(parts)
 
-    # Filter by path prefix and threshold, then display
-    shown = 0
-    for doc, metadata, distance in zip(
-        results["documents"][0], results["metadatas"][0], results["distances"][0]
-    ):
-        similarity = 1 - distance
-
-        # Skip results below threshold
-        if similarity < args.threshold:
-            continue
-
-        filepath = metadata["filepath"]
-
-        # Filter by path prefix if specified
-        if args.path:
-            # Normalize path (remove trailing slash)
-            filter_path = args.path.rstrip("/")
-            if not filepath.startswith(filter_path):
-                continue
-
-        shown += 1
-        if shown > args.top:
-            break
-
-        chunk_index = metadata["chunk_index"]
-        line_num = metadata.get("line_num")
+    context = {(filepath, idx): (line, text) for filepath, idx, line, text in result["context"]}
+    shown = len(result["matches"])
 
-        # Get context chunks if requested
+    for i, (filepath, chunk_index, line_num, similarity, doc) in enumerate(result["matches"]):
         if args.B > 0 or args.A > 0:
-            if shown > 1:
+            if i > 0:
                 print("--")  # Separator between results (like grep)
-            for offset in range(-args.B, args.A + 1):
-                target_idx = chunk_index + offset
-                if target_idx < 0:
+            for target_idx in range(chunk_index - args.B, chunk_index + args.A + 1):
+                if target_idx == chunk_index:
+                    ctx_line, ctx_doc = line_num, doc
+                elif (filepath, target_idx) in context:
+                    ctx_line, ctx_doc = context[(filepath, target_idx)]
+                else:
                     continue
-                chunk_id = f"{filepath}:{target_idx}"
-                try:
-                    context = collection.get(ids=[chunk_id])
-                    if context["documents"] and context["metadatas"]:
-                        ctx_line = context["metadatas"][0].get("line_num")
-                        text = context["documents"][0].replace("\n", " ")[:200]
-                        print(format_line(filepath, ctx_line, target_idx,
-                                          similarity, text, is_match=(offset == 0)))
-                except Exception:
-                    pass
+                text = ctx_doc.replace("\n", " ")[:200]
+                print(format_line(filepath, ctx_line, target_idx,
+                                  similarity, text, is_match=(target_idx == chunk_index)))
         else:
             text = doc.replace("\n", " ")[:200]
             print(format_line(filepath, line_num, chunk_index, similarity, text))
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the semgrep index.
+
+recall: compare approximate (HNSW) search against exact brute-force search
+on held-out queries, for a grid of HNSW settings, and report recall@k
+against per-query latency. Use it to pick values for scripts/hnsw_params.txt.
+
+Queries are real past searches (the .ai_cache search embeddings), topped up
+with chunk vectors held out of the benchmark index.
+
+Usage:
+    semgrep-bench recall
+    semgrep-bench recall --k 10 --queries 200
+    semgrep-bench recall --M 8,16,32 --ef-construction 100,200 --ef-search 10,50,100,200
+    semgrep-bench recall --max-vectors 20000    # Subsample a large index
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import chromadb
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+from build_index import (
+    CHROMA_SETTINGS,
+    EMBEDDING_MODEL,
+    get_storage_root,
+    hnsw_metadata,
+    load_hnsw_params,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 10
+DEFAULT_QUERIES = 200
+
+
+def parse_int_list(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def load_index_vectors(chroma_dir: Path, page_size: int = 5000) -> tuple[list[str], np.ndarray]:
+    """All chunk ids and embeddings from the project_docs collection."""
+    client = chromadb.PersistentClient(path=str(chroma_dir), settings=CHROMA_SETTINGS)
+    collection = client.get_collection("project_docs")
+    ids, vectors = [], []
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    if not vectors:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    return ids, np.concatenate(vectors)
+
+
+def load_search_queries(storage_root: Path, limit: int, dims: int) -> np.ndarray:
+    """Embeddings of past search queries from the semgrep query cache."""
+    search_dir = storage_root / ".ai_cache" / "openai" / EMBEDDING_MODEL / "search"
+    paths = sorted(search_dir.glob("*.json")) if search_dir.exists() else []
+    queries = []
+    for path in paths[:limit]:
+        try:
+            with open(path) as f:
+                queries.append(json.load(f)["embedding"])
+        except (OSError, json.JSONDecodeError, KeyError):
+            continue
+    queries = [query for query in queries if len(query) == dims]
+    return np.asarray(queries, dtype=np.float32).reshape(len(queries), dims)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def exact_kth_scores(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact cosine score of each query's k-th nearest neighbour (brute force)."""
+    scores = normalize(queries) @ normalize(corpus).T
+    return -np.partition(-scores, kth=k - 1, axis=1)[:, k - 1]
+
+
+def count_hits(corpus_n: np.ndarray, query: np.ndarray, kth_score: float, ids: list[str]) -> int:
+    """ANN results that belong in the exact top-k.
+
+    A result counts if it scores at least the exact k-th score, so ties
+    (duplicate chunks are common) never count against recall.
+    """
+    rows = [int(i) for i in ids]
+    scores = corpus_n[rows] @ (query / (np.linalg.norm(query) or 1.0))
+    return int((scores >= kth_score - 1e-6).sum())
+
+
+def bench_setting(
+    corpus: np.ndarray, queries: np.ndarray, kth_scores: np.ndarray,
+    k: int, m: int, ef_construction: int, ef_searches: list[int],
+) -> list[dict]:
+    """Build one HNSW index and measure recall/latency for each ef_search."""
+    corpus_n = normalize(corpus)
+    params = {"M": m, "ef_construction": ef_construction, "ef_search": ef_searches[0]}
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="semgrep-bench-") as tmp_dir:
+        client = chromadb.PersistentClient(path=tmp_dir, settings=CHROMA_SETTINGS)
+        collection = client.create_collection(name="bench", metadata=hnsw_metadata(params))
+
+        start = time.perf_counter()
+        batch_size = 5000  # ChromaDB max is 5461
+        for batch_start in range(0, corpus.shape[0], batch_size):
+            batch = corpus[batch_start:batch_start + batch_size]
+            collection.add(
+                ids=[str(i) for i in range(batch_start, batch_start + len(batch))],
+                embeddings=batch,
+            )
+        build_s = time.perf_counter() - start
+
+        for ef_search in ef_searches:
+            # ef_search is read when the index is loaded, so persist the new
+            # value and reopen the collection (as a fresh semgrep process would)
+            collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+            SharedSystemClient.clear_system_cache()
+            client = chromadb.PersistentClient(path=tmp_dir, settings=CHROMA_SETTINGS)
+            collection = client.get_collection("bench")
+            collection.query(query_embeddings=[queries[0]], n_results=k, include=["distances"])  # load index
+
+            latencies = []
+            hits = 0
+            for query, kth_score in zip(queries, kth_scores):
+                start = time.perf_counter()
+                result = collection.query(query_embeddings=[query], n_results=k, include=["distances"])
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += count_hits(corpus_n, query, kth_score, result["ids"][0])
+            rows.append({
+                "M": m,
+                "ef_construction": ef_construction,
+                "ef_search": ef_search,
+                "build_s": round(build_s, 2),
+                "recall": hits / (k * len(queries)),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+            })
+        SharedSystemClient.clear_system_cache()
+    return rows
+
+
+def cmd_recall(args: argparse.Namespace) -> int:
+    storage_root = get_storage_root()
+    chroma_dir = storage_root / ".chroma"
+    if not chroma_dir.exists():
+        logger.error(f"No index at {chroma_dir}. Run semgrep-index first.")
+        return 1
+
+    rng = random.Random(args.seed)
+    current = load_hnsw_params(storage_root)
+    m_values = args.M or [current["M"]]
+    efc_values = args.ef_construction or [current["ef_construction"]]
+    ef_searches = args.ef_search or sorted({10, 20, 50, 100, 200, current["ef_search"]})
+
+    logger.info(f"Loading vectors from {chroma_dir}...")
+    ids, vectors = load_index_vectors(chroma_dir)
+    if len(ids) <= args.k:
+        logger.error(f"Index has only {len(ids)} chunks; need more than k={args.k}.")
+        return 1
+
+    # Queries: past searches first, then chunk vectors held out of the index
+    search_queries = load_search_queries(storage_root, args.queries, vectors.shape[1])
+    held_out_count = min(args.queries - len(search_queries), len(ids) // 10)
+    held_out = set(rng.sample(range(len(ids)), held_out_count)) if held_out_count > 0 else set()
+    keep = [i for i in range(len(ids)) if i not in held_out]
+    if args.max_vectors and len(keep) > args.max_vectors:
+        keep = sorted(rng.sample(keep, args.max_vectors))
+    corpus = vectors[keep]
+    queries = np.concatenate([search_queries, vectors[sorted(held_out)]])
+    if not len(queries):
+        logger.error("No queries available.")
+        return 1
+
+    logger.info(
+        f"Corpus: {len(corpus):,} vectors x {corpus.shape[1]} dims; queries: {len(queries)} "
+        f"({len(search_queries)} past searches, {len(held_out)} held-out chunks); k={args.k}"
+    )
+
+    start = time.perf_counter()
+    kth_scores = exact_kth_scores(corpus, queries, args.k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    rows = []
+    for m in m_values:
+        for ef_construction in efc_values:
+            logger.info(f"Building HNSW M={m} ef_construction={ef_construction}...")
+            rows.extend(bench_setting(corpus, queries, kth_scores, args.k, m, ef_construction, ef_searches))
+
+    logger.info(f"\n{'=' * 70}")
+    logger.info(f"Recall@{args.k} vs latency (exact numpy search: {exact_ms:.2f} ms/query)")
+    logger.info(f"{'=' * 70}")
+    logger.info(f"  {'M':>4} {'ef_c':>6} {'ef_s':>6} {'build s':>8} {'recall':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for row in rows:
+        marker = "*" if all(row[key] == current[key] for key in current) else " "
+        logger.info(
+            f"{marker} {row['M']:>4} {row['ef_construction']:>6} {row['ef_search']:>6} "
+            f"{row['build_s']:>8.2f} {row['recall']:>8.3f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f}"
+        )
+    logger.info(f"{'=' * 70}")
+    logger.info("* = current scripts/hnsw_params.txt")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"k": args.k, "queries": len(queries), "corpus": len(corpus), "rows": rows}, f, indent=2)
+        logger.info(f"Wrote {args.json}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the semgrep index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    recall = subparsers.add_parser("recall", help="ANN recall@k vs latency against exact search")
+    recall.add_argument("--k", type=int, default=DEFAULT_K, help=f"Results per query (default: {DEFAULT_K})")
+    recall.add_argument(
+        "--queries", type=int, default=DEFAULT_QUERIES,
+        help=f"Number of queries (default: {DEFAULT_QUERIES})"
+    )
+    recall.add_argument("--M", type=parse_int_list, help="Comma-separated M values (default: configured)")
+    recall.add_argument(
+        "--ef-construction", type=parse_int_list,
+        help="Comma-separated ef_construction values (default: configured)"
+    )
+    recall.add_argument(
+        "--ef-search", type=parse_int_list,
+        help="Comma-separated ef_search values (default: 10,20,50,100,200 + configured)"
+    )
+    recall.add_argument("--max-vectors", type=int, default=None, help="Subsample the index to this many vectors")
+    recall.add_argument("--seed", type=int, default=0, help="Random seed for held-out sampling")
+    recall.add_argument("--json", type=Path, default=None, help="Also write results as JSON")
+    recall.add_argument("--debug", "-d", action="store_true", help="Enable debug logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO, format="%(message)s")
+    logging.getLogger("chromadb").setLevel(logging.WARNING)
+
+    if args.command == "recall":
+        return cmd_recall(args)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
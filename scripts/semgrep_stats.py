@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Index health, cache hit rate and storage accounting for semgrep.
+
+Reads only metadata: the chunk table, ChromaDB chunk metadata and documents
+(never the vectors), cache directory listings and the indexing run log.
+
+Usage:
+    semgrep-stats                     # Print report
+    semgrep-stats --top 20            # Longer top-files lists
+    semgrep-stats --json stats.json   # Also export as JSON (- for stdout)
+    semgrep-stats --fast              # Skip the ChromaDB scan (no orphan/eviction counts)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+from semantic_search import (
+    CHUNK_TABLE_NAME,
+    EMBEDDING_MODEL,
+    FILES_COLLECTION_NAME,
+    get_main_storage_root,
+    get_main_worktree,
+    get_storage_root,
+    is_worktree,
+    load_chunk_table,
+)
+
+# Written by build_index.py (one JSON line per indexing run)
+INDEX_RUN_LOG = Path(".ai_cache") / "index_runs.jsonl"
+
+# Indexed paths inside source archives look like "paper.tar.gz!/main.tex"
+ARCHIVE_SEPARATOR = "!/"
+
+DEFAULT_TOP = 10
+
+
+def dir_usage(path: Path) -> tuple[int, int]:
+    """(bytes, file count) under path, via scandir (no file reads)."""
+    total_bytes = 0
+    total_files = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    total_bytes += entry.stat(follow_symlinks=False).st_size
+                    total_files += 1
+    return total_bytes, total_files
+
+
+def cache_usage(storage_root: Path) -> dict[str, dict]:
+    """Size of each .ai_cache area (openai/<model>/<type>, pdf_text, ...)."""
+    cache_root = storage_root / ".ai_cache"
+    areas = {}
+    if not cache_root.exists():
+        return areas
+    for area in sorted(cache_root.iterdir()):
+        if not area.is_dir():
+            continue
+        if area.name == "openai":
+            subdirs = [cache_type for model in sorted(area.iterdir()) if model.is_dir()
+                       for cache_type in sorted(model.iterdir()) if cache_type.is_dir()]
+        else:
+            subdirs = [area]
+        for subdir in subdirs:
+            size, files = dir_usage(subdir)
+            areas[subdir.relative_to(cache_root).as_posix()] = {"bytes": size, "files": files}
+    return areas
+
+
+def load_run_log(storage_root: Path) -> list[dict]:
+    runs = []
+    try:
+        with open(storage_root / INDEX_RUN_LOG) as f:
+            for line in f:
+                try:
+                    runs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return runs
+
+
+def run_history(runs: list[dict]) -> dict:
+    """Historical cache hit rate and spend from the run log."""
+    cached_tokens = sum(run.get("cached_tokens", 0) for run in runs)
+    uncached_tokens = sum(run.get("uncached_tokens", 0) for run in runs)
+    cached_chunks = sum(run.get("cached_chunks", 0) for run in runs)
+    uncached_chunks = sum(run.get("uncached_chunks", 0) for run in runs)
+    total_tokens = cached_tokens + uncached_tokens
+    total_chunks = cached_chunks + uncached_chunks
+    return {
+        "runs": len(runs),
+        "first": runs[0].get("time") if runs else None,
+        "last": runs[-1].get("time") if runs else None,
+        "token_hit_rate": cached_tokens / total_tokens if total_tokens else None,
+        "chunk_hit_rate": cached_chunks / total_chunks if total_chunks else None,
+        "last_run_hit_rate": (
+            runs[-1].get("cached_tokens", 0)
+            / ((runs[-1].get("cached_tokens", 0) + runs[-1].get("uncached_tokens", 0)) or 1)
+            if runs else None
+        ),
+        "spent_usd": sum(run.get("cost_usd", 0.0) for run in runs),
+        "api_requests": sum(run.get("api_requests", 0) for run in runs),
+    }
+
+
+def table_breakdown(table: dict, top: int) -> dict:
+    """Chunks/tokens per directory and type, and the heaviest files."""
+    by_dir = Counter()
+    by_type = Counter()
+    tokens_by_dir = Counter()
+    files = []
+    for filepath, entry in table.get("files", {}).items():
+        chunks = len(entry.get("chunks", []))
+        tokens = entry.get("tokens")
+        owner = filepath.split(ARCHIVE_SEPARATOR, 1)[0]
+        directory = str(Path(owner).parent)
+        file_type = Path(filepath).suffix.lstrip(".") or "(none)"
+        by_dir[directory] += chunks
+        if chunks:
+            by_type[file_type] += chunks
+        tokens_by_dir[directory] += tokens or 0
+        files.append((filepath, chunks, tokens))
+
+    with_tokens = [row for row in files if row[2] is not None]
+    return {
+        "files": len(files),
+        "chunks": sum(by_dir.values()),
+        "tokens": sum(tokens_by_dir.values()) if with_tokens else None,
+        "files_without_token_counts": len(files) - len(with_tokens),
+        "chunks_by_directory": dict(by_dir.most_common()),
+        "tokens_by_directory": dict(tokens_by_dir.most_common()) if with_tokens else {},
+        "chunks_by_type": dict(by_type.most_common()),
+        "top_files_by_chunks": [
+            {"file": f, "chunks": c} for f, c, _ in sorted(files, key=lambda row: -row[1])[:top]
+        ],
+        "top_files_by_tokens": [
+            {"file": f, "tokens": t} for f, _, t in sorted(with_tokens, key=lambda row: -row[2])[:top]
+        ],
+    }
+
+
+def scan_index(chroma_dir: Path, table: dict, storage_root: Path, page_size: int = 5000) -> dict:
+    """Orphaned vectors and evictable cache entries, from metadata/documents only."""
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=str(chroma_dir), settings=Settings(anonymized_telemetry=False))
+    table_files = table.get("files", {})
+    root = Path(table.get("root", "."))
+    missing_on_disk = {
+        filepath for filepath in table_files
+        if not (root / filepath.split(ARCHIVE_SEPARATOR, 1)[0]).exists()
+    }
+
+    vectors = 0
+    no_table_entry = 0
+    stale_index = 0
+    deleted_source = 0
+    referenced = set()
+    try:
+        collection = client.get_collection("project_docs")
+    except Exception:
+        collection = None
+    if collection is not None:
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas", "documents"])
+            for meta, document in zip(page["metadatas"], page["documents"]):
+                vectors += 1
+                referenced.add(hashlib.sha256(document.encode()).hexdigest())
+                filepath = meta.get("filepath")
+                entry = table_files.get(filepath)
+                if entry is None:
+                    no_table_entry += 1
+                elif meta.get("chunk_index", 0) >= len(entry.get("chunks", [])):
+                    stale_index += 1
+                elif filepath in missing_on_disk:
+                    deleted_source += 1
+
+    file_vectors = 0
+    orphan_file_vectors = 0
+    try:
+        files_collection = client.get_collection(FILES_COLLECTION_NAME)
+    except Exception:
+        files_collection = None
+    if files_collection is not None:
+        for offset in range(0, files_collection.count(), page_size):
+            page = files_collection.get(limit=page_size, offset=offset, include=[])
+            file_vectors += len(page["ids"])
+            orphan_file_vectors += sum(
+                1 for filepath in page["ids"]
+                if filepath not in table_files or filepath in missing_on_disk
+            )
+
+    content_dir = storage_root / ".ai_cache" / "openai" / EMBEDDING_MODEL / "content"
+    try:
+        with os.scandir(content_dir) as entries:
+            cached = {entry.name[:-5] for entry in entries if entry.name.endswith(".json")}
+    except FileNotFoundError:
+        cached = set()
+
+    return {
+        "chunk_vectors": vectors,
+        "orphaned_no_table_entry": no_table_entry,
+        "orphaned_past_end_of_file": stale_index,
+        "orphaned_source_deleted": deleted_source,
+        "file_vectors": file_vectors,
+        "orphaned_file_vectors": orphan_file_vectors,
+        "table_files_missing_on_disk": len(missing_on_disk),
+        "content_cache_entries": len(cached),
+        "content_cache_referenced": len(cached & referenced),
+        "content_cache_unreferenced": len(cached - referenced),
+        "chunks_without_cache_entry": len(referenced - cached),
+    }
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+
+def format_rate(rate: float | None) -> str:
+    return "n/a" if rate is None else f"{rate:.1%}"
+
+
+def print_report(stats: dict, top: int) -> None:
+    index = stats["index"]
+    print(f"Storage root: {stats['storage_root']}")
+    print(f"\n== Index ({stats['chroma_dir']}) ==")
+    print(f"Files:  {index['files']:,}")
+    print(f"Chunks: {index['chunks']:,}")
+    if index["tokens"] is not None:
+        print(f"Tokens: {index['tokens']:,}")
+    if index["files_without_token_counts"]:
+        print(f"  ({index['files_without_token_counts']:,} files indexed before token counts were recorded)")
+
+    print("\nChunks by directory:")
+    for directory, chunks in list(index["chunks_by_directory"].items())[:top]:
+        tokens = index["tokens_by_directory"].get(directory)
+        token_text = f"  {tokens:>12,} tokens" if tokens else ""
+        print(f"  {chunks:>8,}{token_text}  {directory}")
+    print("\nChunks by type:")
+    for file_type, chunks in index["chunks_by_type"].items():
+        print(f"  {chunks:>8,}  {file_type}")
+    print(f"\nTop {top} files by chunks:")
+    for row in index["top_files_by_chunks"]:
+        print(f"  {row['chunks']:>8,}  {row['file']}")
+    if index["top_files_by_tokens"]:
+        print(f"\nTop {top} files by tokens:")
+        for row in index["top_files_by_tokens"]:
+            print(f"  {row['tokens']:>8,}  {row['file']}")
+
+    health = stats.get("health")
+    if health:
+        orphaned = (
+            health["orphaned_no_table_entry"] + health["orphaned_past_end_of_file"]
+            + health["orphaned_source_deleted"]
+        )
+        print("\n== Health ==")
+        print(f"Chunk vectors:          {health['chunk_vectors']:,}")
+        print(f"Orphaned vectors:       {orphaned:,}")
+        print(f"  no chunk-table entry: {health['orphaned_no_table_entry']:,}")
+        print(f"  past end of file:     {health['orphaned_past_end_of_file']:,}")
+        print(f"  source deleted:       {health['orphaned_source_deleted']:,}")
+        print(f"File vectors:           {health['file_vectors']:,} ({health['orphaned_file_vectors']:,} orphaned)")
+        print(f"Content cache entries:  {health['content_cache_entries']:,}")
+        print(f"  used by the index:    {health['content_cache_referenced']:,}")
+        print(f"  unreferenced:         {health['content_cache_unreferenced']:,} (evictable)")
+        if health["chunks_without_cache_entry"]:
+            print(f"Chunks not in cache:    {health['chunks_without_cache_entry']:,}")
+
+    print("\n== Storage ==")
+    print(f"{format_bytes(stats['storage']['chroma_bytes']):>12}  .chroma")
+    print(f"{format_bytes(stats['storage']['ai_cache_bytes']):>12}  .ai_cache")
+    for area, usage in stats["storage"]["ai_cache_areas"].items():
+        print(f"{format_bytes(usage['bytes']):>12}    {area} ({usage['files']:,} files)")
+
+    history = stats["history"]
+    print("\n== Indexing history ==")
+    if not history["runs"]:
+        print("No runs recorded yet (history starts with the next semgrep-index run).")
+    else:
+        print(f"Runs:             {history['runs']:,} ({history['first']} .. {history['last']})")
+        print(f"Cache hit rate:   {format_rate(history['token_hit_rate'])} of tokens, "
+              f"{format_rate(history['chunk_hit_rate'])} of chunks")
+        print(f"Last run:         {format_rate(history['last_run_hit_rate'])} of tokens")
+        print(f"Total spent:      ${history['spent_usd']:.4f} ({history['api_requests']:,} API requests)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index health, cache hit rate and storage accounting")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help=f"Entries per top list (default: {DEFAULT_TOP})")
+    parser.add_argument("--json", metavar="FILE", help="Also write the stats as JSON (- for stdout only)")
+    parser.add_argument("--fast", action="store_true", help="Skip the ChromaDB scan (orphans, evictable cache)")
+    args = parser.parse_args()
+
+    if is_worktree():
+        main_worktree = get_main_worktree()
+        storage_root = get_main_storage_root(main_worktree) if main_worktree else get_storage_root()
+    else:
+        storage_root = get_storage_root()
+    chroma_dir = storage_root / ".chroma"
+    if not (chroma_dir / CHUNK_TABLE_NAME).exists():
+        print(f"No chunk table in {chroma_dir}. Run semgrep-index first.", file=sys.stderr)
+        return 1
+
+    table = load_chunk_table(chroma_dir)
+    chroma_bytes, _ = dir_usage(chroma_dir)
+    areas = cache_usage(storage_root)
+    stats = {
+        "storage_root": str(storage_root),
+        "chroma_dir": str(chroma_dir),
+        "index": table_breakdown(table, args.top),
+        "health": None if args.fast else scan_index(chroma_dir, table, storage_root),
+        "storage": {
+            "chroma_bytes": chroma_bytes,
+            "ai_cache_bytes": dir_usage(storage_root / ".ai_cache")[0],
+            "ai_cache_areas": areas,
+        },
+        "history": run_history(load_run_log(storage_root)),
+    }
+
+    if args.json == "-":
+        json.dump(stats, sys.stdout, indent=2)
+        print()
+        return 0
+    print_report(stats, args.top)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(stats, f, indent=2)
+        print(f"\nWrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,32 @@
 #!/usr/bin/env python3
+import argparse
+import json
 import os
-import re
+import sys
+
+import todo_index
 
 def check_archived_todos():
-    archive_dir = 'todo/archive'
-    stale_items = {}
-    
-    if not os.path.exists(archive_dir):
-        return stale_items
-
-    for file in os.listdir(archive_dir):
-        if file.endswith('.md'):
-            path = os.path.join(archive_dir, file)
-            with open(path, 'r') as f:
-                content = f.read()
-            
-            # Find unchecked items
-            unchecked = re.findall(r'- [ ].+', content)
-            if unchecked:
-                stale_items[file] = [item.strip() for item in unchecked]
-                    
-    return stale_items
+    todo_dir = todo_index.find_todo_dir()
+    if todo_dir is None or not os.path.exists(os.path.join(todo_dir, 'archive')):
+        return {}
+
+    # Unchecked "- [ ]" / "* [ ]" items (with line numbers) from the shared
+    # TODO index; archived files rarely change, so this is usually all cache
+    return todo_index.stale_items(todo_index.build_index(todo_dir))
 
 def main():
-    print("# Stale TODO Items (in Archived Phases)\n")
-    
+    parser = argparse.ArgumentParser(description="Unchecked items left in archived TODO phases")
+    parser.add_argument('--json', action='store_true', help="Print stale items as JSON")
+    args = parser.parse_args()
+
     stale = check_archived_todos()
+    if args.json:
+        json.dump(stale, sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+
+    print("# Stale TODO Items (in Archived Phases)\n")
     if not stale:
         print("No stale items found in archived phases! All tasks completed.")
         return
@@ -33,9 +34,8 @@ def main():
     for file, items in sorted(stale.items()):
         print(f"## {file}")
         for item in items:
-            print(f"{item}")
+            print(f"{item['line']:>4}: - [ ] {item['text']}")
         print()
 
 if __name__ == "__main__":
     main()
-
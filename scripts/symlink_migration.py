@@ -1,5 +1,8 @@
-import os
+import argparse
 import filecmp
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 SOURCE_REPO = "/Users/ndbroadbent/code/string_theory"
 PROJECT_REPO = "/Users/ndbroadbent/code/string_theory_project"
@@ -12,7 +15,55 @@ MAPPINGS = {
     "resources": "research/papers",
 }
 
-def link_files():
+# Never descend into these when indexing the project repo
+SKIP_DIRS = {".git", ".venv", "node_modules", ".chroma", ".ai_cache", "__pycache__"}
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ProjectIndex:
+    """Name -> paths and content hash -> paths for the project repo, built in one walk.
+
+    Only project files whose size matches some source file are hashed, so the
+    hash index costs about as much as the files that could possibly match.
+    """
+
+    def __init__(self, project_repo):
+        self.by_name = {}
+        self.by_size = {}
+        self.by_hash = {}
+        self.hashes = {}
+        for root, dirs, files in os.walk(project_repo):
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+            for filename in files:
+                path = os.path.join(root, filename)
+                if os.path.islink(path):
+                    continue
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                self.by_name.setdefault(filename, []).append(path)
+                self.by_size.setdefault(size, []).append(path)
+
+    def hash_sizes(self, sizes, workers=8):
+        """Hash every project file with one of the given sizes (in parallel)."""
+        paths = [p for size in sizes for p in self.by_size.get(size, []) if p not in self.hashes]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, digest in zip(paths, pool.map(file_hash, paths)):
+                self.hashes[path] = digest
+                self.by_hash.setdefault(digest, []).append(path)
+
+
+def collect_sources():
+    """(source_path, project_dir) for every file that should become a symlink."""
+    sources = []
     for source_sub, project_sub in MAPPINGS.items():
         source_dir = os.path.join(SOURCE_REPO, source_sub)
         project_dir = os.path.join(PROJECT_REPO, project_sub)
@@ -20,7 +71,7 @@ def link_files():
         if not os.path.exists(source_dir):
             continue
             
-        for filename in os.listdir(source_dir):
+        for filename in sorted(os.listdir(source_dir)):
             source_path = os.path.join(source_dir, filename)
             
             # Skip directories and DS_Store
@@ -30,36 +81,84 @@ def link_files():
             # Skip .dat, .json, .txt in resources (keep data local)
             if source_sub == "resources" and filename.endswith((".dat", ".json", ".txt")):
                 continue
-                
-            # Search for the file in the project repo (recursive search might be needed if I reorganized)
-            # For now, check direct mapping
-            target_path = os.path.join(project_dir, filename)
-            
-            # Special case for docs -> research (flat copy)
-            if not os.path.exists(target_path):
-                # Try finding it recursively in project repo
-                found = False
-                for root, _, files in os.walk(PROJECT_REPO):
-                    if filename in files:
-                        target_path = os.path.join(root, filename)
-                        found = True
-                        break
-                if not found:
-                    print(f"Skipping {filename}: Not found in project repo")
-                    continue
 
             # Check if source is already a symlink
             if os.path.islink(source_path):
                 print(f"Skipping {filename}: Already a symlink")
                 continue
 
-            # Replace with symlink
-            print(f"Linking {filename} -> {target_path}")
-            os.remove(source_path)
-            # Create relative symlink if possible, or absolute
-            # os.symlink(target_path, source_path)
-            # Use relative path for portability? No, separate repos. Use absolute for now.
-            os.symlink(target_path, source_path)
+            sources.append((source_path, project_dir))
+    return sources
+
+
+def pick_target(candidates, filename, project_dir):
+    """Prefer the mapped directory, then the same filename, then the shortest path."""
+    return min(candidates, key=lambda p: (
+        os.path.dirname(p) != project_dir,
+        os.path.basename(p) != filename,
+        len(p),
+        p,
+    ))
+
+
+def plan_links(sources, index):
+    """[(source_path, target_path, note)] for sources with an identical file in the project.
+
+    Targets are matched by content hash, so renamed or moved files are found;
+    a same-named file with different content is reported, never linked.
+    """
+    index.hash_sizes({os.path.getsize(source_path) for source_path, _ in sources})
+    plan = []
+    for source_path, project_dir in sources:
+        filename = os.path.basename(source_path)
+        digest = file_hash(source_path)
+        candidates = index.by_hash.get(digest, [])
+        if candidates:
+            target_path = pick_target(candidates, filename, project_dir)
+            note = "" if os.path.basename(target_path) == filename else " (renamed)"
+            plan.append((source_path, target_path, note))
+        elif filename in index.by_name:
+            print(f"Skipping {filename}: Content differs from {', '.join(index.by_name[filename])}")
+        else:
+            print(f"Skipping {filename}: Not found in project repo")
+    return plan
+
+
+def apply_plan(plan):
+    linked = 0
+    for source_path, target_path, _ in plan:
+        # Contents may have changed since planning; never link a mismatch
+        if not filecmp.cmp(source_path, target_path, shallow=False):
+            print(f"Skipping {source_path}: Content changed since planning")
+            continue
+        # Create the symlink beside the source and rename it over the file, so
+        # the source is never missing. Absolute target: separate repos.
+        tmp_path = os.path.join(os.path.dirname(source_path), f".{os.path.basename(source_path)}.symlink-tmp")
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        os.symlink(target_path, tmp_path)
+        os.replace(tmp_path, source_path)
+        linked += 1
+    return linked
+
+
+def link_files(apply=False):
+    sources = collect_sources()
+    index = ProjectIndex(PROJECT_REPO)
+    plan = plan_links(sources, index)
+
+    for source_path, target_path, note in plan:
+        print(f"Linking {os.path.basename(source_path)} -> {target_path}{note}")
+
+    if not apply:
+        print(f"\nDry run: {len(plan)} of {len(sources)} files would be linked. Re-run with --apply.")
+        return
+    linked = apply_plan(plan)
+    print(f"\nLinked {linked} of {len(sources)} files.")
+
 
 if __name__ == "__main__":
-    link_files()
+    parser = argparse.ArgumentParser(description="Replace source repo files with symlinks to identical project files")
+    parser.add_argument("--apply", action="store_true", help="Create the symlinks (default: print the plan only)")
+    args = parser.parse_args()
+    link_files(apply=args.apply)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Shared, incremental index of checkbox items under todo/.
+
+Used by project_status.py (progress per file) and stale_todos.py (unchecked
+items left in archived phases). Each markdown file is parsed once, in a single
+pass that records every checkbox with its line number; results are cached in
+.ai_cache/todo_index.json keyed by size/mtime, with a content hash fallback, so
+repeated status checks only stat the files.
+
+Usage:
+    python scripts/todo_index.py          # Dump the index as JSON
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+
+CACHE_PATH = os.path.join('.ai_cache', 'todo_index.json')
+CACHE_VERSION = 1
+
+# "- [ ] task", "* [x] task", "  - [X] nested task"
+RE_CHECKBOX = re.compile(r'^\s*[-\*]\s+\[([ xX])\]\s?(.*)$')
+
+
+def find_todo_dir():
+    # Assume script is run from project root, look for 'todo' dir
+    if os.path.isdir('todo'):
+        return 'todo'
+    # Fallback: if run from inside scripts/ dir
+    if os.path.isdir('../todo'):
+        return '../todo'
+    return None
+
+
+def parse_checkboxes(text):
+    """All checkbox items in text: [{'line', 'checked', 'text'}, ...]."""
+    items = []
+    for line_num, line in enumerate(text.split('\n'), 1):
+        match = RE_CHECKBOX.match(line)
+        if match:
+            items.append({
+                'line': line_num,
+                'checked': match.group(1) != ' ',
+                'text': match.group(2).strip(),
+            })
+    return items
+
+
+def load_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+
+def save_cache(path, files):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.todo_index.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': files}, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def build_index(todo_dir, cache_path=None):
+    """Return {relative path: {'size', 'mtime_ns', 'sha256', 'items'}} for todo_dir.
+
+    Unchanged files (same size and mtime) come straight from the cache; touched
+    files whose content hash is unchanged reuse their cached items.
+    """
+    if cache_path is None:
+        cache_path = os.path.join(os.path.dirname(os.path.abspath(todo_dir)), CACHE_PATH)
+    cached = load_cache(cache_path)
+    index = {}
+    changed = False
+
+    for root, dirs, files in os.walk(todo_dir):
+        for file in files:
+            if not file.endswith('.md'):
+                continue
+            path = os.path.join(root, file)
+            rel_path = os.path.relpath(path, todo_dir)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            entry = cached.get(rel_path)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                index[rel_path] = entry
+                continue
+
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                text = data.decode('utf-8')
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Skipping {path}: {e}", file=sys.stderr)
+                continue
+            digest = hashlib.sha256(data).hexdigest()
+            items = entry['items'] if entry and entry['sha256'] == digest else parse_checkboxes(text)
+            index[rel_path] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': digest,
+                'items': items,
+            }
+            changed = True
+
+    if changed or set(index) != set(cached):
+        try:
+            save_cache(cache_path, index)
+        except OSError as e:
+            print(f"Could not write {cache_path}: {e}", file=sys.stderr)
+    return index
+
+
+def progress(index):
+    """{file: {'checked', 'total', 'percent'}} for files with any checkboxes."""
+    summary = {}
+    for rel_path, entry in index.items():
+        total = len(entry['items'])
+        if total == 0:
+            continue
+        checked = sum(1 for item in entry['items'] if item['checked'])
+        summary[rel_path] = {
+            'checked': checked,
+            'total': total,
+            'percent': (checked / total) * 100,
+        }
+    return summary
+
+
+def stale_items(index, archive_prefix='archive' + os.sep):
+    """{file: [item, ...]} of unchecked items in archived phase files."""
+    stale = {}
+    for rel_path, entry in index.items():
+        if not rel_path.startswith(archive_prefix):
+            continue
+        unchecked = [item for item in entry['items'] if not item['checked']]
+        if unchecked:
+            stale[rel_path[len(archive_prefix):]] = unchecked
+    return stale
+
+
+def main():
+    todo_dir = find_todo_dir()
+    if todo_dir is None:
+        print(f"Error: Could not find 'todo' directory from {os.getcwd()}")
+        sys.exit(1)
+    json.dump(build_index(todo_dir), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()